@@ -0,0 +1,326 @@
+"""
+Benchmarks the deploy and destroy pipelines against a fake terraform
+"""
+
+import argparse
+import json
+import os
+import platform
+import shutil
+import subprocess
+import sys
+import tempfile
+import time
+from collections import Counter
+from datetime import datetime
+from pathlib import Path
+from typing import Dict, List, Optional
+
+import yaml
+
+BENCH_DIR = Path(__file__).parent
+REPO_DIR = BENCH_DIR.parent
+RESULTS_DIR = BENCH_DIR / "results"
+DEFAULT_TEMPLATE = REPO_DIR / "configs" / "example-vpc-gcs.yaml"
+
+# redeploy runs deploy again in the same tree, with every cache warm
+PHASES = {'deploy': 'deploy', 'redeploy': 'deploy', 'destroy': 'destroy'}
+
+
+def make_root(tmp: Path) -> Path:
+    """Copy the Terraform sources and scripts the pipelines run against"""
+    root = tmp / "repo"
+    root.mkdir()
+    for tf_file in REPO_DIR.glob("*.tf"):
+        shutil.copy2(tf_file, root)
+    shutil.copytree(REPO_DIR / "modules", root / "modules")
+    shutil.copytree(REPO_DIR / "scripts", root / "scripts",
+                    ignore=shutil.ignore_patterns('__pycache__', 'logs'))
+    return root
+
+
+def make_configs(root: Path, template: Path, count: int) -> List[str]:
+    """Write count copies of template, each with its own project_id"""
+    with open(template, 'r') as f:
+        base = yaml.safe_load(f)
+
+    configs_dir = root / "configs"
+    configs_dir.mkdir(exist_ok=True)
+    config_files = []
+    for i in range(count):
+        config_file = configs_dir / f"bench-{i:04d}.yaml"
+        with open(config_file, 'w') as f:
+            yaml.safe_dump(dict(base, project_id=f"bench-{i:04d}"), f,
+                           sort_keys=False)
+        config_files.append(str(config_file))
+    return config_files
+
+
+def fake_terraform_env(tmp: Path, latency: float, plan_lines: int,
+                       resources: int) -> Dict[str, str]:
+    """Environment with the fake terraform first on PATH"""
+    bin_dir = tmp / "bin"
+    bin_dir.mkdir()
+    shim = bin_dir / "terraform"
+    shim.write_text(f'#!/bin/sh\nexec "{sys.executable}" '
+                    f'"{BENCH_DIR / "fake_terraform.py"}" "$@"\n')
+    shim.chmod(0o755)
+
+    return dict(
+        os.environ,
+        PATH=f"{bin_dir}{os.pathsep}{os.environ.get('PATH', '')}",
+        FAKE_TF_LATENCY=str(latency),
+        FAKE_TF_PLAN_LINES=str(plan_lines),
+        FAKE_TF_RESOURCES=str(resources),
+        AUTOGCP_PLUGIN_CACHE_DIR=str(tmp / "plugins"),
+        AUTOGCP_LOG_DIR=str(tmp / "logs"),
+    )
+
+
+def step_stats(reports_dir: Path, command: str) -> dict:
+    """Per-step timings summed over every run report of command"""
+    durations: Dict[str, List[float]] = {}
+    runs = failed = 0
+    for report_file in reports_dir.glob(f"{command}_*.json"):
+        with open(report_file, 'r') as f:
+            report = json.load(f)
+        runs += 1
+        failed += not report['success']
+        for step in report['steps']:
+            durations.setdefault(step['name'], []).append(step['duration_s'])
+
+    steps = {}
+    for name, values in durations.items():
+        values.sort()
+        steps[name] = {
+            'count': len(values),
+            'total_s': round(sum(values), 3),
+            'mean_s': round(sum(values) / len(values), 4),
+            'p95_s': values[min(len(values) - 1, int(len(values) * 0.95))],
+            'max_s': values[-1],
+        }
+    return {'runs': runs, 'failed': failed, 'steps': steps}
+
+
+def run_phase(phase: str, root: Path, config_files: List[str], parallel: int,
+              env: Dict[str, str], tmp: Path) -> dict:
+    """Run one workload in a child process and measure it"""
+    command = PHASES[phase]
+    reports_dir = root / ".autogcp" / "reports"
+    shutil.rmtree(reports_dir, ignore_errors=True)
+    calls_file = tmp / "calls"
+    calls_file.write_text('')
+    output_file = tmp / f"{phase}.out"
+
+    args = [sys.executable, str(BENCH_DIR / "workload.py"), command, str(root),
+            *config_files, '--parallel', str(parallel)]
+    with open(output_file, 'w') as output:
+        start = time.perf_counter()
+        process = subprocess.Popen(
+            args, cwd=root, env=dict(env, FAKE_TF_CALLS=str(calls_file)),
+            stdin=subprocess.DEVNULL, stdout=output, stderr=subprocess.STDOUT)
+        # wait4 reports the child's own peak RSS, unlike getrusage
+        _, status, usage = os.wait4(process.pid, 0)
+        wall = time.perf_counter() - start
+    process.returncode = os.waitstatus_to_exitcode(status)
+
+    if process.returncode != 0:
+        tail = output_file.read_text().splitlines()[-20:]
+        print(f"{phase} with {len(config_files)} configs failed:", file=sys.stderr)
+        for line in tail:
+            print(f"  {line}", file=sys.stderr)
+
+    # Linux reports ru_maxrss in KiB, macOS in bytes
+    rss_unit = 1024 * 1024 if sys.platform == 'darwin' else 1024
+    calls = Counter(calls_file.read_text().split())
+    return {
+        'phase': phase,
+        'configs': len(config_files),
+        'parallel': parallel,
+        'exit_code': process.returncode,
+        'wall_s': round(wall, 3),
+        'per_config_s': round(wall / len(config_files), 4),
+        'peak_rss_mb': round(usage.ru_maxrss / rss_unit, 1),
+        'cpu_s': round(usage.ru_utime + usage.ru_stime, 3),
+        'subprocesses': sum(calls.values()),
+        'terraform_calls': dict(sorted(calls.items())),
+        **step_stats(reports_dir, command),
+    }
+
+
+def git_commit() -> Optional[str]:
+    try:
+        return subprocess.run(
+            ['git', 'rev-parse', '--short', 'HEAD'], cwd=REPO_DIR,
+            capture_output=True, text=True, check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def compare(baseline: dict, current: dict, threshold: float) -> List[str]:
+    """Print wall time and RSS changes, returning the regressions"""
+    if baseline.get('parameters') != current['parameters']:
+        print("Warning: baseline was run with different parameters")
+
+    previous = {(r['phase'], r['configs']): r for r in baseline.get('results', [])}
+    regressions = []
+    print(f"{'phase':<10}{'configs':>8}  {'wall_s':<27}  {'peak_rss_mb':<27}")
+    for result in current['results']:
+        old = previous.get((result['phase'], result['configs']))
+        if old is None:
+            continue
+        cells = []
+        for metric in ('wall_s', 'peak_rss_mb'):
+            change = (result[metric] - old[metric]) / old[metric] * 100 \
+                if old[metric] else 0.0
+            cells.append(f"{old[metric]:>8} -> {result[metric]:<8}{change:+6.1f}%")
+            if change > threshold:
+                regressions.append(
+                    f"{result['phase']} x{result['configs']}: {metric} "
+                    f"{old[metric]} -> {result[metric]} ({change:+.1f}%)")
+        print(f"{result['phase']:<10}{result['configs']:>8}  {cells[0]}  {cells[1]}")
+    return regressions
+
+
+def main():
+    """Main entry point"""
+    parser = argparse.ArgumentParser(
+        description='Measure deploy and destroy end to end against a fake terraform',
+        formatter_class=argparse.RawDescriptionHelpFormatter,
+        epilog="""
+Examples:
+  python bench.py
+  python bench.py --sizes 1,10,100,500 --parallel 16 --latency 0.2
+  python bench.py --sizes 10 --plan-lines 100000 --phases deploy
+  python bench.py --baseline results/bench_20250101_120000.json
+        """
+    )
+    parser.add_argument(
+        '--sizes',
+        help='Comma separated config counts to run (default: 1,10,100)',
+        default='1,10,100'
+    )
+    parser.add_argument(
+        '--phases',
+        help=f"Comma separated phases, in order (default: {','.join(PHASES)})",
+        default=','.join(PHASES)
+    )
+    parser.add_argument(
+        '-p', '--parallel',
+        help='Fleet workers for deploy (default: 8)',
+        type=int,
+        default=8
+    )
+    parser.add_argument(
+        '--latency',
+        help='Seconds every fake terraform command takes (default: 0)',
+        type=float,
+        default=0.0
+    )
+    parser.add_argument(
+        '--plan-lines',
+        help='Lines of output per plan (default: 100)',
+        type=int,
+        default=100
+    )
+    parser.add_argument(
+        '--resources',
+        help='Resources in state and in each plan (default: 10)',
+        type=int,
+        default=10
+    )
+    parser.add_argument(
+        '--template',
+        help=f'Config the synthetic configs are copied from (default: {DEFAULT_TEMPLATE.name})',
+        type=Path,
+        default=DEFAULT_TEMPLATE
+    )
+    parser.add_argument(
+        '-o', '--output',
+        help='Result file (default: results/bench_<timestamp>.json)',
+        type=Path
+    )
+    parser.add_argument(
+        '--baseline',
+        help='Earlier result file to compare against',
+        type=Path
+    )
+    parser.add_argument(
+        '--threshold',
+        help='Percent slower or larger than the baseline that fails the run (default: 10)',
+        type=float,
+        default=10.0
+    )
+    parser.add_argument(
+        '--keep',
+        help='Keep the temporary trees for inspection',
+        action='store_true'
+    )
+    args = parser.parse_args()
+
+    try:
+        sizes = [int(size) for size in args.sizes.split(',')]
+    except ValueError:
+        parser.error("--sizes must be comma separated integers")
+    phases = args.phases.split(',')
+    unknown = set(phases) - set(PHASES)
+    if unknown:
+        parser.error(f"unknown phases: {', '.join(sorted(unknown))}")
+
+    started_at = datetime.now()
+    results = {
+        'started_at': started_at.isoformat(),
+        'commit': git_commit(),
+        'python': platform.python_version(),
+        'platform': platform.platform(),
+        'cpus': os.cpu_count(),
+        'parameters': {
+            'parallel': args.parallel,
+            'latency_s': args.latency,
+            'plan_lines': args.plan_lines,
+            'resources': args.resources,
+            'template': args.template.name,
+        },
+        'results': [],
+    }
+
+    for size in sizes:
+        tmp = Path(tempfile.mkdtemp(prefix=f"autogcp-bench-{size}-"))
+        try:
+            root = make_root(tmp)
+            config_files = make_configs(root, args.template, size)
+            env = fake_terraform_env(
+                tmp, args.latency, args.plan_lines, args.resources)
+            for phase in phases:
+                result = run_phase(
+                    phase, root, config_files, args.parallel, env, tmp)
+                results['results'].append(result)
+                print(f"{phase:<10}{size:>5} configs  {result['wall_s']:>8.2f}s  "
+                      f"{result['peak_rss_mb']:>7.1f} MB  "
+                      f"{result['subprocesses']:>6} terraform calls")
+        finally:
+            if args.keep:
+                print(f"Kept {tmp}")
+            else:
+                shutil.rmtree(tmp, ignore_errors=True)
+
+    output = args.output or \
+        RESULTS_DIR / f"bench_{started_at.strftime('%Y%m%d_%H%M%S')}.json"
+    output.parent.mkdir(parents=True, exist_ok=True)
+    with open(output, 'w') as f:
+        json.dump(results, f, indent=2)
+    print(f"Results written to {output}")
+
+    failed = any(result['exit_code'] != 0 for result in results['results'])
+    if args.baseline:
+        with open(args.baseline, 'r') as f:
+            regressions = compare(json.load(f), results, args.threshold)
+        for regression in regressions:
+            print(f"Regression: {regression}")
+        failed |= bool(regressions)
+
+    sys.exit(1 if failed else 0)
+
+
+if __name__ == "__main__":
+    main()
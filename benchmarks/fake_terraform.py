@@ -0,0 +1,143 @@
+#!/usr/bin/env python3
+"""
+Stand-in terraform binary for benchmarks, linked onto PATH as terraform
+
+Environment:
+  FAKE_TF_LATENCY     seconds every command sleeps (default: 0)
+  FAKE_TF_PLAN_LINES  lines a plan prints (default: 100)
+  FAKE_TF_RESOURCES   resources in state and in every plan (default: 10)
+  FAKE_TF_NO_CHANGES  set to 1 to make every plan report no changes
+  FAKE_TF_CALLS       file that gets one line per invocation
+"""
+
+import json
+import os
+import sys
+import time
+
+LATENCY = float(os.environ.get('FAKE_TF_LATENCY', '0'))
+PLAN_LINES = int(os.environ.get('FAKE_TF_PLAN_LINES', '100'))
+RESOURCES = int(os.environ.get('FAKE_TF_RESOURCES', '10'))
+NO_CHANGES = os.environ.get('FAKE_TF_NO_CHANGES') == '1'
+
+# Remembers the backend of the last init and which backends were destroyed
+BACKEND_FILE = os.path.join('.terraform', 'fake_backend')
+DESTROYED_DIR = os.path.join('.terraform', 'fake_destroyed')
+
+
+def backend() -> str:
+    try:
+        with open(BACKEND_FILE) as f:
+            return f.read()
+    except OSError:
+        return 'default'
+
+
+def destroyed_marker() -> str:
+    return os.path.join(DESTROYED_DIR, backend().replace(os.sep, '_'))
+
+
+def addresses():
+    for i in range(RESOURCES):
+        module = 'vpc' if i % 2 else 'gcs'
+        yield module, f"module.{module}[0].google_compute_subnetwork.r{i}"
+
+
+def state() -> dict:
+    resources = []
+    if not os.path.exists(destroyed_marker()):
+        for i in range(RESOURCES):
+            module = 'vpc' if i % 2 else 'gcs'
+            resources.append({
+                'module': f"module.{module}[0]", 'mode': 'managed',
+                'type': 'google_compute_subnetwork', 'name': f"r{i}",
+                'instances': [{}]})
+    return {'version': 4, 'serial': 1, 'lineage': backend(),
+            'resources': resources}
+
+
+def plan(args) -> int:
+    destroy = '-destroy' in args
+    # terraform saves the plan file even when there is nothing to do
+    for arg in args:
+        if arg.startswith('-out='):
+            with open(arg[5:], 'w') as f:
+                f.write('destroy' if destroy else 'apply')
+    if NO_CHANGES:
+        print("No changes. Your infrastructure matches the configuration.")
+        return 0
+
+    action = 'destroyed' if destroy else 'created'
+    for n in range(PLAN_LINES):
+        print(f"  # module.vpc[0].google_compute_subnetwork.r{n % max(RESOURCES, 1)} "
+              f"will be {action}")
+    print(f"Plan: {0 if destroy else RESOURCES} to add, 0 to change, "
+          f"{RESOURCES if destroy else 0} to destroy.")
+    return 2 if '-detailed-exitcode' in args else 0
+
+
+def show(args) -> int:
+    with open(args[-1]) as f:
+        action = 'delete' if f.read() == 'destroy' else 'create'
+    print(json.dumps({
+        'format_version': '1.2',
+        'resource_changes': [
+            {'address': address, 'module_address': f"module.{module}[0]",
+             'type': 'google_compute_subnetwork',
+             'change': {'actions': [action]}}
+            for module, address in addresses()],
+    }))
+    return 0
+
+
+def apply(args) -> int:
+    with open(args[-1]) as f:
+        destroy = f.read() == 'destroy'
+    verb = ('Destroying', 'Destruction') if destroy else ('Creating', 'Creation')
+    for _, address in addresses():
+        print(f"{address}: {verb[0]}...")
+        print(f"{address}: {verb[1]} complete after 0s")
+    if destroy:
+        os.makedirs(DESTROYED_DIR, exist_ok=True)
+        open(destroyed_marker(), 'w').close()
+    print(f"Apply complete! Resources: {0 if destroy else RESOURCES} added, "
+          f"0 changed, {RESOURCES if destroy else 0} destroyed.")
+    return 0
+
+
+def main() -> int:
+    args = sys.argv[1:]
+    if os.environ.get('FAKE_TF_CALLS'):
+        with open(os.environ['FAKE_TF_CALLS'], 'a') as f:
+            f.write(f"{' '.join(args[:1])}\n")
+    time.sleep(LATENCY)
+
+    command = args[0] if args else ''
+    if command == 'init':
+        os.makedirs('.terraform', exist_ok=True)
+        for arg in args:
+            if arg.startswith('-backend-config='):
+                with open(BACKEND_FILE, 'w') as f:
+                    f.write(os.path.basename(arg.split('=', 1)[1]))
+        print("Terraform has been successfully initialized!")
+    elif args[:2] == ['workspace', 'list']:
+        print("* default")
+    elif args[:2] == ['workspace', 'show']:
+        print("default")
+    elif command == 'validate':
+        print("Success! The configuration is valid.")
+    elif command == 'plan':
+        return plan(args)
+    elif command == 'show':
+        return show(args)
+    elif command == 'apply':
+        return apply(args)
+    elif args[:2] == ['state', 'pull']:
+        print(json.dumps(state()))
+    elif command == 'output':
+        print('project_id = "bench"')
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
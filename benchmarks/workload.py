@@ -0,0 +1,43 @@
+"""
+Runs one benchmarked workload against a copy of the repository
+
+Started by bench.py in its own process, so wall time, peak RSS and the
+terraform calls it makes belong to this workload alone.
+"""
+
+import argparse
+import logging
+import sys
+from pathlib import Path
+
+
+def main():
+    """Main entry point"""
+    parser = argparse.ArgumentParser(description='Run one benchmark workload')
+    parser.add_argument('command', choices=('deploy', 'destroy'))
+    parser.add_argument('root', help='Repository copy to run in')
+    parser.add_argument('configs', nargs='+')
+    parser.add_argument('-p', '--parallel', type=int, default=1)
+    args = parser.parse_args()
+
+    root = Path(args.root)
+    sys.path.insert(0, str(root / "scripts"))
+    import logsetup
+    logsetup.setup_logging(f"bench_{args.command}", logging.INFO)
+
+    if args.command == 'deploy':
+        from deploy import deploy_fleet
+        success = deploy_fleet(args.configs, parallel=args.parallel,
+                               auto_approve=True)
+    else:
+        from destroy import TerraformDestroyer
+        success = True
+        for config_file in args.configs:
+            success &= TerraformDestroyer(
+                config_file=config_file, auto_approve=True).destroy()
+
+    sys.exit(0 if success else 1)
+
+
+if __name__ == "__main__":
+    main()
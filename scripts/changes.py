@@ -0,0 +1,134 @@
+"""
+Works out which YAML configs are affected by changes since a git ref
+"""
+
+import json
+import subprocess
+from pathlib import Path
+from typing import Callable, Dict, List, Optional, Set
+
+from config_loader import ConfigResolver
+
+# Mirrors the module count expressions and feature flag locals in main.tf
+MODULE_FLAGS: Dict[str, Callable[[dict], bool]] = {
+    'project': lambda c: c.get('create_project', True),
+    'vpc': lambda c: c.get('enable_vpc', False),
+    'gcs': lambda c: c.get('enable_gcs', False),
+    'compute': lambda c: c.get('enable_compute', False)
+    and len(c.get('instance_templates') or {}) > 0,
+    'cloudsql': lambda c: c.get('enable_cloudsql', False)
+    and c.get('cloudsql_instance_name', "") != "",
+    'cloudrun': lambda c: c.get('enable_cloudrun', False)
+    and len(c.get('cloudrun_services') or {}) > 0,
+    'gke': lambda c: c.get('enable_gke', False)
+    and c.get('gke_cluster_name', "") != "",
+    'loadbalancer': lambda c: c.get('enable_loadbalancer', False)
+    and c.get('loadbalancer_name', "") != "",
+    'pubsub': lambda c: c.get('enable_pubsub', False)
+    and len(c.get('pubsub_topics') or {}) > 0,
+    'monitoring': lambda c: c.get('enable_monitoring', True),
+}
+
+
+def active_modules(config: dict) -> Set[str]:
+    """Modules that main.tf instantiates for this config"""
+    return {name for name, enabled in MODULE_FLAGS.items() if enabled(config)}
+
+
+def normalize_config(config: Optional[dict]) -> str:
+    """Canonical form of a config, blind to comments, order and quoting"""
+    return json.dumps(config, sort_keys=True, default=str)
+
+
+def git(root_dir: Path, *args: str) -> str:
+    """Run a git command in root_dir and return its stdout"""
+    result = subprocess.run(
+        ['git', *args],
+        cwd=root_dir,
+        capture_output=True,
+        text=True,
+        check=True
+    )
+    return result.stdout
+
+
+def changed_paths(root_dir: Path, ref: str) -> Set[str]:
+    """Files that differ between ref and the working tree, plus new files"""
+    paths = set(git(root_dir, 'diff', '--name-only', ref, '--').splitlines())
+    paths.update(git(root_dir, 'ls-files', '--others',
+                     '--exclude-standard').splitlines())
+    return paths
+
+
+def read_at_ref(root_dir: Path, ref: str) -> Callable[[Path], str]:
+    """Reader for ConfigResolver that returns files as they were at ref"""
+    resolved_root = root_dir.resolve()
+
+    def read(path: Path) -> str:
+        relative = path.relative_to(resolved_root).as_posix()
+        return git(root_dir, 'show', f'{ref}:{relative}')
+
+    return read
+
+
+def config_at_ref(root_dir: Path, ref: str, config_path: Path,
+                  workspace: Optional[str] = None) -> Optional[dict]:
+    """Resolve a config as it was at ref, None if it did not exist"""
+    resolver = ConfigResolver(root_dir, workspace, read_at_ref(root_dir, ref))
+    try:
+        return resolver.resolve(config_path)
+    except subprocess.CalledProcessError:
+        return None
+
+
+def affected_configs(root_dir: Path, config_files: List[str], ref: str,
+                     workspace: Optional[str] = None) -> Dict[str, List[str]]:
+    """Map each affected config to the reasons it needs a deployment
+
+    A config is affected when its resolved content changed (through the
+    file itself or any base it extends), when any root .tf file changed,
+    or when a module it activates changed.
+    """
+    paths = changed_paths(root_dir, ref)
+    resolved_root = root_dir.resolve()
+
+    root_changes = sorted(p for p in paths if '/' not in p and p.endswith('.tf'))
+    changed_modules: Dict[str, List[str]] = {}
+    for path in paths:
+        parts = Path(path).parts
+        if len(parts) > 2 and parts[0] == 'modules':
+            changed_modules.setdefault(parts[1], []).append(path)
+
+    resolver = ConfigResolver(root_dir, workspace)
+    affected: Dict[str, List[str]] = {}
+    for config_file in config_files:
+        config_path = Path(config_file).resolve()
+        config = resolver.resolve(config_path)
+
+        reasons = []
+        try:
+            relative = config_path.relative_to(resolved_root).as_posix()
+            changed = [path.relative_to(resolved_root).as_posix()
+                       for path in resolver.files(config_path)]
+            changed = [path for path in changed if path in paths]
+        except ValueError:
+            changed = []
+            reasons.append("config outside the repository")
+
+        if changed:
+            previous = config_at_ref(root_dir, ref, config_path, workspace)
+            if previous is None:
+                reasons.append("new config")
+            elif normalize_config(previous) != normalize_config(config):
+                reasons.extend("config changed" if path == relative
+                               else f"base {path} changed" for path in changed)
+
+        reasons.extend(f"{path} changed" for path in root_changes)
+
+        for module in sorted(active_modules(config) & changed_modules.keys()):
+            reasons.append(f"module {module} changed")
+
+        if reasons:
+            affected[config_file] = reasons
+
+    return affected
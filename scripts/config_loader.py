@@ -0,0 +1,173 @@
+"""
+Loads YAML configs with extends: inheritance and per-workspace overlays
+"""
+
+import hashlib
+import json
+import pickle
+from pathlib import Path
+from typing import Any, Callable, Dict, List, Optional
+
+import yaml
+
+import tfcache
+
+CONFIG_CACHE_DIR = Path(".autogcp") / "cache" / "configs"
+PARSED_CACHE_DIR = Path(".autogcp") / "cache" / "parsed"
+
+# libyaml's C loader is several times faster than the pure Python one
+SafeLoader = getattr(yaml, 'CSafeLoader', yaml.SafeLoader)
+
+# Keys that steer resolution and never reach terraform
+EXTENDS_KEY = 'extends'
+ENVIRONMENTS_KEY = 'environments'
+
+
+def load_yaml(text: str) -> Any:
+    """Parse YAML text with the fastest safe loader available"""
+    return yaml.load(text, Loader=SafeLoader)
+
+
+def deep_merge(base: dict, override: dict) -> dict:
+    """Merge override into a copy of base
+
+    Nested mappings are merged key by key, any other value (lists
+    included) replaces the base value.
+    """
+    merged = dict(base)
+    for key, value in override.items():
+        if isinstance(value, dict) and isinstance(merged.get(key), dict):
+            merged[key] = deep_merge(merged[key], value)
+        else:
+            merged[key] = value
+    return merged
+
+
+class ConfigResolver:
+    """Resolves configs through their extends: chain for one workspace
+
+    A config may name one or more base files in extends: (paths relative
+    to the config) and carry an environments: mapping of workspace name to
+    overrides. Bases are merged in order, then the config itself, then
+    the overrides for the selected workspace. Bases can extend further.
+
+    Every resolved file, base or leaf, is cached on disk together with the
+    hashes of all files that contributed to it. A lookup only hashes those
+    files, so editing one base re-resolves just the configs built on it,
+    and the other bases they use still come from the cache.
+    """
+
+    def __init__(self, root_dir: Path, workspace: Optional[str] = None,
+                 read: Optional[Callable[[Path], str]] = None):
+        self.root_dir = root_dir
+        self.workspace = workspace or "default"
+        # A custom reader (e.g. files at a git ref) bypasses the disk cache
+        self.read = read or self._read_file
+        self.use_cache = read is None
+        self.cache_dir = root_dir / CONFIG_CACHE_DIR
+        self.hashes: Dict[Path, str] = {}
+        self.resolved: Dict[Path, dict] = {}
+
+    @staticmethod
+    def _read_file(path: Path) -> str:
+        with open(path, 'r', encoding='utf-8') as f:
+            return f.read()
+
+    def file_hash(self, path: Path) -> str:
+        if path not in self.hashes:
+            self.hashes[path] = tfcache.hash_file(path)
+        return self.hashes[path]
+
+    def parse(self, text: str) -> Any:
+        """Parse YAML, reusing the pickled result for identical content
+
+        Entries are keyed by the content hash, so they also serve files
+        read at a git ref and never need invalidating.
+        """
+        digest = hashlib.sha256(text.encode('utf-8')).hexdigest()
+        parsed_file = self.root_dir / PARSED_CACHE_DIR / f"{digest}.pickle"
+        try:
+            with open(parsed_file, 'rb') as f:
+                return pickle.load(f)
+        except (OSError, pickle.UnpicklingError, EOFError):
+            pass
+
+        document = load_yaml(text)
+        tfcache.write_bytes_atomic(
+            parsed_file, pickle.dumps(document, pickle.HIGHEST_PROTOCOL))
+        return document
+
+    def cache_file(self, path: Path) -> Path:
+        name = hashlib.sha256(
+            f"{path}\0{self.workspace}".encode()).hexdigest()
+        return self.cache_dir / f"{name}.json"
+
+    def load_cached(self, path: Path) -> Optional[dict]:
+        """Cached resolution of path if none of its files changed"""
+        try:
+            with open(self.cache_file(path), 'r') as f:
+                entry = json.load(f)
+        except (OSError, ValueError):
+            return None
+
+        for contributor, digest in entry['files'].items():
+            if self.file_hash(Path(contributor)) != digest:
+                return None
+        return entry
+
+    def resolve(self, config_file) -> dict:
+        """Return the fully merged config for config_file"""
+        return self._resolve(Path(config_file).resolve(), ())['config']
+
+    def files(self, config_file) -> List[Path]:
+        """Every file that contributes to config_file, itself included"""
+        entry = self._resolve(Path(config_file).resolve(), ())
+        return sorted(Path(p) for p in entry['files'])
+
+    def _resolve(self, path: Path, chain: tuple) -> dict:
+        if path in chain:
+            cycle = " -> ".join(str(p) for p in chain + (path,))
+            raise ValueError(f"extends cycle: {cycle}")
+        if path in self.resolved:
+            return self.resolved[path]
+
+        entry = self.load_cached(path) if self.use_cache else None
+        if entry is None:
+            entry = self._build(path, chain + (path,))
+            if self.use_cache:
+                tfcache.write_json_atomic(self.cache_file(path), entry)
+
+        self.resolved[path] = entry
+        return entry
+
+    def _build(self, path: Path, chain: tuple) -> dict:
+        document = self.parse(self.read(path)) or {}
+        if not isinstance(document, dict):
+            raise ValueError(f"{path}: expected a mapping at the top level")
+
+        bases = document.pop(EXTENDS_KEY, None) or []
+        if isinstance(bases, str):
+            bases = [bases]
+        environments = document.pop(ENVIRONMENTS_KEY, None) or {}
+
+        config: dict = {}
+        files = {str(path): self.file_hash(path) if self.use_cache else ""}
+        for base in bases:
+            parent = self._resolve((path.parent / base).resolve(), chain)
+            config = deep_merge(config, parent['config'])
+            files.update(parent['files'])
+
+        config = deep_merge(config, document)
+        overlay = environments.get(self.workspace)
+        if overlay:
+            config = deep_merge(config, overlay)
+
+        # Round trip so a fresh resolution and a cache hit look the same
+        return {'files': files,
+                'config': json.loads(json.dumps(config, default=str))}
+
+
+def load_config(config_file, root_dir: Path,
+                workspace: Optional[str] = None) -> dict:
+    """Resolve a single config"""
+    return ConfigResolver(root_dir, workspace).resolve(config_file)
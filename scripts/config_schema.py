@@ -0,0 +1,409 @@
+"""
+Pre-flight validation of YAML configs against the variables.tf schema
+"""
+
+import argparse
+import json
+import logging
+import re
+import sys
+from pathlib import Path
+from typing import Any, Dict, List, Optional, Tuple
+
+import yaml
+
+import tfcache
+from config_loader import ConfigResolver
+from hcl import Token, decode_string, parse_body, read_expression, tokenize
+from tfoptions import OPTION_KEYS, config_errors
+
+logger = logging.getLogger(__name__)
+
+SCHEMA_CACHE_FILE = Path(".autogcp") / "cache" / "schema.json"
+# Bump when the compiled format changes to invalidate cached schemas
+SCHEMA_VERSION = 1
+
+# Keys read by the scripts themselves and never passed to terraform
+SCRIPT_KEYS = {'terraform_state_bucket', 'terraform_state_prefix'} | OPTION_KEYS
+
+
+def parse_type(tokens: List[Token], pos: int = 0) -> Tuple[Any, int]:
+    """Compile a type constraint into a JSON-friendly description
+
+    Primitive types become their name, collections become
+    [kind, element], objects become ['object', {attr: type}, [optional attrs]]
+    and tuples ['tuple', [types]].
+    """
+    kind, name = tokens[pos]
+    if kind != 'ident':
+        raise ValueError(f"Unexpected {name!r} in type constraint")
+    pos += 1
+
+    if name in ('string', 'number', 'bool', 'any'):
+        return name, pos
+
+    def expect(char: str) -> None:
+        if tokens[pos][1] != char:
+            raise ValueError(f"Expected {char!r} in {name} type, got {tokens[pos][1]!r}")
+
+    expect('(')
+    pos += 1
+    if name in ('list', 'set', 'map'):
+        element, pos = parse_type(tokens, pos)
+        expect(')')
+        return [name, element], pos + 1
+
+    if name == 'tuple':
+        expect('[')
+        pos += 1
+        elements = []
+        while tokens[pos][1] != ']':
+            element, pos = parse_type(tokens, pos)
+            elements.append(element)
+            if tokens[pos][1] == ',':
+                pos += 1
+        pos += 1
+        expect(')')
+        return ['tuple', elements], pos + 1
+
+    if name == 'object':
+        expect('{')
+        pos += 1
+        attributes: Dict[str, Any] = {}
+        optional: List[str] = []
+        while tokens[pos][1] != '}':
+            attr = tokens[pos][1]
+            if tokens[pos + 1][1] != '=':
+                raise ValueError(f"Expected '=' after object attribute {attr!r}")
+            pos += 2
+            if tokens[pos][1] == 'optional':
+                # optional(type) or optional(type, default)
+                attributes[attr], pos = parse_type(tokens, pos + 2)
+                _, pos = read_expression(tokens, pos)
+                pos += 1
+                optional.append(attr)
+            else:
+                attributes[attr], pos = parse_type(tokens, pos)
+            if tokens[pos][1] == ',':
+                pos += 1
+        pos += 1
+        expect(')')
+        return ['object', attributes, optional], pos + 1
+
+    raise ValueError(f"Unknown type {name!r}")
+
+
+def compile_condition(name: str, tokens: List[Token]) -> Optional[dict]:
+    """Translate the validation conditions that have a Python equivalent
+
+    Supported forms are can(regex("...", var.x)) and contains([...], var.x).
+    Anything else is left for terraform to check.
+    """
+    texts = [text for _, text in tokens]
+    var_ref = ['var', '.', name]
+
+    if texts[:4] == ['can', '(', 'regex', '('] and tokens[4][0] == 'string' \
+            and texts[5:] == [','] + var_ref + [')', ')']:
+        return {'regex': decode_string(tokens[4][1])}
+
+    if texts[:3] == ['contains', '(', '['] and texts[-5:] == [','] + var_ref + [')']:
+        allowed = []
+        for kind, text in tokens[3:-6]:
+            if kind == 'string':
+                allowed.append(decode_string(text))
+            elif kind == 'number':
+                allowed.append(float(text))
+            elif text != ',':
+                return None
+        return {'one_of': allowed}
+
+    return None
+
+
+def parse_variables(text: str) -> Dict[str, dict]:
+    """Extract every variable declaration from variables.tf source"""
+    body, _ = parse_body(tokenize(text), 0)
+    variables: Dict[str, dict] = {}
+
+    for block in body['blocks']:
+        if block['type'] != 'variable' or len(block['labels']) != 1:
+            continue
+        name = block['labels'][0]
+        attributes = block['body']['attributes']
+
+        type_tokens = attributes.get('type')
+        var_type = parse_type(type_tokens)[0] if type_tokens else 'any'
+
+        default = attributes.get('default')
+        validations = []
+        for nested in block['body']['blocks']:
+            if nested['type'] != 'validation':
+                continue
+            condition = compile_condition(
+                name, nested['body']['attributes'].get('condition', []))
+            if condition is None:
+                logger.debug(f"Validation of {name} is left to terraform")
+                continue
+            message = nested['body']['attributes'].get('error_message')
+            if message and message[0][0] == 'string':
+                condition['message'] = decode_string(message[0][1])
+            validations.append(condition)
+
+        variables[name] = {
+            'type': var_type,
+            'required': default is None,
+            'validations': validations,
+        }
+
+    return variables
+
+
+def describe(value: Any) -> str:
+    if value is None:
+        return "null"
+    if isinstance(value, bool):
+        return "bool"
+    if isinstance(value, (int, float)):
+        return "number"
+    if isinstance(value, str):
+        return "string"
+    if isinstance(value, list):
+        return "list"
+    if isinstance(value, dict):
+        return "map"
+    return type(value).__name__
+
+
+def check_type(value: Any, var_type: Any, path: str, errors: List[str]) -> None:
+    """Append an error for every place value cannot convert to var_type
+
+    Follows terraform's conversion rules: numbers and bools convert to
+    string, numeric strings to number and "true"/"false" to bool.
+    """
+    if value is None or var_type == 'any':
+        return
+
+    if var_type == 'string':
+        if isinstance(value, (dict, list)):
+            errors.append(f"{path}: expected string, got {describe(value)}")
+    elif var_type == 'number':
+        if isinstance(value, bool) or not isinstance(value, (int, float, str)):
+            errors.append(f"{path}: expected number, got {describe(value)}")
+        elif isinstance(value, str):
+            try:
+                float(value)
+            except ValueError:
+                errors.append(f"{path}: expected number, got {value!r}")
+    elif var_type == 'bool':
+        if not isinstance(value, bool) and value not in ('true', 'false'):
+            errors.append(f"{path}: expected bool, got {describe(value)}")
+    elif var_type[0] in ('list', 'set'):
+        if not isinstance(value, list):
+            errors.append(f"{path}: expected {var_type[0]}, got {describe(value)}")
+            return
+        for index, item in enumerate(value):
+            check_type(item, var_type[1], f"{path}[{index}]", errors)
+    elif var_type[0] == 'map':
+        if not isinstance(value, dict):
+            errors.append(f"{path}: expected map, got {describe(value)}")
+            return
+        for key, item in value.items():
+            check_type(item, var_type[1], f"{path}.{key}", errors)
+    elif var_type[0] == 'tuple':
+        if not isinstance(value, list) or len(value) != len(var_type[1]):
+            errors.append(
+                f"{path}: expected tuple of {len(var_type[1])}, got {describe(value)}")
+            return
+        for index, (item, item_type) in enumerate(zip(value, var_type[1])):
+            check_type(item, item_type, f"{path}[{index}]", errors)
+    elif var_type[0] == 'object':
+        if not isinstance(value, dict):
+            errors.append(f"{path}: expected object, got {describe(value)}")
+            return
+        attributes, optional = var_type[1], var_type[2]
+        for attr, attr_type in attributes.items():
+            if attr in value:
+                check_type(value[attr], attr_type, f"{path}.{attr}", errors)
+            elif attr not in optional:
+                errors.append(f"{path}: missing required attribute {attr!r}")
+
+
+def convert(value: Any, var_type: Any) -> Any:
+    """The value terraform passes to validations after converting to var_type"""
+    if var_type == 'number' and isinstance(value, str):
+        return float(value)
+    if var_type == 'bool' and isinstance(value, str):
+        return value == 'true'
+    if var_type == 'string' and isinstance(value, bool):
+        return 'true' if value else 'false'
+    if var_type == 'string' and isinstance(value, (int, float)):
+        if isinstance(value, float) and not value.is_integer():
+            return repr(value)
+        return str(int(value))
+    return value
+
+
+class ConfigSchema:
+    """Variable declarations of variables.tf compiled for fast checking
+
+    The parsed schema is cached under .autogcp/cache keyed by the hash of
+    variables.tf, so only the first check after an edit parses HCL.
+    """
+
+    def __init__(self, variables: Dict[str, dict]):
+        self.variables = variables
+        self.patterns = {
+            name: [(re.compile(v['regex']), v.get('message'))
+                   for v in spec['validations'] if 'regex' in v]
+            for name, spec in variables.items()
+        }
+
+    @classmethod
+    def load(cls, root_dir: Path) -> 'ConfigSchema':
+        """Load the compiled schema, reparsing variables.tf if it changed"""
+        variables_file = root_dir / "variables.tf"
+        source_hash = tfcache.hash_file(variables_file)
+        cache_file = root_dir / SCHEMA_CACHE_FILE
+
+        try:
+            with open(cache_file, 'r') as f:
+                cached = json.load(f)
+            if cached.get('version') == SCHEMA_VERSION and \
+                    cached.get('source') == source_hash:
+                return cls(cached['variables'])
+        except (OSError, ValueError):
+            pass
+
+        logger.debug(f"Compiling schema from {variables_file}")
+        with open(variables_file, 'r', encoding='utf-8') as f:
+            variables = parse_variables(f.read())
+        tfcache.write_json_atomic(
+            cache_file, {'version': SCHEMA_VERSION, 'source': source_hash,
+                         'variables': variables})
+        return cls(variables)
+
+    def check(self, config: Any) -> Tuple[List[str], List[str]]:
+        """Return (errors, warnings) for one parsed YAML config"""
+        if not isinstance(config, dict):
+            return [f"expected a mapping at the top level, got {describe(config)}"], []
+
+        errors: List[str] = []
+        warnings: List[str] = []
+
+        for name, spec in self.variables.items():
+            if name not in config:
+                if spec['required']:
+                    errors.append(f"{name}: required variable is missing")
+                continue
+
+            value = config[name]
+            if value is None:
+                if spec['required']:
+                    errors.append(f"{name}: required variable is null")
+                continue
+
+            before = len(errors)
+            check_type(value, spec['type'], name, errors)
+            if len(errors) > before:
+                continue
+
+            value = convert(value, spec['type'])
+
+            for pattern, message in self.patterns[name]:
+                if not isinstance(value, str) or not pattern.search(value):
+                    errors.append(f"{name}: {message or f'does not match {pattern.pattern}'}")
+            for validation in spec['validations']:
+                if 'one_of' in validation and value not in validation['one_of']:
+                    errors.append(
+                        f"{name}: {validation.get('message') or 'value not allowed'}")
+
+        errors.extend(config_errors(config))
+
+        for name in config:
+            if name not in self.variables and name not in SCRIPT_KEYS:
+                warnings.append(f"{name}: not declared in variables.tf, terraform will ignore it")
+
+        return errors, warnings
+
+    def check_file(self, config_file: Path,
+                   resolver: ConfigResolver) -> Tuple[List[str], List[str]]:
+        """Resolve and check one YAML file"""
+        try:
+            config = resolver.resolve(config_file)
+        except (OSError, ValueError, yaml.YAMLError) as e:
+            return [f"cannot load: {e}"], []
+        return self.check(config)
+
+
+def validate_configs(root_dir: Path, config_files: List[str],
+                     log: logging.Logger = logger,
+                     workspace: Optional[str] = None) -> bool:
+    """Check every config, logging all problems to log, True if all are valid"""
+    schema = ConfigSchema.load(root_dir)
+    resolver = ConfigResolver(root_dir, workspace)
+    invalid = 0
+
+    for config_file in config_files:
+        errors, warnings = schema.check_file(Path(config_file), resolver)
+        for warning in warnings:
+            log.warning(f"{config_file}: {warning}")
+        for error in errors:
+            log.error(f"{config_file}: {error}")
+        if errors:
+            invalid += 1
+
+    if invalid:
+        log.error(f"{invalid} of {len(config_files)} configs failed validation")
+    else:
+        log.info(f"All {len(config_files)} configs match variables.tf")
+    return not invalid
+
+
+def main():
+    """Main entry point"""
+    parser = argparse.ArgumentParser(
+        description='Validate YAML configs against variables.tf without running terraform',
+        formatter_class=argparse.RawDescriptionHelpFormatter,
+        epilog="""
+Examples:
+  python config_schema.py ../configs/example-project.yaml
+  python config_schema.py ../configs/*.yaml
+        """
+    )
+
+    parser.add_argument(
+        'configs',
+        help='Path to one or more YAML configuration files',
+        nargs='+'
+    )
+
+    parser.add_argument(
+        '-w', '--workspace',
+        help='Workspace whose environments: overlays to apply'
+    )
+
+    parser.add_argument(
+        '-v', '--verbose',
+        help='Enable verbose/debug logging',
+        action='store_true'
+    )
+
+    args = parser.parse_args()
+
+    logging.basicConfig(
+        level=logging.DEBUG if args.verbose else logging.INFO,
+        format='%(asctime)s - %(levelname)s - %(message)s'
+    )
+
+    try:
+        valid = validate_configs(Path(__file__).parent.parent, args.configs,
+                                 workspace=args.workspace)
+    except Exception as e:
+        logger.error(f"Schema validation failed: {e}")
+        sys.exit(1)
+
+    sys.exit(0 if valid else 1)
+
+
+if __name__ == "__main__":
+    main()
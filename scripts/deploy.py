@@ -4,52 +4,93 @@ Automates Terraform deployment from YAML configuration with safety checks
 
 import yaml
 import json
-import subprocess
 import sys
 import os
 import argparse
 import logging
+import threading
+from concurrent.futures import ThreadPoolExecutor, as_completed
 from pathlib import Path
 from datetime import datetime
-from typing import Optional
-
-# Configure logging
-logging_dir = Path(__file__).parent / "logs"
-logging_dir.mkdir(exist_ok=True)
+from typing import Callable, Dict, List, Optional
+
+import logsetup
+import tfcache
+import tfrunner
+from changes import affected_configs
+from config_loader import ConfigResolver, load_config
+from config_schema import ConfigSchema, validate_configs
+from plan_summary import summarize_plan
+from fmt_check import FormatChecker
+from instrument import RunReport
+from plugin_cache import PluginCache
+from quota import ApiScheduler, config_apis, parse_budgets
+from tfgraph import ModuleGraph
+from tfoptions import (Parallelism, RunOptions, parse_lock_timeout,
+                       parse_parallelism)
+from tfstate import StateSnapshot
+from workdir import (TFVARS_FILE, TerraformWorkDir, check_distinct_projects,
+                     link_work_dir, project_work_dir, tfvars_values,
+                     write_tfvars)
 
 logger = logging.getLogger(__name__)
-logger.setLevel(logging.DEBUG)
-
-log_fmt = logging.Formatter('%(asctime)s - %(levelname)s - %(message)s')
-
-file_handler = logging.FileHandler(
-    f'{logging_dir}/deploy_{datetime.now().strftime("%Y%m%d_%H%M%S")}.log'
-)
-file_handler.setLevel(logging.DEBUG)
-file_handler.setFormatter(log_fmt)
-logger.addHandler(file_handler)
 
-console_handler = logging.StreamHandler()
-console_handler.setLevel(logging.INFO)
-console_handler.setFormatter(log_fmt)
-logger.addHandler(console_handler)
+# Config of the last successful apply, per project and workspace
+APPLIED_DIR = Path(".autogcp") / "applied"
 
 
-class TerraformDeployer:
+class TerraformDeployer(TerraformWorkDir):
     """Handles Terraform deployment operations"""
 
     def __init__(self, config_file: str, workspace: Optional[str] = None,
-                 auto_approve: bool = False, dry_run: bool = False):
+                 auto_approve: bool = False, dry_run: bool = False,
+                 isolated: bool = False, reinit: bool = False,
+                 offline: Optional[bool] = None, use_plan_cache: bool = True,
+                 timeout: Optional[float] = None,
+                 trace_file: Optional[str] = None,
+                 use_validate_cache: bool = True, targeted: bool = False,
+                 parallelism: Parallelism = None, refresh: Optional[bool] = None,
+                 lock_timeout: Optional[str] = None):
         self.config_file = Path(config_file)
         self.workspace = workspace
         self.auto_approve = auto_approve
         self.dry_run = dry_run
+        self.isolated = isolated
+        self.reinit = reinit
+        self.plugin_cache = PluginCache(offline=offline)
+        self.timeout = timeout
         self.script_dir = Path(__file__).parent
         self.root_dir = self.script_dir.parent
-        self.tfvars_file = self.root_dir / "terraform.tfvars"
+        self.work_dir = self.root_dir
+        self.tfvars_file = self.work_dir / TFVARS_FILE
         self.backends_dir = self.root_dir / "backends"
+        self.reports_dir = self.root_dir / ".autogcp" / "reports"
+        self.report = RunReport('deploy', str(config_file), workspace, trace_file)
+        self.use_plan_cache = use_plan_cache
+        self.use_validate_cache = use_validate_cache
+        self.targeted = targeted
+        self.cli_options = (parallelism, refresh, lock_timeout)
+        self.options = RunOptions()
+        self.state: Optional[StateSnapshot] = None
+        # Called with every output line, e.g. to spot rate limit errors
+        self.output_watchers: List[Callable[[str], None]] = []
+        self.last_returncode = None
         self.config = None
 
+    def prepare_work_dir(self) -> bool:
+        """Create an isolated per-project working directory"""
+        self.work_dir = project_work_dir(self.root_dir, self.config['project_id'])
+        self.tfvars_file = self.work_dir / TFVARS_FILE
+        logger.debug(f"Preparing working directory: {self.work_dir}")
+
+        try:
+            link_work_dir(self.root_dir, self.work_dir)
+            return True
+
+        except OSError as e:
+            logger.error(f"Error preparing working directory: {e}")
+            return False
+
     def validate_prerequisites(self) -> bool:
         """Validate required tools and files exist"""
         logger.debug("Validating prerequisites...")
@@ -75,8 +116,9 @@ class TerraformDeployer:
         logger.debug(f"Loading configuration from {self.config_file}")
 
         try:
-            with open(self.config_file, 'r') as f:
-                self.config = yaml.safe_load(f)
+            self.config = load_config(
+                self.config_file, self.root_dir, self.workspace)
+            self.options = RunOptions.from_config(self.config, *self.cli_options)
 
             # Validate required fields
             required_fields = ['project_id', 'billing_account']
@@ -88,6 +130,16 @@ class TerraformDeployer:
                     f"Missing required fields: {', '.join(missing_fields)}")
                 return False
 
+            errors, warnings = ConfigSchema.load(self.root_dir).check(self.config)
+            for warning in warnings:
+                logger.warning(f"  {warning}")
+            if errors:
+                logger.error("Configuration does not match variables.tf:")
+                for error in errors:
+                    logger.error(f"  {error}")
+                return False
+
+            logsetup.set_project(self.config['project_id'])
             logger.info(f"Configuration loaded successfully")
             logger.info(f"  Project ID: {self.config['project_id']}")
 
@@ -100,129 +152,72 @@ class TerraformDeployer:
             logger.error(f"Error loading config: {e}")
             return False
 
+    def tfvars_values(self) -> Dict:
+        """The config as terraform sees it, without script-only keys"""
+        return tfvars_values(self.config)
+
     def generate_tfvars(self) -> bool:
-        """Generate Terraform variables file from YAML config"""
+        """Generate the Terraform variables file from YAML config"""
         logger.debug(f"Generating {self.tfvars_file}")
 
         try:
-            with open(self.tfvars_file, 'w') as f:
-                for key, value in self.config.items():
-                    if isinstance(value, (dict, list)):
-                        f.write(f'{key} = {json.dumps(value, indent=2)}\n\n')
-                    elif isinstance(value, str):
-                        f.write(f'{key} = "{value}"\n')
-                    elif isinstance(value, bool):
-                        f.write(f'{key} = {str(value).lower()}\n')
-                    else:
-                        f.write(f'{key} = {value}\n')
-
-            logger.debug(f"Generated {self.tfvars_file}")
+            if write_tfvars(self.work_dir, self.config):
+                logger.debug(f"Generated {self.tfvars_file}")
+            else:
+                logger.debug(f"{self.tfvars_file} is up to date")
             return True
 
         except Exception as e:
             logger.error(f"Error generating tfvars: {e}")
             return False
 
-    def generate_backend_config(self) -> Path:
-        """Generate unique backend config with smart defaults"""
-        logger.debug("Generating backend configuration")
-
-        self.backends_dir.mkdir(exist_ok=True)
-
-        # Defaults if not specified in YAML
-        default_bucket = f"konecta-autogcp-terraform-state-bucket"
-        default_prefix = f"projects/{self.config['project_id']}"
-
-        # Use config values or fall back to defaults
-        state_bucket = self.config.get(
-            'terraform_state_bucket', default_bucket)
-        state_prefix = self.config.get(
-            'terraform_state_prefix', default_prefix)
-
-        backend_file = self.backends_dir / \
-            f"{self.config['project_id']}.backend.conf"
-
-        backend_config = f'bucket = "{state_bucket}"\nprefix = "{state_prefix}"'
-
-        with open(backend_file, 'w') as f:
-            f.write(backend_config)
-
-        logger.debug(f"Backend config created: {backend_file}")
-        logger.debug(f"Bucket: {state_bucket}")
-        logger.debug(f"Prefix: {state_prefix}")
-
-        # Warn if using defaults
-        if 'terraform_state_bucket' not in self.config:
-            logger.warning(f"Using default bucket: {state_bucket}")
-
-        if 'terraform_state_prefix' not in self.config:
-            logger.debug(f"Using default prefix: {state_prefix}")
-
-        logger.info(
-            f"State location: gs://{state_bucket}/{state_prefix}/default.tfstate")
+    def run_terraform_command(self, command: list, check: bool = True,
+                              success_codes: tuple = (0,)) -> bool:
+        """Execute Terraform command with error handling
 
-        return backend_file
-
-    def run_terraform_command(self, command: list, check: bool = True) -> bool:
-        """Execute Terraform command with error handling"""
+        Output is streamed as it arrives, stdout at info level and stderr
+        at warning level. With check=False a failure is only a warning.
+        The exit code is kept in self.last_returncode for callers that need
+        to tell apart successful outcomes, e.g. plan -detailed-exitcode.
+        """
         cmd_str = ' '.join(command)
         logger.info(f"Running: terraform {cmd_str}")
 
-        try:
-            if "apply" in command:
-                process = subprocess.Popen(
-                    ['terraform'] + command,
-                    cwd=self.root_dir,
-                    stdout=subprocess.PIPE,
-                    stderr=subprocess.STDOUT,
-                    text=True,
-                    bufsize=1
-                )
-                for line in process.stdout:
-                    # stream directly to console
-                    logger.info(f"   {line.strip()}")
-                process.wait()
-
-                if process.returncode == 0:
-                    logger.info("Command completed successfully")
-                    return True
-                else:
-                    logger.error(
-                        f"Command failed with exit code {process.returncode}")
-                    return False
-            else:
-                result = subprocess.run(
-                    ['terraform'] + command,
-                    cwd=self.root_dir,
-                    capture_output=True,
-                    text=True,
-                    check=check
-                )
-
-                if result.stdout:
-                    for line in result.stdout.splitlines():
-                        logger.info(f"   {line}")
-
-                if result.returncode == 0:
-                    logger.info(f"Command completed successfully")
-                    return True
-                else:
-                    if result.stderr:
-                        for line in result.stderr.splitlines():
-                            logger.error(f"   {line}")
-                    logger.error(
-                        f"Command failed with exit code {result.returncode}")
-                    return False
+        def on_stdout(line: str) -> None:
+            logger.info(f"   {line}")
+            for watch in self.output_watchers:
+                watch(line)
 
-        except subprocess.CalledProcessError as e:
-            logger.error(f"Terraform command failed: {e}")
-            if e.stderr:
-                logger.error(e.stderr)
+        def on_stderr(line: str) -> None:
+            logger.warning(f"   {line}")
+            for watch in self.output_watchers:
+                watch(line)
+
+        try:
+            returncode = tfrunner.stream_command(
+                ['terraform'] + command,
+                cwd=self.work_dir,
+                env=self.plugin_cache.env(),
+                on_stdout=on_stdout,
+                on_stderr=on_stderr,
+                timeout=self.step_timeout(command)
+            )
+        except tfrunner.CommandStopped as e:
+            logger.error(f"Command stopped: {e}")
             return False
         except Exception as e:
             logger.error(f"Unexpected error: {e}")
             return False
 
+        self.last_returncode = returncode
+        if returncode in success_codes:
+            logger.info("Command completed successfully")
+            return True
+
+        log_failure = logger.error if check else logger.warning
+        log_failure(f"Command failed with exit code {returncode}")
+        return False
+
     def select_workspace(self) -> bool:
         """Select or create Terraform workspace"""
         if not self.workspace:
@@ -232,74 +227,329 @@ class TerraformDeployer:
         logger.info(f"Selecting workspace: {self.workspace}")
 
         # List existing workspaces
-        result = subprocess.run(
+        _, stdout, _ = tfrunner.capture_command(
             ['terraform', 'workspace', 'list'],
-            cwd=self.root_dir,
-            capture_output=True,
-            text=True
+            cwd=self.work_dir,
+            env=self.plugin_cache.env(),
+            timeout=self.step_timeout(['workspace'])
         )
 
-        if self.workspace in result.stdout:
+        if self.workspace in stdout:
             return self.run_terraform_command(['workspace', 'select', self.workspace])
         else:
             logger.info(f"Creating new workspace: {self.workspace}")
             return self.run_terraform_command(['workspace', 'new', self.workspace])
 
+    def validate_configuration(self) -> bool:
+        """Run terraform validate once per source tree and provider lock
+
+        The result does not depend on the YAML config, so it is shared by
+        every project. In a fleet run the first project to reach this step
+        validates while the others wait for its result.
+        """
+        if not self.use_validate_cache:
+            return self.run_terraform_command(['validate'])
+
+        key = tfcache.validate_cache_key(
+            self.root_dir, self.work_dir / ".terraform.lock.hcl")
+
+        with tfcache.file_lock(tfcache.validate_lock_file(self.root_dir, key)):
+            if tfcache.load_validate_result(self.root_dir, key):
+                logger.info("Sources and providers already validated, skipping")
+                return True
+
+            if not self.run_terraform_command(['validate']):
+                return False
+
+            tfcache.save_validate_result(self.root_dir, key, {
+                'valid': True,
+                'validated_at': datetime.now().isoformat(),
+            })
+
+        return True
+
+    def applied_config_file(self) -> Path:
+        """Where the config of the last successful apply is recorded"""
+        return self.root_dir / APPLIED_DIR / self.config['project_id'] / \
+            f"{self.workspace or 'default'}.json"
+
+    def record_applied(self) -> None:
+        """Remember the config and sources the infrastructure now matches"""
+        try:
+            tfcache.write_json_atomic(self.applied_config_file(), {
+                'config': self.tfvars_values(),
+                'sources': tfcache.hash_files(
+                    tfcache.source_files(self.root_dir), self.root_dir),
+                'applied_at': datetime.now().isoformat(),
+            })
+        except OSError as e:
+            logger.warning(f"Could not record applied config: {e}")
+
+    def plan_targets(self) -> Optional[List[str]]:
+        """Module addresses to plan, None to plan everything
+
+        Diffs the config against the last applied one and maps the changed
+        keys to the modules that read them, adding the modules that
+        consume their outputs. Terraform adds the dependencies of each
+        target on its own.
+        """
+        try:
+            with open(self.applied_config_file(), 'r') as f:
+                applied = json.load(f)
+        except (OSError, ValueError):
+            logger.info("No record of a previous apply, planning everything")
+            return None
+
+        sources = tfcache.hash_files(
+            tfcache.source_files(self.root_dir), self.root_dir)
+        if applied.get('sources') != sources:
+            logger.info("Terraform sources changed since the last apply, planning everything")
+            return None
+
+        previous = applied.get('config', {})
+        current = self.tfvars_values()
+        changed = sorted(key for key in previous.keys() | current.keys()
+                         if previous.get(key) != current.get(key))
+        if not changed:
+            logger.info("Config unchanged since the last apply, planning everything")
+            return None
+
+        logger.info(f"Changed since the last apply: {', '.join(changed)}")
+        try:
+            graph = ModuleGraph.load(self.root_dir)
+        except (OSError, ValueError) as e:
+            logger.warning(f"Could not read module wiring from the root module: {e}")
+            return None
+
+        modules = graph.modules_for(changed)
+        if modules is None:
+            logger.info("A changed key is not limited to modules, planning everything")
+            return None
+
+        return sorted(f"module.{m}" for m in graph.with_dependents(modules))
+
+    def check_format(self) -> bool:
+        """Warn about unformatted .tf files without modifying the tree"""
+        checker = FormatChecker(self.root_dir, self.plugin_cache.env())
+        try:
+            unformatted = checker.check()
+        except Exception as e:
+            logger.warning(f"Format check failed: {e}")
+            return False
+
+        for relative in unformatted:
+            logger.warning(f"Not formatted: {relative} (run ./autogcp fmt-check --fix)")
+        return not unformatted
+
+    def summarize_plan(self) -> bool:
+        """Log a per-module change summary and save it as JSON"""
+        summary_file = self.root_dir / ".autogcp" / "summaries" / \
+            f"{self.config['project_id']}.json"
+
+        try:
+            summary = summarize_plan(
+                self.work_dir, 'tfplan',
+                env=self.plugin_cache.env(),
+                on_stderr=lambda line: logger.warning(f"   {line}"),
+                timeout=self.step_timeout(['show'])
+            )
+            summary.write(summary_file)
+        except Exception as e:
+            logger.warning(f"Could not summarize plan: {e}")
+            return False
+
+        for line in summary.lines():
+            logger.info(line)
+        logger.debug(f"Plan summary written to {summary_file}")
+        return True
+
+    def plan_cache_key(self, backend_config_file: Path) -> Optional[str]:
+        """Key for the plan result cache, None when it cannot be used"""
+        if not self.use_plan_cache:
+            return None
+
+        try:
+            state = self.load_state()
+        except Exception as e:
+            logger.debug(f"Plan cache disabled, could not read state: {e}")
+            return None
+
+        return tfcache.plan_cache_key(
+            self.root_dir, self.tfvars_file, backend_config_file,
+            self.workspace, state.key)
+
+    def store_plan(self, plan_key: str) -> bool:
+        """Keep the saved plan so a later apply can skip planning"""
+        try:
+            tfcache.save_plan_artifact(
+                self.root_dir, plan_key, self.work_dir / "tfplan", {
+                    'project_id': self.config['project_id'],
+                    'workspace': self.workspace or "default",
+                    'no_changes': False,
+                    'planned_at': datetime.now().isoformat(),
+                }, f"{self.config['project_id']}/{self.workspace or 'default'}")
+        except OSError as e:
+            logger.warning(f"Could not store plan: {e}")
+            return False
+        logger.info("Plan stored, apply reuses it while inputs and state are unchanged")
+        return True
+
+    def restore_plan(self, plan_key: str, cached: dict) -> bool:
+        """Put a stored plan with this key in place of a fresh plan"""
+        if not tfcache.load_plan_artifact(
+                self.root_dir, plan_key, cached, self.work_dir / "tfplan"):
+            logger.warning("Stored plan is missing or damaged, planning again")
+            tfcache.drop_plan_artifact(self.root_dir, plan_key)
+            return False
+        logger.info(f"Reusing the plan stored at {cached['planned_at']}, "
+                    "inputs, modules and state are unchanged")
+        return True
+
     def deploy(self) -> bool:
-        """Execute full deployment workflow"""
-        logger.info("=" * 70)
-        logger.info("Starting AutoGCP Deployment")
-        logger.info("=" * 70)
+        """Execute full deployment workflow and write its timing report"""
+        success = False
+        try:
+            success = self.run_deployment()
+            return success
+        finally:
+            self.write_report(success)
+
+    def write_report(self, success: bool) -> None:
+        """Finish the timing report and write it next to other run data"""
+        self.report.finish(success)
+        if self.config:
+            self.report.project_id = self.config.get('project_id')
+
+        logger.info("Step timings:")
+        for line in self.report.summary_lines():
+            logger.info(line)
+
+        try:
+            report_file = self.report.write(self.reports_dir)
+            logger.debug(f"Run report written to {report_file}")
+        except OSError as e:
+            logger.warning(f"Could not write run report: {e}")
+        logsetup.set_project(None)
+
+    def prepare(self) -> Optional[Path]:
+        """Steps up to an initialized, selected workspace
+
+        Returns the backend config file, None when a step failed. Running
+        only these keeps a work dir warm for later plans.
+        """
+        report = self.report
 
         # Step 1: Validate prerequisites
-        if not self.validate_prerequisites():
-            return False
+        if not report.call('prereq_validation', self.validate_prerequisites):
+            return None
 
         # Step 2: Load configuration
-        if not self.load_yaml_config():
-            return False
+        if not report.call('yaml_load', self.load_yaml_config):
+            return None
 
         # Step 3: Generate tfvars
-        if not self.generate_tfvars():
-            return False
+        if self.isolated and \
+                not report.call('work_dir', self.prepare_work_dir):
+            return None
+
+        if not report.call('tfvars_generation', self.generate_tfvars):
+            return None
 
         # Step 4: Initialize Terraform
         logger.info("=" * 70)
         logger.info("Initializing Terraform")
         logger.info("=" * 70)
         backend_config_file = self.generate_backend_config()
-        if not self.run_terraform_command([
-            'init',
-            '-reconfigure',
-            f'-backend-config={backend_config_file}'
-        ]):
-            return False
+        if not report.call('init', self.initialize, backend_config_file):
+            return None
 
         # Step 5: Select workspace
-        if not self.select_workspace():
+        if not report.call('workspace_select', self.select_workspace):
+            return None
+
+        report.call('tune', self.tune)
+        return backend_config_file
+
+    def run_deployment(self) -> bool:
+        """Run every deployment step, timing each one"""
+        report = self.report
+
+        logger.info("=" * 70)
+        logger.info("Starting AutoGCP Deployment")
+        logger.info("=" * 70)
+
+        backend_config_file = self.prepare()
+        if backend_config_file is None:
             return False
 
         # Step 6: Validate configuration
         logger.info("=" * 70)
         logger.info("Validating Configuration")
         logger.info("=" * 70)
-        if not self.run_terraform_command(['validate']):
+        if not report.call('validate', self.validate_configuration):
             return False
 
-        # Step 7: Format step
-        logger.info("=" * 70)
-        logger.info("Formatting Code")
-        logger.info("=" * 70)
-        self.run_terraform_command(['fmt', '-recursive'], check=False)
+        # Step 7: Format check
+        report.call('fmt', self.check_format)
 
         # Step 8: Plan
         logger.info("=" * 70)
         logger.info("Creating Execution Plan")
         logger.info("=" * 70)
-        if not self.run_terraform_command(['plan', '-out=tfplan']):
-            return False
+        targets = None
+        with report.step('plan') as step:
+            plan_key = self.plan_cache_key(backend_config_file)
+            cached = plan_key and tfcache.load_plan_result(self.root_dir, plan_key)
+            if cached and cached.get('no_changes'):
+                step['status'] = 'cached'
+                logger.info(
+                    "No changes. Inputs, modules and state match a previous plan.")
+                logger.info("=" * 70)
+                logger.info("Deployment Up To Date")
+                logger.info("=" * 70)
+                return True
+
+            reused = bool(cached) and self.restore_plan(plan_key, cached)
+            if reused:
+                step['status'] = 'reused'
+                self.last_returncode = 2
+            else:
+                plan_command = ['plan', '-detailed-exitcode', '-out=tfplan'] + \
+                    self.options.args_for('plan')
+                targets = self.plan_targets() if self.targeted else None
+                if targets:
+                    logger.info(f"Planning only: {', '.join(targets)}")
+                    plan_command.extend(f"-target={target}" for target in targets)
+                    step['targets'] = targets
+
+                if not self.run_terraform_command(plan_command, success_codes=(0, 2)):
+                    step['status'] = 'failed'
+                    return False
+
+        # A targeted or unrefreshed plan says nothing about the rest
+        storable = plan_key and not reused and not targets and self.options.refresh
+
+        if self.last_returncode == 0:
+            if storable:
+                tfcache.save_plan_result(self.root_dir, plan_key, {
+                    'project_id': self.config['project_id'],
+                    'workspace': self.workspace or "default",
+                    'no_changes': True,
+                    'planned_at': datetime.now().isoformat(),
+                })
+            if self.dry_run:
+                logger.info("Dry run mode - skipping apply step")
+            else:
+                if not targets:
+                    self.record_applied()
+                logger.info("No changes to apply")
+            return True
+
+        report.call('plan_summary', self.summarize_plan)
 
         if self.dry_run:
+            if storable:
+                report.call('plan_store', self.store_plan, plan_key)
             logger.info("Dry run mode - skipping apply step")
             return True
 
@@ -310,21 +560,34 @@ class TerraformDeployer:
 
         if not self.auto_approve:
             logger.info("Please review the plan above.")
-            response = input(
-                "\nApply these changes? (yes/no): ").strip().lower()
+            logsetup.flush()
+            with report.step('approval'):
+                response = input(
+                    "\nApply these changes? (yes/no): ").strip().lower()
             if response != 'yes':
+                if storable:
+                    report.call('plan_store', self.store_plan, plan_key)
                 logger.info("Deployment cancelled by user")
                 return False
 
         logger.info("Applying infrastructure changes...")
-        if not self.run_terraform_command(['apply', 'tfplan']):
+        apply_command = ['apply'] + self.options.args_for('apply') + ['tfplan']
+        applied = report.call('apply', self.run_terraform_command, apply_command)
+        if plan_key:
+            # Applied or not, the state has likely moved past this plan
+            tfcache.drop_plan_artifact(self.root_dir, plan_key)
+        if not applied:
+            if reused:
+                logger.error("The stored plan could not be applied, "
+                             "the next run plans again")
             return False
+        self.record_applied()
 
         # Step 10: Show outputs
         logger.info("=" * 70)
         logger.info("Deployment Outputs")
         logger.info("=" * 70)
-        self.run_terraform_command(['output'])
+        report.call('output', self.run_terraform_command, ['output'])
 
         logger.info("=" * 70)
         logger.info("Deployment Completed Successfully!")
@@ -333,6 +596,114 @@ class TerraformDeployer:
         return True
 
 
+def deploy_fleet(config_files: List[str], parallel: int = 1,
+                 workspace: Optional[str] = None, auto_approve: bool = False,
+                 dry_run: bool = False, reinit: bool = False,
+                 offline: Optional[bool] = None,
+                 use_plan_cache: bool = True,
+                 timeout: Optional[float] = None,
+                 trace_file: Optional[str] = None,
+                 use_validate_cache: bool = True,
+                 targeted: bool = False,
+                 parallelism: Parallelism = None,
+                 refresh: Optional[bool] = None,
+                 lock_timeout: Optional[str] = None,
+                 api_budgets: Optional[Dict[str, int]] = None) -> bool:
+    """Deploy several configs concurrently in isolated working directories
+
+    Workers take configs from an ApiScheduler, which starts a deployment
+    only while every API it touches is under its concurrency budget.
+    """
+    root_dir = Path(__file__).parent.parent
+
+    # Catch config errors before any terraform process starts
+    if not validate_configs(root_dir, config_files, logger, workspace):
+        return False
+
+    resolver = ConfigResolver(root_dir, workspace)
+    configs = {config_file: resolver.resolve(config_file)
+               for config_file in config_files}
+
+    if not check_distinct_projects(configs, logger):
+        return False
+
+    scheduler = ApiScheduler(parallel, api_budgets, logger)
+    for config_file in config_files:
+        apis = config_apis(configs[config_file])
+        logger.debug(f"{config_file} uses {', '.join(sorted(apis))}")
+        scheduler.add(config_file, apis)
+
+    logger.info("=" * 70)
+    logger.info(
+        f"Deploying {len(config_files)} configs with {parallel} workers")
+    logger.info("=" * 70)
+
+    logsetup.use_thread_format()
+    logsetup.split_project_logs()
+
+    def run(config_file: str) -> bool:
+        threading.current_thread().name = Path(config_file).stem
+        deployer = TerraformDeployer(
+            config_file=config_file,
+            workspace=workspace,
+            auto_approve=auto_approve,
+            dry_run=dry_run,
+            isolated=True,
+            reinit=reinit,
+            offline=offline,
+            use_plan_cache=use_plan_cache,
+            timeout=timeout,
+            trace_file=trace_file,
+            use_validate_cache=use_validate_cache,
+            targeted=targeted,
+            parallelism=parallelism,
+            refresh=refresh,
+            lock_timeout=lock_timeout
+        )
+        deployer.output_watchers.append(scheduler.watcher(config_file))
+        return deployer.deploy()
+
+    results: Dict[str, bool] = {}
+
+    def work() -> None:
+        while True:
+            config_file = scheduler.next()
+            if config_file is None:
+                return
+            try:
+                results[config_file] = run(config_file)
+            except Exception as e:
+                logger.error(f"{config_file}: unexpected error: {e}")
+                results[config_file] = False
+            finally:
+                scheduler.release(config_file)
+
+    with ThreadPoolExecutor(max_workers=parallel) as executor:
+        futures = [executor.submit(work) for _ in range(parallel)]
+        try:
+            for future in as_completed(futures):
+                future.result()
+        except KeyboardInterrupt:
+            logger.warning("Interrupted, stopping running terraform processes")
+            scheduler.cancel()
+            tfrunner.shutdown()
+            raise
+
+    logger.info("=" * 70)
+    logger.info("Fleet Deployment Summary")
+    logger.info("=" * 70)
+    for config_file in config_files:
+        status = "OK" if results[config_file] else "FAILED"
+        logger.info(f"  {status:<8}{config_file}")
+
+    failed = [c for c in config_files if not results[c]]
+    if failed:
+        logger.error(f"{len(failed)} of {len(config_files)} deployments failed")
+        return False
+
+    return True
+
+
 def main():
     """Main entry point"""
     parser = argparse.ArgumentParser(
@@ -343,12 +714,115 @@ Examples:
   python deploy.py config.yaml
   python deploy.py config.yaml --workspace dev --auto-approve
   python deploy.py config.yaml --workspace prod --quiet
+  python deploy.py configs/*.yaml --parallel 4 --auto-approve
+  python deploy.py configs/*.yaml --parallel 8 --api-budget compute.googleapis.com=2 --auto-approve
+  python deploy.py configs/*.yaml --changed-since origin/main --list-changed
+  python deploy.py config.yaml --targeted --auto-approve
         """
     )
 
     parser.add_argument(
-        'config',
-        help='Path to YAML configuration file'
+        'configs',
+        nargs='+',
+        metavar='config',
+        help='Path to YAML configuration file (several for a fleet deployment)'
+    )
+
+    parser.add_argument(
+        '--reinit',
+        help='Always run terraform init -reconfigure',
+        action='store_true'
+    )
+
+    parser.add_argument(
+        '--timeout',
+        help='Seconds before a terraform step is interrupted (default: per-step limits, none for plan/apply)',
+        type=float,
+        default=None
+    )
+
+    parser.add_argument(
+        '--trace-file',
+        help='Append OpenTelemetry-style JSON spans for every step to this file',
+        default=None
+    )
+
+    parser.add_argument(
+        '--parallelism',
+        help="Concurrent terraform operations, or 'auto' to size it from the state (overrides terraform_parallelism)",
+        type=parse_parallelism,
+        default=None
+    )
+
+    parser.add_argument(
+        '--no-refresh',
+        help='Plan with -refresh=false (overrides terraform_refresh)',
+        action='store_const',
+        const=False,
+        dest='refresh'
+    )
+
+    parser.add_argument(
+        '--lock-timeout',
+        help='How long to wait for the state lock, e.g. 5m (overrides terraform_lock_timeout)',
+        type=parse_lock_timeout,
+        default=None
+    )
+
+    parser.add_argument(
+        '--offline',
+        help='Install providers only from the local plugin cache',
+        action='store_true',
+        default=None
+    )
+
+    parser.add_argument(
+        '--no-plan-cache',
+        help='Always run a full plan, even if a cached result says no changes',
+        action='store_false',
+        dest='plan_cache'
+    )
+
+    parser.add_argument(
+        '--targeted',
+        help='Plan only the modules affected by config changes since the last apply',
+        action='store_true'
+    )
+
+    parser.add_argument(
+        '--no-validate-cache',
+        help='Always run terraform validate, even for already validated sources',
+        action='store_false',
+        dest='validate_cache'
+    )
+
+    parser.add_argument(
+        '--api-budget',
+        help='Most deployments that may use an API at once in a fleet run, '
+             'e.g. compute.googleapis.com=2 (can be used multiple times)',
+        action='append',
+        default=[],
+        metavar='API=N'
+    )
+
+    parser.add_argument(
+        '--changed-since',
+        metavar='REF',
+        help='Only deploy configs affected by changes since this git ref',
+        default=None
+    )
+
+    parser.add_argument(
+        '--list-changed',
+        help='Print the configs affected by --changed-since and exit',
+        action='store_true'
+    )
+
+    parser.add_argument(
+        '-p', '--parallel',
+        help='Number of configs to deploy concurrently',
+        type=int,
+        default=1
     )
 
     parser.add_argument(
@@ -385,24 +859,92 @@ Examples:
 
     args = parser.parse_args()
 
+    if args.parallel < 1:
+        parser.error("--parallel must be at least 1")
+
+    try:
+        api_budgets = parse_budgets(args.api_budget)
+    except ValueError as e:
+        parser.error(f"--api-budget: {e}")
+
+    if args.list_changed and not args.changed_since:
+        parser.error("--list-changed requires --changed-since")
+
     if args.quiet:
-        console_handler.setLevel(logging.WARNING)
+        logsetup.setup_logging('deploy', logging.WARNING)
     elif args.verbose:
-        console_handler.setLevel(logging.DEBUG)
+        logsetup.setup_logging('deploy', logging.DEBUG)
     else:
-        console_handler.setLevel(logging.INFO)
-
-    # Create deployer instance
-    deployer = TerraformDeployer(
-        config_file=args.config,
-        workspace=args.workspace,
-        auto_approve=args.auto_approve,
-        dry_run=args.dry_run
-    )
+        logsetup.setup_logging('deploy', logging.INFO)
+
+    if args.changed_since:
+        try:
+            affected = affected_configs(
+                Path(__file__).parent.parent, args.configs, args.changed_since,
+                args.workspace)
+        except Exception as e:
+            logger.error(f"Change detection failed: {e}")
+            sys.exit(1)
+
+        if args.list_changed:
+            for config_file in affected:
+                print(config_file)
+            sys.exit(0)
+
+        for config_file, reasons in affected.items():
+            logger.info(f"{config_file}: {', '.join(reasons)}")
+
+        if not affected:
+            logger.info(
+                f"No configs affected by changes since {args.changed_since}")
+            sys.exit(0)
+
+        args.configs = list(affected)
+
+    fleet = len(args.configs) > 1 or args.parallel > 1
+    if fleet and not (args.auto_approve or args.dry_run):
+        parser.error(
+            "deploying several configs requires --auto-approve or --dry-run")
 
     # Execute deployment
     try:
-        success = deployer.deploy()
+        if fleet:
+            success = deploy_fleet(
+                args.configs,
+                parallel=args.parallel,
+                workspace=args.workspace,
+                auto_approve=args.auto_approve,
+                dry_run=args.dry_run,
+                reinit=args.reinit,
+                offline=args.offline,
+                use_plan_cache=args.plan_cache,
+                timeout=args.timeout,
+                trace_file=args.trace_file,
+                use_validate_cache=args.validate_cache,
+                targeted=args.targeted,
+                parallelism=args.parallelism,
+                refresh=args.refresh,
+                lock_timeout=args.lock_timeout,
+                api_budgets=api_budgets
+            )
+        else:
+            deployer = TerraformDeployer(
+                config_file=args.configs[0],
+                workspace=args.workspace,
+                auto_approve=args.auto_approve,
+                dry_run=args.dry_run,
+                reinit=args.reinit,
+                offline=args.offline,
+                use_plan_cache=args.plan_cache,
+                timeout=args.timeout,
+                trace_file=args.trace_file,
+                use_validate_cache=args.validate_cache,
+                targeted=args.targeted,
+                parallelism=args.parallelism,
+                refresh=args.refresh,
+                lock_timeout=args.lock_timeout
+            )
+            success = deployer.deploy()
         sys.exit(0 if success else 1)
     except KeyboardInterrupt:
         logger.warning("\nDeployment interrupted by user")
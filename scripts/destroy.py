@@ -3,73 +3,66 @@ Safely destroys Terraform-managed infrastructure with multiple safety checks.
 """
 
 import yaml
-import subprocess
 import sys
 import os
 import argparse
 import logging
 import time
 from pathlib import Path
-from datetime import datetime
 from typing import List, Optional
 
+import logsetup
+import tfrunner
+from config_loader import load_config
+from instrument import RunReport
+from plugin_cache import PluginCache
+from tfgraph import ModuleGraph
+from tfoptions import (Parallelism, RunOptions, parse_lock_timeout,
+                       parse_parallelism)
+from tfstate import StateSnapshot
+from workdir import (TerraformWorkDir, link_work_dir, project_work_dir,
+                     write_tfvars)
 
-# Configure logging
-logging_dir = Path(__file__).parent / "logs"
-logging_dir.mkdir(exist_ok=True)
 
 logger = logging.getLogger(__name__)
-logger.setLevel(logging.DEBUG)
 
-log_fmt = logging.Formatter('%(asctime)s - %(levelname)s - %(message)s')
 
-file_handler = logging.FileHandler(
-    f'{logging_dir}/destroy_{datetime.now().strftime("%Y%m%d_%H%M%S")}.log'
-)
-file_handler.setLevel(logging.DEBUG)
-file_handler.setFormatter(log_fmt)
-logger.addHandler(file_handler)
-
-console_handler = logging.StreamHandler()
-console_handler.setLevel(logging.INFO)
-console_handler.setFormatter(log_fmt)
-logger.addHandler(console_handler)
-
-
-class TerraformDestroyer:
+class TerraformDestroyer(TerraformWorkDir):
     """Handles Terraform destroy operations with safety checks"""
 
     def __init__(self, config_file: Optional[str] = None, workspace: Optional[str] = None,
-                 auto_approve: bool = False,  dry_run: bool = False, target: Optional[List[str]] = None):
+                 auto_approve: bool = False,  dry_run: bool = False, target: Optional[List[str]] = None,
+                 reinit: bool = False,
+                 offline: Optional[bool] = None, timeout: Optional[float] = None,
+                 trace_file: Optional[str] = None,
+                 parallelism: Parallelism = None, refresh: Optional[bool] = None,
+                 lock_timeout: Optional[str] = None, waves: bool = False,
+                 isolated: Optional[bool] = None):
         self.config_file = Path(config_file)
         self.workspace = workspace
         self.auto_approve = auto_approve
         self.dry_run = dry_run
         self.targets = target or []
+        self.waves = waves
+        self.isolated = isolated
+        self.reinit = reinit
+        self.plugin_cache = PluginCache(offline=offline)
+        self.timeout = timeout
         self.script_dir = Path(__file__).parent
         self.root_dir = self.script_dir.parent
+        self.work_dir = self.root_dir
         self.backends_dir = self.root_dir / "backends"
+        self.reports_dir = self.root_dir / ".autogcp" / "reports"
+        self.report = RunReport('destroy', str(config_file), workspace, trace_file)
         self.project_id = None
+        self.state: Optional[StateSnapshot] = None
+        self.cli_options = (parallelism, refresh, lock_timeout)
+        self.options = RunOptions()
 
     def validate_prerequisites(self) -> bool:
         """Validate required tools and state"""
         logger.debug("Validating prerequisites...")
 
-        # Check if Terraform is initialized
-        terraform_dir = self.root_dir / ".terraform"
-        if not terraform_dir.exists():
-            logger.error(
-                "Terraform not initialized. Run 'terraform init' first.")
-            return False
-
-        logger.debug("Terraform is initialized")
-
-        # Check if state file exists
-        state_file = self.root_dir / "terraform.tfstate"
-        if not state_file.exists():
-            logger.warning("No local state file found")
-            logger.debug("Checking for remote state...")
-
         # Check GCP credentials
         if not os.getenv('GOOGLE_APPLICATION_CREDENTIALS'):
             logger.warning(
@@ -84,8 +77,9 @@ class TerraformDestroyer:
         logger.debug(f"Loading configuration from {self.config_file}")
 
         try:
-            with open(self.config_file, 'r') as f:
-                self.config = yaml.safe_load(f)
+            self.config = load_config(
+                self.config_file, self.root_dir, self.workspace)
+            self.options = RunOptions.from_config(self.config, *self.cli_options)
 
             # Validate required fields
             required_fields = ['project_id']
@@ -98,6 +92,7 @@ class TerraformDestroyer:
                 return False
 
             self.project_id = self.config['project_id']
+            logsetup.set_project(self.project_id)
 
             logger.info(f"Configuration loaded successfully")
             logger.info(f"  Project ID: {self.config['project_id']}")
@@ -110,19 +105,40 @@ class TerraformDestroyer:
             logger.error(f"Error loading config: {e}")
             return False
 
+    def select_work_dir(self) -> bool:
+        """Run in the working directory the project was deployed from
+
+        Fleet and daemon deployments keep each project in its own work dir
+        under .autogcp/work/, a single deploy uses the repository root.
+        With isolated unset the project's work dir is used if it exists.
+        The tfvars are rewritten from this config either way, so the plan
+        never sees variables left behind by another project.
+        """
+        work_dir = project_work_dir(self.root_dir, self.project_id)
+        isolated = self.isolated
+        if isolated is None:
+            isolated = work_dir.exists()
+
+        try:
+            if isolated:
+                self.work_dir = work_dir
+                link_work_dir(self.root_dir, self.work_dir)
+            elif not (self.root_dir / ".terraform").exists():
+                logger.error(
+                    "Terraform not initialized. Run 'terraform init' first.")
+                return False
+            write_tfvars(self.work_dir, self.config)
+        except OSError as e:
+            logger.error(f"Error preparing working directory: {e}")
+            return False
+
+        logger.info(f"Working directory: {self.work_dir}")
+        return True
+
     def get_resource_count(self) -> int:
         """Get count of resources to be destroyed"""
         try:
-            result = subprocess.run(
-                ['terraform', 'state', 'list'],
-                cwd=self.root_dir,
-                capture_output=True,
-                text=True,
-                check=True
-            )
-            resources = [line for line in result.stdout.splitlines()
-                         if line.strip()]
-            return len(resources)
+            return len(self.load_state().matching(self.targets))
         except Exception:
             return 0
 
@@ -133,16 +149,7 @@ class TerraformDestroyer:
         logger.info("=" * 70)
 
         try:
-            result = subprocess.run(
-                ['terraform', 'state', 'list'],
-                cwd=self.root_dir,
-                capture_output=True,
-                text=True,
-                check=True
-            )
-
-            resources = [line for line in result.stdout.splitlines()
-                         if line.strip()]
+            resources = self.load_state().matching(self.targets)
             for i, resource in enumerate(resources, 1):
                 logger.info(f"  {i}. {resource}")
 
@@ -153,112 +160,50 @@ class TerraformDestroyer:
         except Exception as e:
             logger.error(f"Failed to list resources: {e}")
 
-    def generate_backend_config(self) -> Path:
-        """Generate unique backend config with smart defaults"""
-        logger.debug("Generating backend configuration")
-
-        self.backends_dir.mkdir(exist_ok=True)
-
-        # Defaults if not specified in YAML
-        default_bucket = "konecta-autogcp-terraform-state-bucket"
-        default_prefix = f"projects/{self.config['project_id']}"
-
-        # Use config values or fall back to defaults
-        state_bucket = self.config.get(
-            'terraform_state_bucket', default_bucket)
-        state_prefix = self.config.get(
-            'terraform_state_prefix', default_prefix)
-
-        backend_file = self.backends_dir / \
-            f"{self.config['project_id']}.backend.conf"
-
-        backend_config = f'bucket = "{state_bucket}"\nprefix = "{state_prefix}"'
-
-        with open(backend_file, 'w') as f:
-            f.write(backend_config)
-
-        logger.debug(f"Backend config created: {backend_file}")
-        logger.debug(f"Bucket: {state_bucket}")
-        logger.debug(f"Prefix: {state_prefix}")
-
-        # Warn if using defaults
-        if 'terraform_state_bucket' not in self.config:
-            logger.warning(f"Using default bucket: {state_bucket}")
-
-        if 'terraform_state_prefix' not in self.config:
-            logger.debug(f"Using default prefix: {state_prefix}")
-
-        logger.info(
-            f"State location: gs://{state_bucket}/{state_prefix}/default.tfstate")
-
-        return backend_file
-
     def run_terraform_command(self, command: list, check: bool = True) -> bool:
-        """Execute Terraform command"""
+        """Execute Terraform command
+
+        Output is streamed as it arrives, stdout at info level and stderr
+        at warning level. With check=False a failure is only a warning.
+        """
         cmd_str = ' '.join(command)
         logger.info(f"Running: terraform {cmd_str}")
 
         try:
-            if "destroy.tfplan" in command:
-                process = subprocess.Popen(
-                    ['terraform'] + command,
-                    cwd=self.root_dir,
-                    stdout=subprocess.PIPE,
-                    stderr=subprocess.STDOUT,
-                    text=True,
-                    bufsize=1
-                )
-                for line in process.stdout:
-                    # stream directly to console
-                    logger.info(f"   {line.strip()}")
-                process.wait()
-
-                if process.returncode == 0:
-                    logger.info("Command completed successfully")
-                    return True
-                else:
-                    logger.error(
-                        f"Command failed with exit code {process.returncode}")
-                    return False
-            else:
-                result = subprocess.run(
-                    ['terraform'] + command,
-                    cwd=self.root_dir,
-                    capture_output=True,
-                    text=True,
-                    check=check
-                )
-
-                if result.stdout:
-                    for line in result.stdout.splitlines():
-                        logger.info(f"   {line}")
-
-                if result.returncode == 0:
-                    logger.info(f"Command completed successfully")
-                    return True
-                else:
-                    if result.stderr:
-                        for line in result.stderr.splitlines():
-                            logger.error(f"   {line}")
-                    logger.error(
-                        f"Command failed with exit code {result.returncode}")
-                    return False
-
+            returncode = tfrunner.stream_command(
+                ['terraform'] + command,
+                cwd=self.work_dir,
+                env=self.plugin_cache.env(),
+                on_stdout=lambda line: logger.info(f"   {line}"),
+                on_stderr=lambda line: logger.warning(f"   {line}"),
+                timeout=self.step_timeout(command)
+            )
+        except tfrunner.CommandStopped as e:
+            logger.error(f"Command stopped: {e}")
+            return False
         except Exception as e:
             logger.error(f"Command execution error: {e}")
             return False
 
+        if returncode == 0:
+            logger.info("Command completed successfully")
+            return True
+
+        log_failure = logger.error if check else logger.warning
+        log_failure(f"Command failed with exit code {returncode}")
+        return False
+
     def select_workspace(self) -> bool:
         """Select Terraform workspace"""
         if not self.workspace:
             logger.info("Using default workspace")
-            result = subprocess.run(
+            _, stdout, _ = tfrunner.capture_command(
                 ['terraform', 'workspace', 'show'],
-                cwd=self.root_dir,
-                capture_output=True,
-                text=True
+                cwd=self.work_dir,
+                env=self.plugin_cache.env(),
+                timeout=self.step_timeout(['workspace'])
             )
-            current_workspace = result.stdout.strip()
+            current_workspace = stdout.strip()
             logger.debug(f"Current workspace: {current_workspace}")
             return True
 
@@ -289,6 +234,7 @@ class TerraformDestroyer:
 
         # First confirmation
         logger.info("\n" + "-" * 70)
+        logsetup.flush()
         response1 = input(
             "Type 'destroy' to confirm you want to proceed: ").strip()
         if response1 != 'destroy':
@@ -298,6 +244,7 @@ class TerraformDestroyer:
         # Second confirmation with project ID
         if self.project_id:
             logger.info("\n" + "-" * 70)
+            logsetup.flush()
             response2 = input(
                 f"Type the project ID '{self.project_id}' to confirm: ").strip()
             if response2 != self.project_id:
@@ -318,17 +265,47 @@ class TerraformDestroyer:
         return True
 
     def destroy(self) -> bool:
-        """Execute infrastructure destruction"""
+        """Execute infrastructure destruction and write its timing report"""
+        success = False
+        try:
+            success = self.run_destruction()
+            return success
+        finally:
+            self.write_report(success)
+
+    def write_report(self, success: bool) -> None:
+        """Finish the timing report and write it next to other run data"""
+        self.report.finish(success)
+        self.report.project_id = self.project_id
+
+        logger.info("Step timings:")
+        for line in self.report.summary_lines():
+            logger.info(line)
+
+        try:
+            report_file = self.report.write(self.reports_dir)
+            logger.debug(f"Run report written to {report_file}")
+        except OSError as e:
+            logger.warning(f"Could not write run report: {e}")
+        logsetup.set_project(None)
+
+    def run_destruction(self) -> bool:
+        """Run every destruction step, timing each one"""
+        report = self.report
+
         logger.info("=" * 70)
         logger.info("Starting Infrastructure Destruction")
         logger.info("=" * 70)
 
         # Step 1: Validate prerequisites
-        if not self.validate_prerequisites():
+        if not report.call('prereq_validation', self.validate_prerequisites):
             return False
 
         # Step 2: Load configuration
-        if not self.load_yaml_config():
+        if not report.call('yaml_load', self.load_yaml_config):
+            return False
+
+        if not report.call('work_dir', self.select_work_dir):
             return False
 
         # Step 3: Initialize Terraform
@@ -336,32 +313,37 @@ class TerraformDestroyer:
         logger.info("Initializing Terraform")
         logger.info("=" * 70)
         backend_config_file = self.generate_backend_config()
-        if not self.run_terraform_command([
-            'init',
-            '-reconfigure',
-            f'-backend-config={backend_config_file}'
-        ]):
+        if not report.call('init', self.initialize, backend_config_file):
             return False
 
         # Step 4: Select workspace
-        if not self.select_workspace():
+        if not report.call('workspace_select', self.select_workspace):
             return False
 
         # Step 5: Show resources
-        if self.show_resources() == 0:
+        if report.call('show_resources', self.show_resources) == 0:
             logger.info("Nothing to destroy")
             return False
 
+        report.call('tune', self.tune)
+
+        if self.waves and not self.dry_run:
+            return self.destroy_in_waves()
+
+        if self.waves:
+            report.call('destroy_waves', self.plan_waves)
+
         # Step 6: Generate destroy plan
         logger.info("=" * 70)
         logger.info("Generating Destruction Plan")
         logger.info("=" * 70)
 
-        plan_cmd = ['plan', '-destroy', '-out=destroy.tfplan']
+        plan_cmd = ['plan', '-destroy', '-out=destroy.tfplan'] + \
+            self.options.args_for('plan')
         for target in self.targets:
             plan_cmd.extend(['-target', target])
 
-        if not self.run_terraform_command(plan_cmd):
+        if not report.call('plan', self.run_terraform_command, plan_cmd):
             return False
 
         if self.dry_run:
@@ -370,7 +352,7 @@ class TerraformDestroyer:
 
         # Step 7: Confirm destruction
         if not self.auto_approve:
-            if not self.confirm_destruction():
+            if not report.call('confirmation', self.confirm_destruction):
                 return False
         else:
             logger.warning("Auto-approve enabled, skipping confirmation")
@@ -380,19 +362,26 @@ class TerraformDestroyer:
         logger.info("Destroying Infrastructure")
         logger.info("=" * 70)
 
-        destroy_cmd = ['apply', 'destroy.tfplan']
-        if not self.run_terraform_command(destroy_cmd):
+        destroy_cmd = ['apply'] + self.options.args_for('apply') + ['destroy.tfplan']
+        applied = report.call('apply', self.run_terraform_command, destroy_cmd)
+        self.invalidate_state()
+        if not applied:
             logger.error("Destruction failed!")
             logger.error(
                 "Some resources may still exist. Please check manually.")
             return False
 
         # Step 9: Verify destruction
+        return self.verify_destruction()
+
+    def verify_destruction(self) -> bool:
+        """Report what is left in state after the destroy"""
         logger.info("=" * 70)
         logger.info("Verifying Destruction")
         logger.info("=" * 70)
 
-        remaining_resources = self.get_resource_count()
+        with self.report.step('verify'):
+            remaining_resources = self.get_resource_count()
         if remaining_resources > 0:
             logger.warning(
                 f"{remaining_resources} resources still exist in state")
@@ -406,6 +395,83 @@ class TerraformDestroyer:
 
         return True
 
+    def plan_waves(self) -> Optional[List[List[str]]]:
+        """Order the modules still in state into destroy waves
+
+        Modules that are already gone from state are left out, so after a
+        failed wave the next run starts where the last one stopped.
+        """
+        try:
+            graph = ModuleGraph.load(self.root_dir)
+            waves = graph.destroy_waves(self.load_state().root_modules)
+        except Exception as e:
+            logger.error(f"Could not order modules for destruction: {e}")
+            return None
+
+        logger.info("Destroy waves:")
+        for number, wave in enumerate(waves, 1):
+            logger.info(f"  {number}. {', '.join(wave)}")
+        logger.info(f"  {len(waves) + 1}. resources outside modules")
+        return waves
+
+    def destroy_wave(self, name: str, targets: List[str]) -> bool:
+        """Plan and apply the destruction of targets, everything if empty"""
+        plan_cmd = ['plan', '-destroy', '-out=destroy.tfplan'] + \
+            self.options.args_for('plan')
+        for target in targets:
+            plan_cmd.append(f'-target={target}')
+
+        if not self.report.call(f'{name}_plan', self.run_terraform_command, plan_cmd):
+            return False
+
+        destroy_cmd = ['apply'] + self.options.args_for('apply') + ['destroy.tfplan']
+        applied = self.report.call(
+            f'{name}_apply', self.run_terraform_command, destroy_cmd)
+        self.invalidate_state()
+        return applied
+
+    def destroy_in_waves(self) -> bool:
+        """Destroy module by module in reverse dependency order
+
+        Each wave is one targeted plan and apply covering every module in
+        it, so terraform removes independent modules concurrently while
+        the single state lock is held once per wave. Resources outside
+        modules go last with an untargeted destroy.
+        """
+        waves = self.report.call('destroy_waves', self.plan_waves)
+        if waves is None:
+            return False
+
+        if not self.auto_approve:
+            if not self.report.call('confirmation', self.confirm_destruction):
+                return False
+        else:
+            logger.warning("Auto-approve enabled, skipping confirmation")
+
+        for number, wave in enumerate(waves, 1):
+            logger.info("=" * 70)
+            logger.info(f"Destroying wave {number}/{len(waves)}: {', '.join(wave)}")
+            logger.info("=" * 70)
+
+            if not self.destroy_wave(f'wave_{number}',
+                                     [f"module.{module}" for module in wave]):
+                logger.error(f"Wave {number} failed!")
+                logger.error(
+                    "Rerun with --waves to resume, destroyed modules are skipped")
+                return False
+
+        logger.info("=" * 70)
+        logger.info("Destroying resources outside modules")
+        logger.info("=" * 70)
+
+        if not self.destroy_wave('root', []):
+            logger.error("Destruction failed!")
+            logger.error(
+                "Some resources may still exist. Please check manually.")
+            return False
+
+        return self.verify_destruction()
+
 
 def main():
     """Main entry point"""
@@ -417,6 +483,7 @@ Examples:
   python destroy.py config.yaml
   python destroy.py config.yaml --workspace dev --auto-approve
   python destroy.py config.yaml --workspace prod --quiet
+  python destroy.py config.yaml --workspace staging --waves --auto-approve
         """
     )
 
@@ -438,6 +505,12 @@ Examples:
         dest='targets'
     )
 
+    parser.add_argument(
+        '--waves',
+        help='Destroy module by module in dependency order, resumable after a failure',
+        action='store_true'
+    )
+
     parser.add_argument(
         '-a', '--auto-approve',
         help='Skip interactive approval (DANGEROUS)',
@@ -450,6 +523,54 @@ Examples:
         action='store_true'
     )
 
+    parser.add_argument(
+        '--reinit',
+        help='Always run terraform init -reconfigure',
+        action='store_true'
+    )
+
+    parser.add_argument(
+        '--timeout',
+        help='Seconds before a terraform step is interrupted (default: per-step limits, none for plan/apply)',
+        type=float,
+        default=None
+    )
+
+    parser.add_argument(
+        '--trace-file',
+        help='Append OpenTelemetry-style JSON spans for every step to this file',
+        default=None
+    )
+
+    parser.add_argument(
+        '--parallelism',
+        help="Concurrent terraform operations, or 'auto' to size it from the state (overrides terraform_parallelism)",
+        type=parse_parallelism,
+        default=None
+    )
+
+    parser.add_argument(
+        '--no-refresh',
+        help='Plan with -refresh=false (overrides terraform_refresh)',
+        action='store_const',
+        const=False,
+        dest='refresh'
+    )
+
+    parser.add_argument(
+        '--lock-timeout',
+        help='How long to wait for the state lock, e.g. 5m (overrides terraform_lock_timeout)',
+        type=parse_lock_timeout,
+        default=None
+    )
+
+    parser.add_argument(
+        '--offline',
+        help='Install providers only from the local plugin cache',
+        action='store_true',
+        default=None
+    )
+
     verbosity_group = parser.add_mutually_exclusive_group()
 
     verbosity_group.add_argument(
@@ -466,12 +587,15 @@ Examples:
 
     args = parser.parse_args()
 
+    if args.waves and args.targets:
+        parser.error("--waves destroys everything and cannot be combined with --target")
+
     if args.quiet:
-        console_handler.setLevel(logging.WARNING)
+        logsetup.setup_logging('destroy', logging.WARNING)
     elif args.verbose:
-        console_handler.setLevel(logging.DEBUG)
+        logsetup.setup_logging('destroy', logging.DEBUG)
     else:
-        console_handler.setLevel(logging.INFO)
+        logsetup.setup_logging('destroy', logging.INFO)
 
     # Warning for auto-approve
     if args.auto_approve:
@@ -485,6 +609,14 @@ Examples:
         auto_approve=args.auto_approve,
         dry_run=args.dry_run,
         target=args.targets,
+        reinit=args.reinit,
+        offline=args.offline,
+        timeout=args.timeout,
+        trace_file=args.trace_file,
+        parallelism=args.parallelism,
+        refresh=args.refresh,
+        lock_timeout=args.lock_timeout,
+        waves=args.waves
     )
 
     # Execute destruction
@@ -0,0 +1,335 @@
+"""
+Detects drift between deployed projects and their YAML with refresh-only plans
+"""
+
+import argparse
+import json
+import logging
+import sys
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from datetime import datetime
+from pathlib import Path
+from typing import Dict, List, Optional
+
+import logsetup
+import tfrunner
+from config_loader import ConfigResolver
+from config_schema import validate_configs
+from deploy import TerraformDeployer
+from instrument import RunReport
+from plan_summary import drifted_resources
+from tfoptions import Parallelism, parse_lock_timeout, parse_parallelism
+from workdir import check_distinct_projects
+
+logger = logging.getLogger(__name__)
+
+DRIFT_PLAN_FILE = "drift.tfplan"
+
+
+class DriftDetector(TerraformDeployer):
+    """Runs a refresh-only plan for one config in its isolated work dir
+
+    The work dir and init fingerprint are the ones deploy uses, so a
+    repeated sweep skips init and only pays for the refresh itself.
+    """
+
+    def __init__(self, config_file: str, workspace: Optional[str] = None,
+                 reinit: bool = False, offline: Optional[bool] = None,
+                 timeout: Optional[float] = None,
+                 trace_file: Optional[str] = None,
+                 parallelism: Parallelism = None,
+                 lock_timeout: Optional[str] = None):
+        super().__init__(
+            config_file=config_file,
+            workspace=workspace,
+            dry_run=True,
+            isolated=True,
+            reinit=reinit,
+            offline=offline,
+            use_plan_cache=False,
+            timeout=timeout,
+            trace_file=trace_file,
+            parallelism=parallelism,
+            lock_timeout=lock_timeout
+        )
+        self.report = RunReport('drift', str(config_file), workspace, trace_file)
+        self.result = {
+            'config_file': str(config_file),
+            'project_id': None,
+            'status': 'error',
+            'drifted': [],
+        }
+
+    def check(self) -> dict:
+        """Check one project and return its result, writing a timing report"""
+        success = False
+        try:
+            success = self.run_check()
+            return self.result
+        finally:
+            self.result['duration_s'] = round(
+                time.perf_counter() - self.report.start, 3)
+            self.write_report(success)
+
+    def run_check(self) -> bool:
+        report = self.report
+
+        # The same steps deploy runs before it plans
+        prepared = self.prepare() is not None
+        if self.config:
+            self.result['project_id'] = self.config.get('project_id')
+        if not prepared:
+            return False
+
+        # Exit code 2 means the refresh found changes made outside terraform
+        with report.step('refresh_plan') as step:
+            if not self.run_terraform_command(
+                    ['plan', '-refresh-only', '-detailed-exitcode',
+                     f'-out={DRIFT_PLAN_FILE}'] + self.options.args_for('refresh'),
+                    success_codes=(0, 2)):
+                step['status'] = 'failed'
+                return False
+
+        if self.last_returncode == 0:
+            self.result['status'] = 'clean'
+            logger.info("No drift detected")
+            return True
+
+        self.result['status'] = 'drifted'
+        report.call('drift_summary', self.list_drift)
+        return True
+
+    def list_drift(self) -> bool:
+        """Record which resources drifted from the saved refresh-only plan"""
+        try:
+            self.result['drifted'] = drifted_resources(
+                self.work_dir,
+                DRIFT_PLAN_FILE,
+                env=self.plugin_cache.env(),
+                on_stderr=logger.warning,
+                timeout=self.step_timeout(['show'])
+            )
+        except Exception as e:
+            logger.warning(f"Could not list drifted resources: {e}")
+            return False
+
+        logger.warning(f"Drift detected in {len(self.result['drifted'])} resources:")
+        for change in self.result['drifted']:
+            logger.warning(f"  {change['action']:<8}{change['address']}")
+        return True
+
+
+def detect_drift(config_files: List[str], parallel: int = 4,
+                 workspace: Optional[str] = None, reinit: bool = False,
+                 offline: Optional[bool] = None,
+                 timeout: Optional[float] = None,
+                 trace_file: Optional[str] = None,
+                 parallelism: Parallelism = None,
+                 lock_timeout: Optional[str] = None) -> Dict[str, dict]:
+    """Check every config with a bounded worker pool, result per config
+
+    Configs that share a project_id are all reported as errors without
+    running anything, their checks would share one work dir.
+    """
+    resolver = ConfigResolver(Path(__file__).parent.parent, workspace)
+    configs = {config_file: resolver.resolve(config_file)
+               for config_file in config_files}
+    if not check_distinct_projects(configs, logger):
+        return {config_file: {'config_file': config_file,
+                              'project_id': configs[config_file]['project_id'],
+                              'status': 'error', 'drifted': []}
+                for config_file in config_files}
+
+    logger.info("=" * 70)
+    logger.info(
+        f"Checking {len(config_files)} configs for drift with {parallel} workers")
+    logger.info("=" * 70)
+
+    logsetup.use_thread_format()
+    logsetup.split_project_logs()
+
+    def run(config_file: str) -> dict:
+        threading.current_thread().name = Path(config_file).stem
+        return DriftDetector(
+            config_file=config_file,
+            workspace=workspace,
+            reinit=reinit,
+            offline=offline,
+            timeout=timeout,
+            trace_file=trace_file,
+            parallelism=parallelism,
+            lock_timeout=lock_timeout
+        ).check()
+
+    results: Dict[str, dict] = {}
+    with ThreadPoolExecutor(max_workers=parallel) as executor:
+        futures = {executor.submit(run, config_file): config_file
+                   for config_file in config_files}
+        try:
+            for future in as_completed(futures):
+                config_file = futures[future]
+                try:
+                    results[config_file] = future.result()
+                except Exception as e:
+                    logger.error(f"{config_file}: unexpected error: {e}")
+                    results[config_file] = {'config_file': config_file,
+                                            'status': 'error', 'drifted': []}
+        except KeyboardInterrupt:
+            logger.warning("Interrupted, stopping running terraform processes")
+            for future in futures:
+                future.cancel()
+            tfrunner.shutdown()
+            raise
+
+    return {config_file: results[config_file] for config_file in config_files}
+
+
+def write_drift_report(results: Dict[str, dict], workspace: Optional[str],
+                       started_at: datetime, reports_dir: Path) -> Path:
+    """Write one JSON report covering every checked project"""
+    totals: Dict[str, int] = {}
+    for result in results.values():
+        totals[result['status']] = totals.get(result['status'], 0) + 1
+
+    reports_dir.mkdir(parents=True, exist_ok=True)
+    report_file = reports_dir / \
+        f"drift_{started_at.strftime('%Y%m%d_%H%M%S')}.json"
+    with open(report_file, 'w') as f:
+        json.dump({
+            'started_at': started_at.isoformat(),
+            'duration_s': round(
+                (datetime.now() - started_at).total_seconds(), 3),
+            'workspace': workspace or "default",
+            'totals': totals,
+            'projects': list(results.values()),
+        }, f, indent=2)
+    return report_file
+
+
+def main():
+    """Main entry point"""
+    parser = argparse.ArgumentParser(
+        description='Report projects whose real infrastructure drifted from their YAML',
+        formatter_class=argparse.RawDescriptionHelpFormatter,
+        epilog="""
+Exit codes:
+  0  no drift
+  1  a check failed
+  2  drift detected
+
+Examples:
+  python drift.py ../configs/*.yaml
+  python drift.py ../configs/*.yaml --workspace prod --parallel 8
+        """
+    )
+
+    parser.add_argument(
+        'configs',
+        help='Path to one or more YAML configuration files',
+        nargs='+'
+    )
+
+    parser.add_argument(
+        '-w', '--workspace',
+        help='Terraform workspace name (default: default)'
+    )
+
+    parser.add_argument(
+        '-p', '--parallel',
+        help='Number of projects to check concurrently (default: 4)',
+        type=int,
+        default=4
+    )
+
+    parser.add_argument(
+        '--reinit',
+        help='Force terraform init even if nothing init depends on changed',
+        action='store_true'
+    )
+
+    parser.add_argument(
+        '--offline',
+        help='Install providers only from the local plugin cache',
+        action='store_true',
+        default=None
+    )
+
+    parser.add_argument(
+        '--timeout',
+        help='Stop each refresh-only plan after this many seconds',
+        type=float
+    )
+
+    parser.add_argument(
+        '--trace-file',
+        help='Append OpenTelemetry-style spans for every step to this JSONL file'
+    )
+
+    parser.add_argument(
+        '--parallelism',
+        help="Concurrent terraform operations, or 'auto' to size it from the state (overrides terraform_parallelism)",
+        type=parse_parallelism,
+        default=None
+    )
+
+    parser.add_argument(
+        '--lock-timeout',
+        help='How long to wait for the state lock, e.g. 5m (overrides terraform_lock_timeout)',
+        type=parse_lock_timeout,
+        default=None
+    )
+
+    parser.add_argument(
+        '-v', '--verbose',
+        help='Enable verbose/debug logging',
+        action='store_true'
+    )
+
+    args = parser.parse_args()
+
+    logsetup.setup_logging(
+        'drift', logging.DEBUG if args.verbose else logging.INFO)
+
+    root_dir = Path(__file__).parent.parent
+    if not validate_configs(root_dir, args.configs, logger, args.workspace):
+        sys.exit(1)
+
+    started_at = datetime.now()
+    try:
+        results = detect_drift(
+            args.configs,
+            parallel=max(1, args.parallel),
+            workspace=args.workspace,
+            reinit=args.reinit,
+            offline=args.offline,
+            timeout=args.timeout,
+            trace_file=args.trace_file,
+            parallelism=args.parallelism,
+            lock_timeout=args.lock_timeout
+        )
+    except KeyboardInterrupt:
+        logger.warning("Drift check cancelled by user")
+        sys.exit(130)
+
+    report_file = write_drift_report(
+        results, args.workspace, started_at, root_dir / ".autogcp" / "reports")
+
+    logger.info("=" * 70)
+    logger.info("Drift Summary")
+    logger.info("=" * 70)
+    for config_file, result in results.items():
+        detail = f" ({len(result['drifted'])} resources)" \
+            if result['status'] == 'drifted' else ""
+        logger.info(f"  {result['status'].upper():<9}{config_file}{detail}")
+    logger.info(f"Report written to {report_file}")
+
+    statuses = {result['status'] for result in results.values()}
+    if 'error' in statuses:
+        sys.exit(1)
+    sys.exit(2 if 'drifted' in statuses else 0)
+
+
+if __name__ == "__main__":
+    main()
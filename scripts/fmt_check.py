@@ -0,0 +1,171 @@
+"""
+Checks Terraform formatting read-only, re-checking only files that changed
+"""
+
+import argparse
+import json
+import logging
+import sys
+from pathlib import Path
+from typing import Dict, List, Optional
+
+import tfcache
+import tfrunner
+
+logger = logging.getLogger(__name__)
+
+FMT_CACHE_FILE = Path(".autogcp") / "cache" / "fmt.json"
+FMT_LOCK_FILE = Path(".autogcp") / "cache" / "fmt.lock"
+
+
+class FormatChecker:
+    """terraform fmt -check over the source tree with an mtime/hash index
+
+    Each .tf file is indexed by mtime, size and content hash together with
+    its last fmt result. A file is only handed to terraform again when its
+    content changed, so checking an untouched tree spawns no process at
+    all. The source tree is never modified unless fix() is called.
+    """
+
+    def __init__(self, root_dir: Path, env: Optional[Dict[str, str]] = None):
+        self.root_dir = root_dir
+        self.env = env
+        self.cache_file = root_dir / FMT_CACHE_FILE
+        self.lock_file = root_dir / FMT_LOCK_FILE
+
+    def load_index(self) -> Dict[str, dict]:
+        try:
+            with open(self.cache_file, 'r') as f:
+                return json.load(f)
+        except (OSError, ValueError):
+            return {}
+
+    def check(self) -> List[str]:
+        """Return the relative paths of files that need formatting
+
+        The index is read, refreshed and written under a file lock, so fleet
+        workers checking at once run terraform fmt a single time and never
+        write the index over each other.
+        """
+        with tfcache.file_lock(self.lock_file):
+            index = self.load_index()
+            updated: Dict[str, dict] = {}
+            stale: Dict[str, dict] = {}
+
+            for path in tfcache.source_files(self.root_dir):
+                relative = path.relative_to(self.root_dir).as_posix()
+                stat = path.stat()
+                entry = index.get(relative)
+
+                if entry and entry['mtime_ns'] == stat.st_mtime_ns and \
+                        entry['size'] == stat.st_size:
+                    updated[relative] = entry
+                    continue
+
+                digest = tfcache.hash_file(path)
+                fresh = {'mtime_ns': stat.st_mtime_ns,
+                         'size': stat.st_size, 'sha256': digest}
+                if entry and entry['sha256'] == digest:
+                    # Touched but not edited
+                    updated[relative] = dict(entry, **fresh)
+                else:
+                    stale[relative] = fresh
+
+            if stale:
+                logger.debug(f"Checking format of {len(stale)} changed files")
+                unformatted = self.run_fmt_check(sorted(stale))
+                for relative, entry in stale.items():
+                    updated[relative] = dict(
+                        entry, formatted=relative not in unformatted)
+
+            if updated != index:
+                tfcache.write_json_atomic(self.cache_file, updated)
+
+            return sorted(r for r, e in updated.items() if not e['formatted'])
+
+    def run_fmt_check(self, files: List[str]) -> set:
+        """Run terraform fmt -check on files and return those it lists"""
+        returncode, stdout, stderr = tfrunner.capture_command(
+            ['terraform', 'fmt', '-check', '-list=true', '-no-color'] + files,
+            cwd=self.root_dir,
+            env=self.env,
+            timeout=tfrunner.default_timeout(['fmt'])
+        )
+        # fmt -check exits 3 when some files are not formatted
+        if returncode not in (0, 3):
+            raise RuntimeError(stderr or f"terraform fmt exited with {returncode}")
+
+        return {Path(line.strip()).as_posix()
+                for line in stdout.splitlines() if line.strip()}
+
+    def fix(self, files: List[str]) -> bool:
+        """Rewrite the given files with terraform fmt"""
+        returncode, _, stderr = tfrunner.capture_command(
+            ['terraform', 'fmt', '-list=true'] + files,
+            cwd=self.root_dir,
+            env=self.env,
+            timeout=tfrunner.default_timeout(['fmt'])
+        )
+        if returncode != 0:
+            logger.error(stderr or f"terraform fmt exited with {returncode}")
+            return False
+        return True
+
+
+def main():
+    """Main entry point"""
+    parser = argparse.ArgumentParser(
+        description='Check Terraform formatting without modifying files',
+        formatter_class=argparse.RawDescriptionHelpFormatter,
+        epilog="""
+Examples:
+  python fmt_check.py
+  python fmt_check.py --fix
+        """
+    )
+
+    parser.add_argument(
+        '--fix',
+        help='Rewrite files that are not formatted',
+        action='store_true'
+    )
+
+    parser.add_argument(
+        '-v', '--verbose',
+        help='Enable verbose/debug logging',
+        action='store_true'
+    )
+
+    args = parser.parse_args()
+
+    logging.basicConfig(
+        level=logging.DEBUG if args.verbose else logging.INFO,
+        format='%(asctime)s - %(levelname)s - %(message)s'
+    )
+
+    checker = FormatChecker(Path(__file__).parent.parent)
+    try:
+        unformatted = checker.check()
+    except Exception as e:
+        logger.error(f"Format check failed: {e}")
+        sys.exit(1)
+
+    if not unformatted:
+        logger.info("All Terraform files are formatted")
+        sys.exit(0)
+
+    for relative in unformatted:
+        logger.warning(f"  Not formatted: {relative}")
+
+    if args.fix:
+        success = checker.fix(unformatted) and not checker.check()
+        if success:
+            logger.info(f"Formatted {len(unformatted)} files")
+        sys.exit(0 if success else 1)
+
+    logger.error(f"{len(unformatted)} files need terraform fmt")
+    sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
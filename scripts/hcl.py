@@ -0,0 +1,114 @@
+"""
+Minimal HCL reader for the root module's .tf files
+"""
+
+import json
+import re
+from pathlib import Path
+from typing import List, Optional, Set, Tuple
+
+_TOKEN = re.compile(r'''
+    (?P<space>[ \t\r]+)
+  | (?P<comment>(?:\#|//)[^\n]*|/\*.*?\*/)
+  | (?P<newline>\n)
+  | (?P<string>"(?:[^"\\]|\\.)*")
+  | (?P<number>\d+(?:\.\d+)?)
+  | (?P<ident>[A-Za-z_][A-Za-z0-9_-]*)
+  | (?P<punct>&&|\|\||==|!=|<=|>=|[{}()\[\]=,.:?!<>+\-*/%])
+''', re.VERBOSE | re.DOTALL)
+
+Token = Tuple[str, str]
+
+
+def tokenize(text: str) -> List[Token]:
+    """Split HCL source into (kind, text) tokens, dropping comments"""
+    tokens: List[Token] = []
+    pos = 0
+    while pos < len(text):
+        match = _TOKEN.match(text, pos)
+        if not match:
+            raise ValueError(f"Unexpected character {text[pos]!r} at offset {pos}")
+        kind = match.lastgroup
+        if kind not in ('space', 'comment'):
+            tokens.append((kind, match.group()))
+        pos = match.end()
+    return tokens
+
+
+def decode_string(token: str) -> str:
+    """Decode an HCL quoted string literal"""
+    return json.loads(token.replace('$${', '${').replace('%%{', '%{'))
+
+
+def parse_body(tokens: List[Token], pos: int,
+               end_char: Optional[str] = None) -> Tuple[dict, int]:
+    """Parse attributes and nested blocks until end_char or end of input
+
+    Attribute values are kept as token lists, blocks as
+    {'type', 'labels', 'body'} dicts.
+    """
+    body = {'attributes': {}, 'blocks': []}
+    while pos < len(tokens):
+        kind, text = tokens[pos]
+        if kind == 'newline':
+            pos += 1
+        elif text == end_char:
+            return body, pos + 1
+        elif kind != 'ident':
+            raise ValueError(f"Expected an attribute or block, got {text!r}")
+        elif tokens[pos + 1][1] == '=':
+            value, pos = read_expression(tokens, pos + 2)
+            body['attributes'][text] = value
+        else:
+            labels = []
+            pos += 1
+            while tokens[pos][0] == 'string':
+                labels.append(decode_string(tokens[pos][1]))
+                pos += 1
+            if tokens[pos][1] != '{':
+                raise ValueError(f"Expected '{{' after block {text!r}")
+            block_body, pos = parse_body(tokens, pos + 1, '}')
+            body['blocks'].append(
+                {'type': text, 'labels': labels, 'body': block_body})
+    if end_char:
+        raise ValueError(f"Missing closing {end_char!r}")
+    return body, pos
+
+
+def read_expression(tokens: List[Token], pos: int) -> Tuple[List[Token], int]:
+    """Collect the tokens of one expression, ending at a newline outside brackets"""
+    depth = 0
+    start = pos
+    while pos < len(tokens):
+        kind, text = tokens[pos]
+        if text in '([{' and kind == 'punct':
+            depth += 1
+        elif text in ')]}' and kind == 'punct':
+            if depth == 0:
+                break
+            depth -= 1
+        elif kind == 'newline' and depth == 0:
+            break
+        pos += 1
+    return [t for t in tokens[start:pos] if t[0] != 'newline'], pos
+
+
+def parse_file(path: Path) -> dict:
+    """Parse a .tf file into its top-level attributes and blocks"""
+    with open(path, 'r', encoding='utf-8') as f:
+        return parse_body(tokenize(f.read()), 0)[0]
+
+
+def references(tokens: List[Token], prefix: str) -> Set[str]:
+    """Names used as prefix.<name> in an expression, e.g. var or module
+
+    Interpolations such as "${var.name}-app" are searched too.
+    """
+    names = {tokens[i + 2][1] for i in range(len(tokens) - 2)
+             if tokens[i] == ('ident', prefix) and tokens[i + 1][1] == '.'
+             and tokens[i + 2][0] == 'ident'}
+    in_string = re.compile(rf'(?<![\w.-]){re.escape(prefix)}\.([A-Za-z_][A-Za-z0-9_-]*)')
+    for kind, text in tokens:
+        if kind == 'string' and '${' in text:
+            names |= set(in_string.findall(text[text.index('${'):]))
+    return names
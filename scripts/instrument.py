@@ -0,0 +1,133 @@
+"""
+Per-step timing for deploy/destroy runs, written as a JSON report and
+optionally as OpenTelemetry-style spans
+"""
+
+import json
+import os
+import threading
+import time
+from contextlib import contextmanager
+from datetime import datetime
+from pathlib import Path
+from typing import Any, Callable, Dict, Iterator, List, Optional
+
+_trace_lock = threading.Lock()
+
+
+def _span_id(size: int = 8) -> str:
+    return os.urandom(size).hex()
+
+
+class RunReport:
+    """Collects step timings for one deploy or destroy run"""
+
+    def __init__(self, command: str, config_file: str,
+                 workspace: Optional[str] = None,
+                 trace_file: Optional[str] = None):
+        self.command = command
+        self.config_file = config_file
+        self.workspace = workspace
+        self.trace_file = Path(trace_file) if trace_file else None
+        self.project_id: Optional[str] = None
+        self.trace_id = _span_id(16)
+        self.root_span_id = _span_id()
+        self.started_at = datetime.now()
+        self.start_ns = time.time_ns()
+        self.start = time.perf_counter()
+        self.duration: Optional[float] = None
+        self.success: Optional[bool] = None
+        self.steps: List[Dict[str, Any]] = []
+        self.spans: List[Dict[str, Any]] = []
+
+    @contextmanager
+    def step(self, name: str) -> Iterator[Dict[str, Any]]:
+        """Time a block; set step['status'] = 'failed' to mark a failure"""
+        step = {
+            'name': name,
+            'start_offset_s': round(time.perf_counter() - self.start, 3),
+            'status': 'ok',
+        }
+        start_ns = time.time_ns()
+        start = time.perf_counter()
+        try:
+            yield step
+        except BaseException:
+            step['status'] = 'error'
+            raise
+        finally:
+            step['duration_s'] = round(time.perf_counter() - start, 3)
+            self.steps.append(step)
+            self._add_span(name, start_ns, time.time_ns(),
+                           step['status'], self.root_span_id)
+
+    def call(self, name: str, func: Callable[..., Any], *args, **kwargs) -> Any:
+        """Run func as a timed step, a falsy result marks it failed"""
+        with self.step(name) as step:
+            result = func(*args, **kwargs)
+            if not result:
+                step['status'] = 'failed'
+            return result
+
+    def finish(self, success: bool) -> None:
+        """Close the run and its root span"""
+        self.duration = round(time.perf_counter() - self.start, 3)
+        self.success = success
+        self._add_span(self.command, self.start_ns, time.time_ns(),
+                       'ok' if success else 'failed', None)
+
+    def _add_span(self, name: str, start_ns: int, end_ns: int, status: str,
+                  parent_id: Optional[str]) -> None:
+        self.spans.append({
+            'traceId': self.trace_id,
+            'spanId': self.root_span_id if parent_id is None else _span_id(),
+            'parentSpanId': parent_id or "",
+            'name': name,
+            'startTimeUnixNano': start_ns,
+            'endTimeUnixNano': end_ns,
+            'status': {'code': 'STATUS_CODE_OK' if status == 'ok'
+                       else 'STATUS_CODE_ERROR', 'message': status},
+            'attributes': {
+                'autogcp.command': self.command,
+                'autogcp.config_file': self.config_file,
+                'autogcp.project_id': self.project_id or "",
+                'autogcp.workspace': self.workspace or "default",
+            },
+        })
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {
+            'command': self.command,
+            'config_file': self.config_file,
+            'project_id': self.project_id,
+            'workspace': self.workspace or "default",
+            'started_at': self.started_at.isoformat(),
+            'duration_s': self.duration,
+            'success': self.success,
+            'steps': self.steps,
+        }
+
+    def summary_lines(self) -> List[str]:
+        """One line per step, slowest first"""
+        return [f"  {step['name']:<20}{step['duration_s']:>9.2f}s  {step['status']}"
+                for step in sorted(self.steps, key=lambda s: -s['duration_s'])]
+
+    def write(self, reports_dir: Path) -> Path:
+        """Write the JSON report and append spans to the trace file"""
+        reports_dir.mkdir(parents=True, exist_ok=True)
+        name = self.project_id or Path(self.config_file).stem
+        report_file = reports_dir / (
+            f"{self.command}_{name}_"
+            f"{self.started_at.strftime('%Y%m%d_%H%M%S_%f')}.json")
+        with open(report_file, 'w') as f:
+            json.dump(self.to_dict(), f, indent=2)
+
+        if self.trace_file:
+            self.trace_file.parent.mkdir(parents=True, exist_ok=True)
+            with _trace_lock, open(self.trace_file, 'a') as f:
+                for span in self.spans:
+                    span['attributes']['autogcp.project_id'] = \
+                        self.project_id or ""
+                    f.write(json.dumps(span) + '\n')
+
+        return report_file
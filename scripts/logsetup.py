@@ -0,0 +1,261 @@
+"""
+Queued logging with rotated, compressed log files and per-project streams
+"""
+
+import atexit
+import gzip
+import logging
+import logging.handlers
+import os
+import queue
+import shutil
+import threading
+import time
+from collections import OrderedDict
+from datetime import datetime
+from pathlib import Path
+from typing import Dict, List, Optional
+
+# Override with AUTOGCP_LOG_DIR
+DEFAULT_LOG_DIR = Path(__file__).parent / "logs"
+
+# One run's log file is rotated at this size, keeping this many compressed parts
+MAX_LOG_BYTES = 50 * 1024 * 1024
+BACKUP_COUNT = 5
+
+# Logs untouched this long are compressed, older ones deleted, and the
+# oldest go first once the directory outgrows its budget. A day of
+# silence keeps the log of an idle serve daemon from being pulled away.
+COMPRESS_AFTER_SECONDS = 24 * 60 * 60
+RETENTION_DAYS = 30
+MAX_TOTAL_BYTES = 1024 * 1024 * 1024
+
+# Records waiting for the listener. A full queue blocks the logging
+# thread, so a fast terraform stream slows down instead of piling up.
+MAX_QUEUED_RECORDS = 10000
+
+# Project log files kept open at once. A long-running daemon sees many
+# projects, so the least recently written ones are closed and reopened
+# on their next record.
+MAX_OPEN_PROJECT_LOGS = 32
+
+LOG_FORMAT = '%(asctime)s - %(levelname)s - %(message)s'
+THREAD_LOG_FORMAT = '%(asctime)s - %(levelname)s - [%(threadName)s] %(message)s'
+
+_context = threading.local()
+_queue: Optional[queue.Queue] = None
+_listener: Optional[logging.handlers.QueueListener] = None
+
+
+def log_dir() -> Path:
+    return Path(os.environ.get('AUTOGCP_LOG_DIR', DEFAULT_LOG_DIR))
+
+
+def set_project(project_id: Optional[str]) -> None:
+    """Tag records from this thread with project_id, None to stop"""
+    _context.project = project_id
+
+
+def gzip_namer(name: str) -> str:
+    return f"{name}.gz"
+
+
+def gzip_rotator(source: str, dest: str) -> None:
+    """Compress a rotated log, writing to a temporary file first"""
+    with open(source, 'rb') as src, gzip.open(f"{dest}.tmp", 'wb') as dst:
+        shutil.copyfileobj(src, dst)
+    os.replace(f"{dest}.tmp", dest)
+    os.remove(source)
+
+
+def rotating_file_handler(path: Path) -> logging.Handler:
+    """File handler that rotates by size and gzips the rotated parts"""
+    path.parent.mkdir(parents=True, exist_ok=True)
+    handler = logging.handlers.RotatingFileHandler(
+        path, maxBytes=MAX_LOG_BYTES, backupCount=BACKUP_COUNT,
+        encoding='utf-8', delay=True)
+    handler.namer = gzip_namer
+    handler.rotator = gzip_rotator
+    return handler
+
+
+class ProjectFilter(logging.Filter):
+    """Stamps each record with the project of the thread that logged it
+
+    Runs in the logging thread, before the record is queued, since the
+    listener thread cannot tell which deployment a record came from.
+    """
+
+    def filter(self, record: logging.LogRecord) -> bool:
+        record.project = getattr(_context, 'project', None)
+        return True
+
+
+class ProjectFileHandler(logging.Handler):
+    """Writes records tagged with a project to that project's own log file
+
+    Off until split_project_logs() is called, so a single deployment
+    only writes the main log.
+    """
+
+    def __init__(self, directory: Path, name: str, formatter: logging.Formatter):
+        super().__init__(logging.DEBUG)
+        self.directory = directory
+        self.file_name = name
+        self.enabled = False
+        self.setFormatter(formatter)
+        self.handlers: Dict[str, logging.Handler] = OrderedDict()
+
+    def handler_for(self, project: str) -> logging.Handler:
+        if project in self.handlers:
+            self.handlers.move_to_end(project)
+            return self.handlers[project]
+
+        handler = rotating_file_handler(
+            self.directory / project / self.file_name)
+        handler.setFormatter(self.formatter)
+        self.handlers[project] = handler
+        while len(self.handlers) > MAX_OPEN_PROJECT_LOGS:
+            _, idle = self.handlers.popitem(last=False)
+            idle.close()
+        return handler
+
+    def emit(self, record: logging.LogRecord) -> None:
+        project = getattr(record, 'project', None)
+        if self.enabled and project:
+            self.handler_for(project).handle(record)
+
+    def close(self) -> None:
+        for handler in self.handlers.values():
+            handler.close()
+        super().close()
+
+
+class BlockingQueueHandler(logging.handlers.QueueHandler):
+    """Queue handler that waits for room instead of growing the queue"""
+
+    def enqueue(self, record: logging.LogRecord) -> None:
+        self.queue.put(record)
+
+
+def clean_logs(directory: Path, keep: List[Path]) -> None:
+    """Compress idle logs and delete old ones, leaving keep untouched"""
+    now = time.time()
+    files = []
+    for path in directory.rglob('*'):
+        if not path.is_file() or path in keep:
+            continue
+        try:
+            age = now - path.stat().st_mtime
+            if path.suffix == '.tmp' and age > COMPRESS_AFTER_SECONDS:
+                path.unlink()
+                continue
+            if age > RETENTION_DAYS * 24 * 60 * 60:
+                path.unlink()
+                continue
+            if path.suffix == '.log' and age > COMPRESS_AFTER_SECONDS:
+                compressed = path.with_name(gzip_namer(path.name))
+                gzip_rotator(str(path), str(compressed))
+                path = compressed
+            files.append((path.stat().st_mtime, path.stat().st_size, path))
+        except OSError:
+            # Another run may be cleaning up at the same time
+            continue
+
+    total = sum(size for _, size, _ in files)
+    for _, size, path in sorted(files):
+        if total <= MAX_TOTAL_BYTES:
+            break
+        try:
+            path.unlink()
+            total -= size
+        except OSError:
+            pass
+
+    for path in sorted(directory.rglob('*'), reverse=True):
+        if path.is_dir() and not any(path.iterdir()):
+            path.rmdir()
+
+
+def setup_logging(name: str, level: int = logging.INFO) -> None:
+    """Send every log record through a queue to the console and a log file
+
+    Loggers only put records on an in-memory queue. A listener thread
+    formats them and writes the console and the rotating log file, so
+    streaming terraform output never waits on disk or terminal I/O.
+    Call once from main(); the listener is flushed at exit.
+    """
+    global _queue, _listener
+    if _listener is not None:
+        return
+
+    directory = log_dir()
+    directory.mkdir(parents=True, exist_ok=True)
+    log_file = directory / f"{name}_{datetime.now().strftime('%Y%m%d_%H%M%S')}.log"
+    try:
+        clean_logs(directory, [log_file])
+    except OSError as e:
+        logging.getLogger(__name__).debug(f"Log cleanup failed: {e}")
+
+    formatter = logging.Formatter(LOG_FORMAT)
+    console_handler = logging.StreamHandler()
+    console_handler.setLevel(level)
+    console_handler.setFormatter(formatter)
+    file_handler = rotating_file_handler(log_file)
+    file_handler.setLevel(logging.DEBUG)
+    file_handler.setFormatter(formatter)
+    project_handler = ProjectFileHandler(
+        directory / "projects", log_file.name, formatter)
+
+    _queue = queue.Queue(maxsize=MAX_QUEUED_RECORDS)
+    queue_handler = BlockingQueueHandler(_queue)
+    queue_handler.addFilter(ProjectFilter())
+
+    root = logging.getLogger()
+    root.setLevel(logging.DEBUG)
+    root.addHandler(queue_handler)
+    # asyncio announces its selector on every terraform command
+    logging.getLogger('asyncio').setLevel(logging.WARNING)
+
+    _listener = logging.handlers.QueueListener(
+        _queue, console_handler, file_handler, project_handler,
+        respect_handler_level=True)
+    _listener.start()
+    atexit.register(stop_logging)
+
+
+def use_thread_format() -> None:
+    """Tag every line with its worker thread, which is named after the config"""
+    if _listener is None:
+        return
+    thread_fmt = logging.Formatter(THREAD_LOG_FORMAT)
+    for handler in _listener.handlers:
+        handler.setFormatter(thread_fmt)
+
+
+def split_project_logs() -> None:
+    """Also write each project's records to logs/projects/<project_id>/"""
+    if _listener is None:
+        return
+    for handler in _listener.handlers:
+        if isinstance(handler, ProjectFileHandler):
+            handler.enabled = True
+
+
+def flush() -> None:
+    """Wait until every queued record is written, e.g. before a prompt"""
+    if _queue is not None:
+        _queue.join()
+
+
+def stop_logging() -> None:
+    """Write the remaining records and close the log files"""
+    global _listener
+    if _listener is None:
+        return
+    # stop() cannot wait for room for its sentinel in a full queue
+    flush()
+    _listener.stop()
+    for handler in _listener.handlers:
+        handler.close()
+    _listener = None
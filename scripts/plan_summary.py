@@ -0,0 +1,200 @@
+"""
+Summarizes a saved plan from terraform show -json without loading it whole
+"""
+
+import json
+import re
+from collections import Counter, defaultdict
+from pathlib import Path
+from typing import Callable, Dict, List, Optional
+
+import tfrunner
+
+ACTION_NAMES = {
+    ('no-op',): 'no-op',
+    ('create',): 'create',
+    ('read',): 'read',
+    ('update',): 'update',
+    ('delete',): 'delete',
+    ('delete', 'create'): 'replace',
+    ('create', 'delete'): 'replace',
+}
+
+SUMMARY_ACTIONS = ['create', 'update', 'replace', 'delete']
+
+_STRUCTURAL = re.compile(r'["{}\[\]:,]')
+_STRING_BODY = re.compile(r'(?:[^"\\]|\\.)*"', re.DOTALL)
+
+
+class ResourceChangeStream:
+    """Incremental scanner for a top-level array such as resource_changes
+
+    Text is fed in arbitrary chunks. Only one element of the array is held
+    in memory at a time; everything else in the document (prior state,
+    configuration, planned values) is scanned past and dropped.
+    """
+
+    def __init__(self, on_change: Callable[[dict], None],
+                 key: str = 'resource_changes'):
+        self.on_change = on_change
+        self.key = key
+        self.buffer = ""
+        self.pos = 0
+        self.depth = 0
+        self.last_key: Optional[str] = None
+        self.expect_value = False
+        self.in_changes = False
+        self.element_start: Optional[int] = None
+
+    def feed(self, text: str) -> None:
+        """Scan the next chunk of the document"""
+        self.buffer += text
+        buffer = self.buffer
+
+        while True:
+            match = _STRUCTURAL.search(buffer, self.pos)
+            if not match:
+                self.pos = len(buffer)
+                break
+
+            char = match.group()
+            start = match.start()
+
+            if char == '"':
+                end = _STRING_BODY.match(buffer, start + 1)
+                if not end:
+                    # String continues in the next chunk
+                    self.pos = start
+                    break
+                self.pos = end.end()
+                if self.depth == 1 and not self.expect_value:
+                    self.last_key = json.loads(buffer[start:self.pos])
+                self.expect_value = False
+                continue
+
+            self.pos = start + 1
+            if char == ':':
+                self.expect_value = self.depth == 1
+                continue
+
+            self.expect_value = False
+            if char in '{[':
+                if self.depth == 1 and char == '[' and \
+                        self.last_key == self.key:
+                    self.in_changes = True
+                elif self.in_changes and self.depth == 2 and char == '{':
+                    self.element_start = start
+                self.depth += 1
+            elif char in '}]':
+                self.depth -= 1
+                if self.in_changes and self.depth == 2 and char == '}':
+                    self.on_change(json.loads(
+                        buffer[self.element_start:self.pos]))
+                    self.element_start = None
+                elif self.in_changes and self.depth == 1:
+                    self.in_changes = False
+
+        # Drop everything already scanned that is not part of an element
+        keep_from = self.pos if self.element_start is None else \
+            min(self.pos, self.element_start)
+        self.buffer = buffer[keep_from:]
+        self.pos -= keep_from
+        if self.element_start is not None:
+            self.element_start -= keep_from
+
+
+class PlanSummary:
+    """Counts planned actions per module and resource type"""
+
+    def __init__(self):
+        self.by_module: Dict[str, Counter] = defaultdict(Counter)
+        self.by_type: Dict[str, Counter] = defaultdict(Counter)
+        self.totals: Counter = Counter()
+        self.changed: List[Dict[str, str]] = []
+
+    def add(self, resource_change: dict) -> None:
+        """Record one element of resource_changes"""
+        actions = tuple(resource_change.get('change', {}).get('actions', []))
+        action = ACTION_NAMES.get(actions, '/'.join(actions))
+        module = resource_change.get('module_address', 'root')
+
+        self.totals[action] += 1
+        self.by_module[module][action] += 1
+        self.by_type[resource_change.get('type', '')][action] += 1
+
+        if action not in ('no-op', 'read'):
+            self.changed.append({
+                'address': resource_change.get('address', ''),
+                'action': action,
+            })
+
+    @property
+    def has_changes(self) -> bool:
+        return any(self.totals[action] for action in SUMMARY_ACTIONS)
+
+    def to_dict(self) -> dict:
+        return {
+            'totals': dict(self.totals),
+            'by_module': {k: dict(v) for k, v in sorted(self.by_module.items())},
+            'by_type': {k: dict(v) for k, v in sorted(self.by_type.items())},
+            'changed': self.changed,
+        }
+
+    def lines(self) -> List[str]:
+        """Human readable summary, one module per line"""
+        def counts(counter: Counter) -> str:
+            return ", ".join(f"{counter[a]} to {a}"
+                             for a in SUMMARY_ACTIONS if counter[a])
+
+        lines = [f"Plan: {counts(self.totals) or 'no changes'}"]
+        for module, counter in sorted(self.by_module.items()):
+            if any(counter[a] for a in SUMMARY_ACTIONS):
+                lines.append(f"  {module}: {counts(counter)}")
+        return lines
+
+    def write(self, path: Path) -> None:
+        path.parent.mkdir(parents=True, exist_ok=True)
+        with open(path, 'w') as f:
+            json.dump(self.to_dict(), f, indent=2)
+
+
+def stream_plan(work_dir: Path, plan_file: str, key: str,
+                on_change: Callable[[dict], None],
+                env: Optional[Dict[str, str]] = None,
+                on_stderr: Callable[[str], None] = lambda line: None,
+                timeout: Optional[float] = None) -> None:
+    """Stream one array of terraform show -json to on_change, raising on failure"""
+    stream = ResourceChangeStream(on_change, key)
+
+    returncode = tfrunner.stream_command(
+        ['terraform', 'show', '-json', plan_file],
+        cwd=work_dir,
+        on_stdout=stream.feed,
+        on_stderr=on_stderr,
+        env=env,
+        timeout=timeout
+    )
+    if returncode != 0:
+        raise RuntimeError(f"terraform show exited with {returncode}")
+
+
+def summarize_plan(work_dir: Path, plan_file: str,
+                   env: Optional[Dict[str, str]] = None,
+                   on_stderr: Callable[[str], None] = lambda line: None,
+                   timeout: Optional[float] = None) -> PlanSummary:
+    """Summarize the resource_changes of a saved plan"""
+    summary = PlanSummary()
+    stream_plan(work_dir, plan_file, 'resource_changes', summary.add,
+                env, on_stderr, timeout)
+    return summary
+
+
+def drifted_resources(work_dir: Path, plan_file: str,
+                      env: Optional[Dict[str, str]] = None,
+                      on_stderr: Callable[[str], None] = lambda line: None,
+                      timeout: Optional[float] = None) -> List[Dict[str, str]]:
+    """List what a refresh found changed outside terraform"""
+    summary = PlanSummary()
+    stream_plan(work_dir, plan_file, 'resource_drift', summary.add,
+                env, on_stderr, timeout)
+    return summary.changed
@@ -0,0 +1,271 @@
+"""
+Manages a persistent Terraform provider plugin cache shared by all runs
+"""
+
+import argparse
+import fcntl
+import logging
+import os
+import re
+import shutil
+import sys
+import tempfile
+import time
+from contextlib import contextmanager
+from pathlib import Path
+from typing import Dict, Iterator, List, Optional, Set, Tuple
+
+import tfrunner
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_CACHE_DIR = Path.home() / ".cache" / "autogcp" / "plugins"
+DEFAULT_MAX_SIZE_MB = 2048
+
+LOCK_PROVIDER_RE = re.compile(
+    r'^provider\s+"([^"]+)"\s*\{\s*^\s*version\s*=\s*"([^"]+)"', re.MULTILINE)
+
+
+class PluginCache:
+    """Provider plugin cache that doubles as an offline filesystem mirror
+
+    Terraform's plugin cache uses the same HOST/NAMESPACE/TYPE/VERSION/TARGET
+    layout as an unpacked filesystem mirror, so one directory serves both
+    online runs (TF_PLUGIN_CACHE_DIR) and air-gapped runs (a CLI config that
+    only installs from that directory).
+    """
+
+    def __init__(self, cache_dir: Optional[str] = None,
+                 max_size_mb: Optional[int] = None,
+                 offline: Optional[bool] = None):
+        self.cache_dir = Path(
+            cache_dir
+            or os.getenv('AUTOGCP_PLUGIN_CACHE_DIR')
+            or os.getenv('TF_PLUGIN_CACHE_DIR')
+            or DEFAULT_CACHE_DIR
+        ).expanduser()
+        self.max_size_mb = max_size_mb if max_size_mb is not None else int(
+            os.getenv('AUTOGCP_PLUGIN_CACHE_MAX_MB', DEFAULT_MAX_SIZE_MB))
+        self.offline = offline if offline is not None else \
+            os.getenv('AUTOGCP_OFFLINE', '').lower() in ('1', 'true', 'yes')
+        self.cli_config_file = self.cache_dir / ".terraformrc"
+        self.lock_file = self.cache_dir / ".lock"
+
+    def env(self) -> Dict[str, str]:
+        """Environment for terraform processes that should use the cache"""
+        self.cache_dir.mkdir(parents=True, exist_ok=True)
+        env = os.environ.copy()
+        env['TF_PLUGIN_CACHE_DIR'] = str(self.cache_dir)
+
+        if self.offline:
+            self.write_cli_config()
+            env['TF_CLI_CONFIG_FILE'] = str(self.cli_config_file)
+
+        return env
+
+    def write_cli_config(self) -> None:
+        """Write a CLI config that installs providers only from the cache"""
+        cli_config = (
+            'provider_installation {\n'
+            '  filesystem_mirror {\n'
+            f'    path = "{self.cache_dir}"\n'
+            '  }\n'
+            '}\n'
+        )
+        if not self.cli_config_file.exists() or \
+                self.cli_config_file.read_text() != cli_config:
+            self.cli_config_file.write_text(cli_config)
+
+    def is_warm(self, lock_file: Path) -> bool:
+        """Check whether every provider pinned by lock_file is cached"""
+        pinned = self.locked_versions(lock_file)
+        return bool(pinned) and all(
+            (self.cache_dir / source / version).is_dir()
+            for source, version in pinned)
+
+    @contextmanager
+    def locked(self, lock_file: Optional[Path] = None) -> Iterator[None]:
+        """Serialize provider installs, the cache is not concurrency safe
+
+        When lock_file pins only providers that are already cached, init just
+        links them from the cache, so it shares the lock with other such
+        inits. Installs and eviction hold it exclusively, which keeps a
+        version from being removed while an init links from it.
+        """
+        self.cache_dir.mkdir(parents=True, exist_ok=True)
+        with open(self.lock_file, 'w') as f:
+            fcntl.flock(f, fcntl.LOCK_SH)
+            try:
+                if lock_file is None or not self.is_warm(lock_file):
+                    fcntl.flock(f, fcntl.LOCK_EX)
+                yield
+            finally:
+                fcntl.flock(f, fcntl.LOCK_UN)
+
+    def version_dirs(self) -> List[Path]:
+        """List HOST/NAMESPACE/TYPE/VERSION directories in the cache"""
+        if not self.cache_dir.exists():
+            return []
+        return sorted(p for p in self.cache_dir.glob("*/*/*/*") if p.is_dir())
+
+    @staticmethod
+    def locked_versions(lock_file: Path) -> Set[Tuple[str, str]]:
+        """Read (provider source, version) pairs from a dependency lock file"""
+        try:
+            content = lock_file.read_text()
+        except OSError:
+            return set()
+        return set(LOCK_PROVIDER_RE.findall(content))
+
+    def record_use(self, lock_file: Path) -> List[Path]:
+        """Mark the providers pinned by lock_file as used, then evict
+
+        Takes the cache lock, so call it after the init's locked() block.
+        """
+        pinned = self.locked_versions(lock_file)
+        with self.locked():
+            now = time.time()
+            for source, version in pinned:
+                version_dir = self.cache_dir / source / version
+                if version_dir.exists():
+                    os.utime(version_dir, (now, now))
+            return self.evict(keep=pinned)
+
+    def evict(self, keep: Optional[Set[Tuple[str, str]]] = None) -> List[Path]:
+        """Remove least recently used provider versions over the size limit
+
+        Callers must hold the cache lock, see record_use().
+        """
+        keep = keep or set()
+        limit = self.max_size_mb * 1024 * 1024
+
+        entries = []
+        for version_dir in self.version_dirs():
+            size = sum(f.stat().st_size for f in version_dir.rglob("*")
+                       if f.is_file() and not f.is_symlink())
+            entries.append((version_dir.stat().st_mtime, size, version_dir))
+
+        total = sum(size for _, size, _ in entries)
+        evicted = []
+        for _, size, version_dir in sorted(entries):
+            if total <= limit:
+                break
+            relative = version_dir.relative_to(self.cache_dir)
+            if (str(relative.parent), relative.name) in keep:
+                continue
+            shutil.rmtree(version_dir, ignore_errors=True)
+            total -= size
+            evicted.append(version_dir)
+
+        return evicted
+
+    def warm(self, root_dir: Path) -> bool:
+        """Install the providers required by root_dir into the cache
+
+        Runs init on a copy of every root .tf file and the modules, so
+        providers required anywhere in the tree are cached, without
+        touching the backend of root_dir itself.
+        """
+        logger.info(f"Warming provider cache: {self.cache_dir}")
+
+        with tempfile.TemporaryDirectory(prefix="autogcp-warm-") as scratch:
+            scratch_dir = Path(scratch)
+            for tf_file in root_dir.glob("*.tf"):
+                shutil.copy2(tf_file, scratch_dir)
+            shutil.copytree(root_dir / "modules", scratch_dir / "modules")
+            lock_file = root_dir / ".terraform.lock.hcl"
+            if lock_file.exists():
+                shutil.copy2(lock_file, scratch_dir)
+
+            command = ['init', '-backend=false', '-input=false']
+            try:
+                with self.locked():
+                    returncode = tfrunner.stream_command(
+                        ['terraform'] + command,
+                        cwd=scratch_dir,
+                        env=self.env(),
+                        on_stdout=lambda line: logger.debug(f"   {line}"),
+                        on_stderr=lambda line: logger.error(f"   {line}"),
+                        timeout=tfrunner.default_timeout(command)
+                    )
+            except tfrunner.CommandStopped as e:
+                logger.error(f"Provider install stopped: {e}")
+                return False
+
+            if returncode != 0:
+                logger.error(
+                    f"Provider install failed with exit code {returncode}")
+                return False
+
+            evicted = self.record_use(scratch_dir / ".terraform.lock.hcl")
+
+        for version_dir in evicted:
+            logger.info(f"Evicted {version_dir.relative_to(self.cache_dir)}")
+        for version_dir in self.version_dirs():
+            logger.info(f"  Cached {version_dir.relative_to(self.cache_dir)}")
+
+        return True
+
+
+def main():
+    """Main entry point"""
+    parser = argparse.ArgumentParser(
+        description='Manage the shared Terraform provider plugin cache',
+        formatter_class=argparse.RawDescriptionHelpFormatter,
+        epilog="""
+Examples:
+  python plugin_cache.py warm
+  python plugin_cache.py warm --cache-dir /opt/autogcp/plugins
+  python plugin_cache.py evict --max-size-mb 512
+        """
+    )
+
+    parser.add_argument(
+        'action',
+        choices=['warm', 'evict'],
+        help='Fill the cache, or apply the size limit'
+    )
+
+    parser.add_argument(
+        '--cache-dir',
+        help='Cache directory (default: $AUTOGCP_PLUGIN_CACHE_DIR or ~/.cache/autogcp/plugins)',
+        default=None
+    )
+
+    parser.add_argument(
+        '--max-size-mb',
+        help='Cache size limit in MB before old provider versions are evicted',
+        type=int,
+        default=None
+    )
+
+    parser.add_argument(
+        '-v', '--verbose',
+        help='Enable verbose/debug logging',
+        action='store_true'
+    )
+
+    args = parser.parse_args()
+
+    logging.basicConfig(
+        level=logging.DEBUG if args.verbose else logging.INFO,
+        format='%(asctime)s - %(levelname)s - %(message)s'
+    )
+
+    cache = PluginCache(cache_dir=args.cache_dir,
+                        max_size_mb=args.max_size_mb, offline=False)
+
+    if args.action == 'warm':
+        success = cache.warm(Path(__file__).parent.parent)
+    else:
+        with cache.locked():
+            evicted = cache.evict()
+        for version_dir in evicted:
+            logger.info(f"Evicted {version_dir.relative_to(cache.cache_dir)}")
+        success = True
+
+    sys.exit(0 if success else 1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,147 @@
+"""
+Admits fleet deployments under per-API concurrency budgets
+"""
+
+import logging
+import re
+import threading
+from typing import Callable, Dict, Iterable, List, Optional, Set
+
+from changes import active_modules
+
+# Google APIs each module calls, beyond what is listed in apis
+MODULE_APIS: Dict[str, Set[str]] = {
+    'project': {'cloudresourcemanager.googleapis.com',
+                'serviceusage.googleapis.com', 'iam.googleapis.com'},
+    'vpc': {'compute.googleapis.com'},
+    'gcs': {'storage.googleapis.com'},
+    'compute': {'compute.googleapis.com'},
+    'cloudsql': {'sqladmin.googleapis.com'},
+    'cloudrun': {'run.googleapis.com'},
+    'gke': {'container.googleapis.com'},
+    'loadbalancer': {'compute.googleapis.com'},
+    'pubsub': {'pubsub.googleapis.com'},
+    'monitoring': {'monitoring.googleapis.com', 'logging.googleapis.com'},
+}
+
+# Lines from the provider that mean a request was rate limited. Hard
+# quotas, e.g. "Quota 'CPUS' exceeded" in a region, do not match: backing
+# off cannot fix those, so they fail like any other error.
+_PER_INTERVAL = r'\bper (?:minute|second|100 seconds)\b'
+_RATE_LIMITED = re.compile(
+    r'Error 429|Too Many Requests|rateLimitExceeded|'
+    rf'RESOURCE_EXHAUSTED.*(?:\brate\b|{_PER_INTERVAL})|'
+    rf'Quota exceeded.*{_PER_INTERVAL}', re.IGNORECASE)
+_API_NAME = re.compile(r'\b([a-z0-9-]+\.googleapis\.com)\b')
+
+
+def config_apis(config: dict) -> Set[str]:
+    """APIs a deployment of this config talks to"""
+    apis = {api for api in config.get('apis') or [] if isinstance(api, str)}
+    for module in active_modules(config):
+        apis |= MODULE_APIS[module]
+    return apis
+
+
+def parse_budgets(values: Iterable[str]) -> Dict[str, int]:
+    """Parse API=N pairs from the command line"""
+    budgets = {}
+    for value in values:
+        api, _, limit = value.partition('=')
+        if not api or not limit.isdigit() or int(limit) < 1:
+            raise ValueError(f"expected API=N with N >= 1, got {value!r}")
+        budgets[api] = int(limit)
+    return budgets
+
+
+class ApiScheduler:
+    """Hands out deployments so no API has more running than its budget
+
+    A worker takes the first pending deployment whose APIs all have a free
+    slot, so a saturated API never idles a worker that could run something
+    else. Every API starts at its configured budget (the worker count by
+    default). When a rate limit error names an API, or hits a deployment
+    without naming one, the budget of those APIs is halved. Each deployment
+    that then finishes cleanly grows the budgets of its APIs back by one.
+    """
+
+    def __init__(self, workers: int, budgets: Optional[Dict[str, int]] = None,
+                 log: Optional[logging.Logger] = None):
+        self.workers = workers
+        self.max_budgets = dict(budgets or {})
+        self.budgets = dict(self.max_budgets)
+        self.log = log or logging.getLogger(__name__)
+        self.pending: List[str] = []
+        self.apis: Dict[str, Set[str]] = {}
+        self.in_use: Dict[str, int] = {}
+        self.throttled: Dict[str, Set[str]] = {}
+        self.condition = threading.Condition()
+
+    def max_budget(self, api: str) -> int:
+        return self.max_budgets.get(api, self.workers)
+
+    def budget(self, api: str) -> int:
+        return self.budgets.get(api, self.max_budget(api))
+
+    def add(self, key: str, apis: Set[str]) -> None:
+        """Queue a deployment that uses apis"""
+        with self.condition:
+            self.pending.append(key)
+            self.apis[key] = apis
+            self.condition.notify()
+
+    def cancel(self) -> None:
+        """Drop everything not yet started"""
+        with self.condition:
+            self.pending.clear()
+            self.condition.notify_all()
+
+    def admissible(self, key: str) -> bool:
+        return all(self.in_use.get(api, 0) < self.budget(api)
+                   for api in self.apis[key])
+
+    def next(self) -> Optional[str]:
+        """Block until a pending deployment fits, None once none are left"""
+        with self.condition:
+            while self.pending:
+                for key in self.pending:
+                    if self.admissible(key):
+                        self.pending.remove(key)
+                        for api in self.apis[key]:
+                            self.in_use[api] = self.in_use.get(api, 0) + 1
+                        self.throttled[key] = set()
+                        return key
+                self.condition.wait()
+            return None
+
+    def release(self, key: str) -> None:
+        """Free the slots of a finished deployment"""
+        with self.condition:
+            throttled = self.throttled.pop(key, set())
+            for api in self.apis[key]:
+                self.in_use[api] -= 1
+                if api not in throttled and self.budget(api) < self.max_budget(api):
+                    self.budgets[api] = self.budget(api) + 1
+                    self.log.info(
+                        f"Raising {api} budget to {self.budgets[api]} deployments")
+            self.condition.notify_all()
+
+    def throttle(self, key: str, apis: Set[str]) -> None:
+        """Halve the budget of apis, once per deployment"""
+        with self.condition:
+            for api in apis - self.throttled[key]:
+                self.throttled[key].add(api)
+                budget = max(1, self.budget(api) // 2)
+                if budget < self.budget(api):
+                    self.budgets[api] = budget
+                    self.log.warning(
+                        f"Rate limited on {api}, lowering its budget to {budget} deployments")
+
+    def watcher(self, key: str) -> Callable[[str], None]:
+        """Output handler that throttles on rate limit errors for key"""
+        def watch(line: str) -> None:
+            if not _RATE_LIMITED.search(line):
+                return
+            named = set(_API_NAME.findall(line)) & self.apis[key]
+            self.throttle(key, named or self.apis[key])
+        return watch
@@ -0,0 +1,696 @@
+"""
+Local daemon that runs plan, apply and destroy jobs from a priority queue
+"""
+
+import argparse
+import ipaddress
+import itertools
+import json
+import logging
+import signal
+import sys
+import threading
+import urllib.error
+import urllib.request
+import uuid
+from collections import deque
+from datetime import datetime
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from pathlib import Path
+from typing import Deque, Dict, List, Optional, Tuple
+from urllib.parse import parse_qs, urlparse
+
+import logsetup
+import tfrunner
+from config_loader import load_config
+from deploy import TerraformDeployer
+from destroy import TerraformDestroyer
+from tfoptions import parse_lock_timeout, parse_parallelism
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_HOST = "127.0.0.1"
+DEFAULT_PORT = 8765
+
+COMMANDS = ('plan', 'apply', 'destroy', 'warm')
+
+# Warm-up jobs only run when nothing else is waiting
+WARM_PRIORITY = -100
+
+# Finished jobs kept for status and log requests
+MAX_FINISHED_JOBS = 200
+
+# Log lines kept in memory per job, the full log is in the project's log file
+MAX_JOB_LOG_LINES = 5000
+
+# Finished jobs that keep their log lines in memory, older ones keep only
+# their status
+MAX_LOGGED_JOBS = 20
+
+
+class Job:
+    """One queued command with its options, status and captured log"""
+
+    def __init__(self, command: str, config: str, workspace: Optional[str] = None,
+                 priority: int = 0, options: Optional[dict] = None,
+                 key: Optional[str] = None):
+        self.id = uuid.uuid4().hex[:8]
+        self.command = command
+        self.config = config
+        self.workspace = workspace
+        self.priority = priority
+        self.options = options or {}
+        # Jobs with the same key share a working directory
+        self.key = key or config
+        self.status = 'queued'
+        self.submitted_at = datetime.now()
+        self.started_at: Optional[datetime] = None
+        self.finished_at: Optional[datetime] = None
+        self.lines: Deque[str] = deque(maxlen=MAX_JOB_LOG_LINES)
+        self.line_count = 0
+        self.condition = threading.Condition()
+
+    @property
+    def finished(self) -> bool:
+        return self.status in ('succeeded', 'failed', 'cancelled')
+
+    def append(self, line: str) -> None:
+        with self.condition:
+            self.lines.append(line)
+            self.line_count += 1
+            self.condition.notify_all()
+
+    def lines_since(self, sent: int) -> Tuple[List[str], int]:
+        """Lines after the first sent that are still kept, and the new count
+
+        Call with the condition held.
+        """
+        first = self.line_count - len(self.lines)
+        skip = max(sent - first, 0)
+        lines = list(itertools.islice(self.lines, skip, None))
+        if sent < first:
+            lines.insert(0, f"... {first - sent} earlier lines are only "
+                            f"in the project log")
+        return lines, self.line_count
+
+    def drop_log(self) -> None:
+        """Free the kept lines, later reads point to the project log"""
+        with self.condition:
+            self.lines.clear()
+
+    def finish(self, status: str) -> None:
+        with self.condition:
+            self.status = status
+            self.finished_at = datetime.now()
+            self.condition.notify_all()
+
+    def to_dict(self) -> dict:
+        return {
+            'id': self.id,
+            'command': self.command,
+            'config': self.config,
+            'workspace': self.workspace or "default",
+            'priority': self.priority,
+            'options': self.options,
+            'status': self.status,
+            'submitted_at': self.submitted_at.isoformat(),
+            'started_at': self.started_at.isoformat() if self.started_at else None,
+            'finished_at': self.finished_at.isoformat() if self.finished_at else None,
+            'log_lines': self.line_count,
+        }
+
+
+class JobQueue:
+    """Priority queue that never runs two jobs with the same key at once
+
+    Higher priorities go first and equal priorities run in submission
+    order. A job whose working directory is busy waits without holding
+    back the jobs behind it.
+    """
+
+    def __init__(self):
+        self.pending: List[tuple] = []
+        self.counter = itertools.count()
+        self.jobs: Dict[str, Job] = {}
+        self.busy: set = set()
+        self.closed = False
+        self.condition = threading.Condition()
+
+    def submit(self, job: Job) -> None:
+        with self.condition:
+            self.jobs[job.id] = job
+            self.pending.append((-job.priority, next(self.counter), job))
+            self.pending.sort(key=lambda entry: entry[:2])
+            self.condition.notify_all()
+
+    def next(self) -> Optional[Job]:
+        """Block until a job can start, None once the queue is closed"""
+        with self.condition:
+            while not self.closed:
+                for entry in self.pending:
+                    job = entry[2]
+                    if job.key not in self.busy:
+                        self.pending.remove(entry)
+                        self.busy.add(job.key)
+                        job.status = 'running'
+                        job.started_at = datetime.now()
+                        return job
+                self.condition.wait()
+            return None
+
+    def done(self, job: Job) -> None:
+        with self.condition:
+            self.busy.discard(job.key)
+            self.prune()
+            self.condition.notify_all()
+
+    def cancel(self, job_id: str) -> bool:
+        """Cancel a job that has not started yet"""
+        with self.condition:
+            for entry in self.pending:
+                if entry[2].id == job_id:
+                    self.pending.remove(entry)
+                    entry[2].finish('cancelled')
+                    return True
+            return False
+
+    def close(self) -> None:
+        with self.condition:
+            self.closed = True
+            for entry in self.pending:
+                entry[2].finish('cancelled')
+            self.pending.clear()
+            self.condition.notify_all()
+
+    def prune(self) -> None:
+        finished = [job for job in self.jobs.values() if job.finished]
+        for job in finished[:max(0, len(finished) - MAX_FINISHED_JOBS)]:
+            del self.jobs[job.id]
+        for job in finished[:max(0, len(finished) - MAX_LOGGED_JOBS)]:
+            job.drop_log()
+
+    def get(self, job_id: str) -> Optional[Job]:
+        with self.condition:
+            return self.jobs.get(job_id)
+
+    def list(self) -> List[Job]:
+        with self.condition:
+            return list(self.jobs.values())
+
+
+class JobLogHandler(logging.Handler):
+    """Copies log records into the log of the job running on their thread"""
+
+    def __init__(self):
+        super().__init__(logging.DEBUG)
+        self.jobs: Dict[int, Job] = {}
+        self.setFormatter(logging.Formatter(
+            '%(asctime)s - %(levelname)s - %(message)s'))
+
+    def attach(self, job: Job) -> None:
+        self.jobs[threading.get_ident()] = job
+
+    def detach(self) -> None:
+        self.jobs.pop(threading.get_ident(), None)
+
+    def emit(self, record: logging.LogRecord) -> None:
+        job = self.jobs.get(record.thread)
+        if job is not None:
+            job.append(self.format(record))
+
+
+def job_from_request(body: dict, root_dir: Path) -> Job:
+    """Build a job from a submitted JSON body, raising ValueError if invalid"""
+    if not isinstance(body, dict):
+        raise ValueError("the body must be a JSON object")
+    command = body.get('command')
+    if command not in COMMANDS:
+        raise ValueError(f"command must be one of {', '.join(COMMANDS)}")
+    config = body.get('config')
+    if not isinstance(config, str):
+        raise ValueError("config must be the path of a YAML file")
+    config = str(Path(config).resolve())
+    workspace = body.get('workspace')
+
+    priority = body.get('priority', WARM_PRIORITY if command == 'warm' else 0)
+    if not isinstance(priority, int) or isinstance(priority, bool):
+        raise ValueError("priority must be an integer")
+
+    options = dict(body.get('options') or {})
+    unknown = set(options) - {'auto_approve', 'reinit', 'targeted', 'waves',
+                              'parallelism', 'refresh', 'lock_timeout'}
+    if unknown:
+        raise ValueError(f"unknown options: {', '.join(sorted(unknown))}")
+    options['parallelism'] = parse_parallelism(options.get('parallelism'))
+    options['lock_timeout'] = parse_lock_timeout(options.get('lock_timeout'))
+    if command in ('apply', 'destroy') and not options.get('auto_approve'):
+        raise ValueError(
+            f"{command} jobs need auto_approve, the daemon cannot prompt")
+
+    # Resolving now reports a broken config to the client right away
+    try:
+        project_id = load_config(config, root_dir, workspace).get('project_id')
+    except Exception as e:
+        raise ValueError(f"cannot load {config}: {e}")
+
+    # Every command runs in the project's own work dir
+    return Job(command, config, workspace, priority, options, project_id or config)
+
+
+def run_job(job: Job) -> bool:
+    """Run a job in the worker thread, True on success"""
+    options = job.options
+    tuning = dict(parallelism=options.get('parallelism'),
+                  refresh=options.get('refresh'),
+                  lock_timeout=options.get('lock_timeout'))
+
+    if job.command == 'destroy':
+        return TerraformDestroyer(
+            config_file=job.config,
+            workspace=job.workspace,
+            auto_approve=True,
+            reinit=bool(options.get('reinit')),
+            waves=bool(options.get('waves')),
+            isolated=True,
+            **tuning
+        ).destroy()
+
+    deployer = TerraformDeployer(
+        config_file=job.config,
+        workspace=job.workspace,
+        auto_approve=True,
+        dry_run=job.command != 'apply',
+        isolated=True,
+        reinit=bool(options.get('reinit')),
+        targeted=bool(options.get('targeted')),
+        **tuning
+    )
+    if job.command != 'warm':
+        return deployer.deploy()
+
+    success = False
+    try:
+        success = deployer.prepare() is not None
+        return success
+    finally:
+        deployer.write_report(success)
+
+
+class Daemon:
+    """Worker pool running jobs from the queue, with logs captured per job
+
+    Everything stays loaded between jobs, and the per-project working
+    directories keep their init, validate and plan caches, so a job only
+    pays for the terraform steps whose inputs changed.
+    """
+
+    def __init__(self, workers: int = 2):
+        self.workers = workers
+        self.root_dir = Path(__file__).parent.parent
+        self.queue = JobQueue()
+        self.log_handler = JobLogHandler()
+        logging.getLogger().addHandler(self.log_handler)
+        self.threads: List[threading.Thread] = []
+
+    def start(self) -> None:
+        for number in range(self.workers):
+            thread = threading.Thread(
+                target=self.work, name=f"worker-{number + 1}")
+            thread.start()
+            self.threads.append(thread)
+
+    def work(self) -> None:
+        while True:
+            job = self.queue.next()
+            if job is None:
+                return
+            threading.current_thread().name = f"{job.id}-{Path(job.config).stem}"
+            self.log_handler.attach(job)
+            logger.info(f"Starting {job.command} of {job.config}")
+            try:
+                success = run_job(job)
+            except Exception as e:
+                logger.exception(f"Unexpected error: {e}")
+                success = False
+            finally:
+                self.log_handler.detach()
+            job.finish('succeeded' if success else 'failed')
+            self.queue.done(job)
+            logger.info(f"Job {job.id} {job.status}")
+
+    def submit(self, body: dict) -> Job:
+        job = job_from_request(body, self.root_dir)
+        self.queue.submit(job)
+        logger.info(f"Queued job {job.id}: {job.command} {job.config} "
+                    f"(priority {job.priority})")
+        return job
+
+    def stop(self) -> None:
+        """Cancel queued jobs, interrupt running ones and wait for the workers
+
+        Interrupted terraform processes release their state locks before
+        they exit, and no job starts another command after this.
+        """
+        self.queue.close()
+        tfrunner.shutdown()
+        for thread in self.threads:
+            thread.join()
+        logging.getLogger().removeHandler(self.log_handler)
+
+
+class JobRequestHandler(BaseHTTPRequestHandler):
+    """JSON API over the daemon
+
+    POST /jobs               submit a job, returns its id
+    GET  /jobs               list jobs
+    GET  /jobs/<id>          job status
+    GET  /jobs/<id>/log      job log, ?follow=1 streams until it finishes
+    DELETE /jobs/<id>        cancel a queued job
+    """
+
+    daemon: Daemon = None
+
+    def log_message(self, format: str, *args) -> None:
+        logger.debug(f"{self.address_string()} {format % args}")
+
+    def send_json(self, status: int, payload) -> None:
+        body = json.dumps(payload, indent=2).encode('utf-8')
+        self.send_response(status)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def route(self) -> Tuple[Optional[Job], Optional[str]]:
+        """Find the job of a /jobs/<id>[/<action>] path, sending 404 if none"""
+        parts = [p for p in urlparse(self.path).path.split('/') if p]
+        if len(parts) not in (2, 3) or parts[0] != 'jobs':
+            self.send_json(404, {'error': 'not found'})
+            return None, None
+        job = self.daemon.queue.get(parts[1])
+        if job is None:
+            self.send_json(404, {'error': f"no job {parts[1]}"})
+        return job, parts[2] if len(parts) == 3 else None
+
+    def do_POST(self) -> None:
+        if urlparse(self.path).path.rstrip('/') != '/jobs':
+            self.send_json(404, {'error': 'not found'})
+            return
+        try:
+            length = int(self.headers.get('Content-Length', 0))
+            body = json.loads(self.rfile.read(length) or b'{}')
+            job = self.daemon.submit(body)
+        except (ValueError, TypeError) as e:
+            self.send_json(400, {'error': str(e)})
+            return
+        self.send_json(201, job.to_dict())
+
+    def do_GET(self) -> None:
+        url = urlparse(self.path)
+        if url.path.rstrip('/') == '/jobs':
+            self.send_json(200, [job.to_dict() for job in self.daemon.queue.list()])
+            return
+
+        job, action = self.route()
+        if job is None:
+            return
+        if action is None:
+            self.send_json(200, job.to_dict())
+        elif action == 'log':
+            follow = parse_qs(url.query).get('follow', ['0'])[0] not in ('0', '')
+            self.stream_log(job, follow)
+        else:
+            self.send_json(404, {'error': 'not found'})
+
+    def do_DELETE(self) -> None:
+        job, action = self.route()
+        if job is None or action is not None:
+            return
+        if self.daemon.queue.cancel(job.id):
+            self.send_json(200, job.to_dict())
+        else:
+            self.send_json(409, {'error': f"job {job.id} is {job.status}"})
+
+    def stream_log(self, job: Job, follow: bool) -> None:
+        """Send log lines as they arrive, closing when the job is done"""
+        self.send_response(200)
+        self.send_header('Content-Type', 'text/plain; charset=utf-8')
+        self.end_headers()
+
+        sent = 0
+        try:
+            while True:
+                with job.condition:
+                    while follow and sent == job.line_count and not job.finished:
+                        job.condition.wait()
+                    lines, sent = job.lines_since(sent)
+                    finished = job.finished
+                if lines:
+                    self.wfile.write(''.join(f"{line}\n" for line in lines)
+                                     .encode('utf-8'))
+                    self.wfile.flush()
+                if finished or not follow:
+                    return
+        except (BrokenPipeError, ConnectionResetError):
+            logger.debug(f"Client stopped following job {job.id}")
+
+
+def _terminate(signum, frame) -> None:
+    """Shut down on SIGTERM the same way as on Ctrl+C"""
+    raise KeyboardInterrupt
+
+
+def is_loopback(host: str) -> bool:
+    """Whether host only accepts connections from this machine"""
+    if host == 'localhost':
+        return True
+    try:
+        return ipaddress.ip_address(host).is_loopback
+    except ValueError:
+        return False
+
+
+def serve(host: str, port: int, workers: int, warm: List[str]) -> None:
+    """Run the daemon until interrupted"""
+    logsetup.use_thread_format()
+    logsetup.split_project_logs()
+    daemon = Daemon(workers)
+    daemon.start()
+
+    for config_file in warm:
+        try:
+            daemon.submit({'command': 'warm', 'config': config_file})
+        except ValueError as e:
+            logger.warning(f"Not warming {config_file}: {e}")
+
+    handler = type('Handler', (JobRequestHandler,), {'daemon': daemon})
+    server = ThreadingHTTPServer((host, port), handler)
+    server.daemon_threads = True
+    signal.signal(signal.SIGTERM, _terminate)
+    logger.info(f"Serving on http://{host}:{port} with {workers} workers")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        logger.warning("Shutting down, stopping running terraform processes")
+    finally:
+        server.server_close()
+        daemon.stop()
+
+
+def request(server: str, method: str, path: str, body: Optional[dict] = None):
+    """Send a JSON request to the daemon and return the open response"""
+    data = json.dumps(body).encode('utf-8') if body is not None else None
+    req = urllib.request.Request(
+        f"{server.rstrip('/')}{path}", data=data, method=method,
+        headers={'Content-Type': 'application/json'})
+    return urllib.request.urlopen(req)
+
+
+def submit(server: str, body: dict, follow: bool) -> int:
+    """Submit a job, optionally stream its log, and return an exit code"""
+    try:
+        with request(server, 'POST', '/jobs', body) as response:
+            job = json.load(response)
+    except urllib.error.HTTPError as e:
+        print(f"Rejected: {json.load(e).get('error')}", file=sys.stderr)
+        return 1
+    except urllib.error.URLError as e:
+        print(f"Cannot reach the daemon at {server}: {e.reason}", file=sys.stderr)
+        return 1
+
+    print(f"Job {job['id']} queued", file=sys.stderr)
+    if not follow:
+        print(job['id'])
+        return 0
+
+    with request(server, 'GET', f"/jobs/{job['id']}/log?follow=1") as response:
+        for line in response:
+            sys.stdout.write(line.decode('utf-8'))
+            sys.stdout.flush()
+
+    with request(server, 'GET', f"/jobs/{job['id']}") as response:
+        job = json.load(response)
+    print(f"Job {job['id']} {job['status']}", file=sys.stderr)
+    return 0 if job['status'] == 'succeeded' else 1
+
+
+def main():
+    """Main entry point"""
+    parser = argparse.ArgumentParser(
+        description='Run AutoGCP jobs through a long-running local daemon',
+        formatter_class=argparse.RawDescriptionHelpFormatter,
+        epilog="""
+Examples:
+  python serve.py start --workers 4 --warm ../configs/*.yaml
+  python serve.py submit plan config.yaml --workspace dev
+  python serve.py submit apply config.yaml --auto-approve --priority 10
+  python serve.py submit destroy config.yaml --auto-approve --waves
+  python serve.py status
+        """
+    )
+    client_parser = argparse.ArgumentParser(add_help=False)
+    client_parser.add_argument(
+        '--server',
+        help=f'Daemon address (default: http://{DEFAULT_HOST}:{DEFAULT_PORT})',
+        default=f"http://{DEFAULT_HOST}:{DEFAULT_PORT}"
+    )
+    subparsers = parser.add_subparsers(dest='action', required=True)
+
+    start_parser = subparsers.add_parser('start', help='Run the daemon')
+    start_parser.add_argument(
+        '--host',
+        help=f'Loopback address to listen on (default: {DEFAULT_HOST})',
+        default=DEFAULT_HOST
+    )
+    start_parser.add_argument(
+        '--port',
+        help=f'Port to listen on (default: {DEFAULT_PORT})',
+        type=int,
+        default=DEFAULT_PORT
+    )
+    start_parser.add_argument(
+        '-n', '--workers',
+        help='Number of jobs to run concurrently (default: 2)',
+        type=int,
+        default=2
+    )
+    start_parser.add_argument(
+        '--warm',
+        help='Initialize the working directories of these configs at startup',
+        nargs='*',
+        default=[],
+        metavar='config'
+    )
+    start_parser.add_argument(
+        '-v', '--verbose',
+        help='Enable verbose/debug logging',
+        action='store_true'
+    )
+
+    submit_parser = subparsers.add_parser(
+        'submit', help='Queue a job', parents=[client_parser])
+    submit_parser.add_argument('command', choices=COMMANDS)
+    submit_parser.add_argument('config', help='Path to YAML configuration file')
+    submit_parser.add_argument('-w', '--workspace', help='Terraform workspace name')
+    submit_parser.add_argument(
+        '--priority',
+        help='Higher runs first (default: 0, warm jobs -100)',
+        type=int
+    )
+    submit_parser.add_argument(
+        '-a', '--auto-approve',
+        help='Required for apply and destroy jobs',
+        action='store_true'
+    )
+    submit_parser.add_argument(
+        '--reinit',
+        help='Always run terraform init -reconfigure',
+        action='store_true'
+    )
+    submit_parser.add_argument(
+        '--targeted',
+        help='Plan only the modules affected since the last apply',
+        action='store_true'
+    )
+    submit_parser.add_argument(
+        '--waves',
+        help='Destroy module by module in dependency order',
+        action='store_true'
+    )
+    submit_parser.add_argument(
+        '--parallelism',
+        help="Concurrent terraform operations, or 'auto'",
+        type=parse_parallelism
+    )
+    submit_parser.add_argument(
+        '--no-refresh',
+        help='Plan with -refresh=false',
+        action='store_const',
+        const=False,
+        dest='refresh'
+    )
+    submit_parser.add_argument(
+        '--lock-timeout',
+        help='How long to wait for the state lock, e.g. 5m',
+        type=parse_lock_timeout
+    )
+    submit_parser.add_argument(
+        '--no-follow',
+        help='Print the job id and return instead of streaming the log',
+        action='store_false',
+        dest='follow'
+    )
+
+    status_parser = subparsers.add_parser(
+        'status', help='Show jobs', parents=[client_parser])
+    status_parser.add_argument('job', nargs='?', help='Job id (default: all jobs)')
+
+    args = parser.parse_args()
+
+    if args.action == 'start':
+        if args.workers < 1:
+            parser.error("--workers must be at least 1")
+        if not is_loopback(args.host):
+            parser.error("--host must be a loopback address, the daemon "
+                         "runs apply and destroy without authentication")
+        logsetup.setup_logging(
+            'serve', logging.DEBUG if args.verbose else logging.INFO)
+        serve(args.host, args.port, args.workers, args.warm)
+        return
+
+    if args.action == 'submit':
+        body = {
+            'command': args.command,
+            'config': str(Path(args.config).resolve()),
+            'workspace': args.workspace,
+            'options': {
+                'auto_approve': args.auto_approve,
+                'reinit': args.reinit,
+                'targeted': args.targeted,
+                'waves': args.waves,
+                'parallelism': args.parallelism,
+                'refresh': args.refresh,
+                'lock_timeout': args.lock_timeout,
+            },
+        }
+        if args.priority is not None:
+            body['priority'] = args.priority
+        try:
+            sys.exit(submit(args.server, body, args.follow))
+        except KeyboardInterrupt:
+            sys.exit(130)
+
+    path = f"/jobs/{args.job}" if args.job else "/jobs"
+    try:
+        with request(args.server, 'GET', path) as response:
+            print(json.dumps(json.load(response), indent=2))
+    except urllib.error.HTTPError as e:
+        print(json.load(e).get('error'), file=sys.stderr)
+        sys.exit(1)
+    except urllib.error.URLError as e:
+        print(f"Cannot reach the daemon at {args.server}: {e.reason}", file=sys.stderr)
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,243 @@
+"""
+Content hashing and fingerprint caches shared by the automation scripts
+"""
+
+import fcntl
+import gzip
+import hashlib
+import json
+import os
+import tempfile
+from contextlib import contextmanager
+from pathlib import Path
+from typing import Dict, Iterable, Iterator, List, Optional
+
+INIT_FINGERPRINT_FILE = "autogcp-init.json"
+PLAN_CACHE_DIR = Path(".autogcp") / "cache" / "plans"
+VALIDATE_CACHE_DIR = Path(".autogcp") / "cache" / "validate"
+
+
+def hash_file(path: Path) -> str:
+    """Return the sha256 of a file, or an empty string if it is missing"""
+    digest = hashlib.sha256()
+    try:
+        with open(path, 'rb') as f:
+            for chunk in iter(lambda: f.read(1024 * 1024), b''):
+                digest.update(chunk)
+    except FileNotFoundError:
+        return ""
+    return digest.hexdigest()
+
+
+def hash_files(paths: Iterable[Path], base_dir: Path) -> str:
+    """Hash a set of files by their path relative to base_dir and content"""
+    digest = hashlib.sha256()
+    for path in sorted(paths):
+        digest.update(str(path.relative_to(base_dir)).encode())
+        digest.update(b'\0')
+        digest.update(hash_file(path).encode())
+        digest.update(b'\0')
+    return digest.hexdigest()
+
+
+def source_files(root_dir: Path) -> List[Path]:
+    """List root .tf files and every .tf file in the modules tree"""
+    files = list(root_dir.glob("*.tf"))
+    files.extend((root_dir / "modules").rglob("*.tf"))
+    return sorted(files)
+
+
+def init_fingerprint(root_dir: Path, work_dir: Path,
+                     backend_file: Path) -> Dict[str, str]:
+    """Fingerprint everything that terraform init depends on"""
+    return {
+        'backend': hash_file(backend_file),
+        'provider': hash_file(root_dir / "provider.tf"),
+        'lock': hash_file(work_dir / ".terraform.lock.hcl"),
+        'modules': hash_files(source_files(root_dir), root_dir),
+    }
+
+
+def load_init_fingerprint(work_dir: Path) -> Optional[Dict[str, str]]:
+    """Load the fingerprint recorded by the last successful init"""
+    fingerprint_file = work_dir / ".terraform" / INIT_FINGERPRINT_FILE
+    try:
+        with open(fingerprint_file, 'r') as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return None
+
+
+def save_init_fingerprint(work_dir: Path, fingerprint: Dict[str, str]) -> None:
+    """Record the fingerprint of a successful init inside .terraform/"""
+    fingerprint_file = work_dir / ".terraform" / INIT_FINGERPRINT_FILE
+    fingerprint_file.parent.mkdir(exist_ok=True)
+    with open(fingerprint_file, 'w') as f:
+        json.dump(fingerprint, f, indent=2)
+
+
+def clear_init_fingerprint(work_dir: Path) -> None:
+    """Forget the last init so the next run initializes from scratch"""
+    fingerprint_file = work_dir / ".terraform" / INIT_FINGERPRINT_FILE
+    fingerprint_file.unlink(missing_ok=True)
+
+
+def write_json_atomic(path: Path, data) -> None:
+    """Write JSON through a temp file so concurrent readers never see half"""
+    path.parent.mkdir(parents=True, exist_ok=True)
+    fd, tmp_path = tempfile.mkstemp(dir=path.parent, suffix=".tmp")
+    try:
+        with os.fdopen(fd, 'w') as f:
+            json.dump(data, f, indent=2)
+        os.replace(tmp_path, path)
+    except BaseException:
+        Path(tmp_path).unlink(missing_ok=True)
+        raise
+
+
+def write_if_changed(path: Path, content: str) -> bool:
+    """Atomically replace path with content unless it already matches
+
+    Leaving an identical file alone keeps its mtime, so caches keyed on
+    mtime stay valid. Returns whether the file was written.
+    """
+    data = content.encode('utf-8')
+    try:
+        with open(path, 'rb') as f:
+            if f.read() == data:
+                return False
+    except FileNotFoundError:
+        pass
+
+    write_bytes_atomic(path, data)
+    return True
+
+
+def write_bytes_atomic(path: Path, data: bytes) -> None:
+    """Write bytes through a temp file so concurrent readers never see half"""
+    path.parent.mkdir(parents=True, exist_ok=True)
+    fd, tmp_path = tempfile.mkstemp(dir=path.parent, suffix=".tmp")
+    try:
+        with os.fdopen(fd, 'wb') as f:
+            f.write(data)
+        os.replace(tmp_path, path)
+    except BaseException:
+        Path(tmp_path).unlink(missing_ok=True)
+        raise
+
+
+@contextmanager
+def file_lock(path: Path) -> Iterator[None]:
+    """Hold an exclusive lock on path, shared by threads and processes"""
+    path.parent.mkdir(parents=True, exist_ok=True)
+    with open(path, 'w') as f:
+        fcntl.flock(f, fcntl.LOCK_EX)
+        try:
+            yield
+        finally:
+            fcntl.flock(f, fcntl.LOCK_UN)
+
+
+def plan_cache_key(root_dir: Path, tfvars_file: Path, backend_file: Path,
+                   workspace: Optional[str], state_key: str) -> str:
+    """Content address of a plan: inputs, sources and the state it ran on"""
+    digest = hashlib.sha256()
+    for part in (
+        hash_file(tfvars_file),
+        hash_file(backend_file),
+        hash_files(source_files(root_dir), root_dir),
+        workspace or "default",
+        state_key,
+    ):
+        digest.update(part.encode())
+        digest.update(b'\0')
+    return digest.hexdigest()
+
+
+def load_plan_result(root_dir: Path, key: str) -> Optional[dict]:
+    """Load the cached outcome of a previous plan with the same key"""
+    try:
+        with open(root_dir / PLAN_CACHE_DIR / f"{key}.json", 'r') as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return None
+
+
+def save_plan_result(root_dir: Path, key: str, result: dict) -> None:
+    """Record the outcome of a plan under its content address"""
+    write_json_atomic(root_dir / PLAN_CACHE_DIR / f"{key}.json", result)
+
+
+def plan_artifact_file(root_dir: Path, key: str) -> Path:
+    return root_dir / PLAN_CACHE_DIR / f"{key}.tfplan.gz"
+
+
+def save_plan_artifact(root_dir: Path, key: str, plan_file: Path,
+                       result: dict, owner: str) -> None:
+    """Store a saved plan, gzipped, under its content address
+
+    owner (e.g. project and workspace) keeps one stored plan per owner,
+    dropping the previous one, since a newer plan supersedes it.
+    """
+    data = plan_file.read_bytes()
+    write_bytes_atomic(plan_artifact_file(root_dir, key), gzip.compress(data))
+    save_plan_result(root_dir, key, dict(
+        result, artifact=True, sha256=hashlib.sha256(data).hexdigest()))
+
+    owner_file = root_dir / PLAN_CACHE_DIR / "owners" / \
+        f"{hashlib.sha256(owner.encode()).hexdigest()}.json"
+    try:
+        with open(owner_file, 'r') as f:
+            previous = json.load(f)['key']
+    except (OSError, ValueError, KeyError):
+        previous = None
+    if previous and previous != key:
+        drop_plan_artifact(root_dir, previous)
+    write_json_atomic(owner_file, {'owner': owner, 'key': key})
+
+
+def load_plan_artifact(root_dir: Path, key: str, result: dict,
+                       plan_file: Path) -> bool:
+    """Write the stored plan to plan_file if it is intact"""
+    try:
+        data = gzip.decompress(plan_artifact_file(root_dir, key).read_bytes())
+    except (OSError, EOFError, gzip.BadGzipFile):
+        return False
+    if hashlib.sha256(data).hexdigest() != result.get('sha256'):
+        return False
+    write_bytes_atomic(plan_file, data)
+    return True
+
+
+def drop_plan_artifact(root_dir: Path, key: str) -> None:
+    """Forget a stored plan once it was applied or turned out unusable"""
+    plan_artifact_file(root_dir, key).unlink(missing_ok=True)
+    (root_dir / PLAN_CACHE_DIR / f"{key}.json").unlink(missing_ok=True)
+
+
+def validate_cache_key(root_dir: Path, lock_file: Path) -> str:
+    """Validation depends only on the .tf sources and provider versions"""
+    digest = hashlib.sha256()
+    digest.update(hash_files(source_files(root_dir), root_dir).encode())
+    digest.update(b'\0')
+    digest.update(hash_file(lock_file).encode())
+    return digest.hexdigest()
+
+
+def load_validate_result(root_dir: Path, key: str) -> Optional[dict]:
+    """Load a recorded successful validation for these sources"""
+    try:
+        with open(root_dir / VALIDATE_CACHE_DIR / f"{key}.json", 'r') as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return None
+
+
+def save_validate_result(root_dir: Path, key: str, result: dict) -> None:
+    """Record a successful validation under its source hash"""
+    write_json_atomic(root_dir / VALIDATE_CACHE_DIR / f"{key}.json", result)
+
+
+def validate_lock_file(root_dir: Path, key: str) -> Path:
+    """Lock that lets one run validate while others with the same key wait"""
+    return root_dir / VALIDATE_CACHE_DIR / f"{key}.lock"
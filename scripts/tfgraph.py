@@ -0,0 +1,162 @@
+"""
+Module wiring of the root module, read from its .tf files
+"""
+
+from pathlib import Path
+from typing import Dict, Iterable, List, Optional, Set
+
+from hcl import parse_file, references
+
+
+class ModuleGraph:
+    """Which variables feed each module and how the modules depend on each other
+
+    Variables are traced through locals, so a module reading
+    local.project_id also reads var.create_project and var.project_id.
+    Module outputs read the same way become data dependencies, kept apart
+    from explicit depends_on edges. Variables read anywhere outside a
+    module block, such as by the provider, outputs or root resources,
+    are global: no module target covers them.
+    """
+
+    def __init__(self, root_tf: dict):
+        blocks = root_tf['blocks']
+        locals_attrs = {}
+        for block in blocks:
+            if block['type'] == 'locals':
+                locals_attrs.update(block['body']['attributes'])
+
+        local_vars: Dict[str, Set[str]] = {}
+        local_modules: Dict[str, Set[str]] = {}
+
+        def expand_local(name: str, seen: frozenset = frozenset()) -> None:
+            if name in local_vars or name in seen or name not in locals_attrs:
+                return
+            tokens = locals_attrs[name]
+            variables = references(tokens, 'var')
+            modules = references(tokens, 'module')
+            for nested in references(tokens, 'local'):
+                expand_local(nested, seen | {name})
+                variables |= local_vars.get(nested, set())
+                modules |= local_modules.get(nested, set())
+            local_vars[name] = variables
+            local_modules[name] = modules
+
+        for name in locals_attrs:
+            expand_local(name)
+
+        def trace(tokens) -> tuple:
+            variables = references(tokens, 'var')
+            modules = references(tokens, 'module')
+            for name in references(tokens, 'local'):
+                variables |= local_vars.get(name, set())
+                modules |= local_modules.get(name, set())
+            return variables, modules
+
+        def trace_body(body: dict) -> Set[str]:
+            variables = set()
+            for tokens in body['attributes'].values():
+                variables |= trace(tokens)[0]
+            for nested in body['blocks']:
+                variables |= trace_body(nested['body'])
+            return variables
+
+        self.uses: Dict[str, Set[str]] = {}
+        self.references: Dict[str, Set[str]] = {}
+        self.depends_on: Dict[str, Set[str]] = {}
+        self.root_vars: Set[str] = set()
+
+        for block in blocks:
+            attributes = block['body']['attributes']
+            if block['type'] == 'module':
+                name = block['labels'][0]
+                self.uses[name] = set()
+                self.references[name] = set()
+                for attr, tokens in attributes.items():
+                    if attr == 'depends_on':
+                        self.depends_on[name] = references(tokens, 'module')
+                        continue
+                    variables, modules = trace(tokens)
+                    self.uses[name] |= variables
+                    self.references[name] |= modules
+                self.references[name].discard(name)
+            elif block['type'] not in ('variable', 'locals'):
+                # Locals only count through the blocks that read them
+                self.root_vars |= trace_body(block['body'])
+
+    @classmethod
+    def load(cls, root_dir: Path) -> 'ModuleGraph':
+        """Read every root .tf file as one module, like terraform does"""
+        blocks = []
+        for tf_file in sorted(root_dir.glob("*.tf")):
+            blocks.extend(parse_file(tf_file)['blocks'])
+        return cls({'blocks': blocks})
+
+    @property
+    def modules(self) -> List[str]:
+        return sorted(self.uses)
+
+    def dependencies(self, module: str) -> Set[str]:
+        """Modules that must exist before this one, by data or depends_on"""
+        return (self.references.get(module, set())
+                | self.depends_on.get(module, set())) & self.uses.keys()
+
+    def all_dependencies(self, module: str) -> Set[str]:
+        """Every module this one depends on, directly or through others"""
+        result: Set[str] = set()
+        pending = [module]
+        while pending:
+            for dependency in self.dependencies(pending.pop()):
+                if dependency not in result:
+                    result.add(dependency)
+                    pending.append(dependency)
+        return result
+
+    def destroy_waves(self, modules: Iterable[str]) -> List[List[str]]:
+        """Group modules into the order they can be destroyed in
+
+        A module goes in the wave after the last module that depends on
+        it, so the first wave holds the modules nothing depends on and the
+        last one the foundations. Modules within a wave are independent.
+        Dependencies through modules not in the list still count.
+        """
+        remaining = set(modules)
+        waves = []
+        while remaining:
+            blocked = set()
+            for module in remaining:
+                blocked |= self.all_dependencies(module)
+            wave = sorted(remaining - blocked)
+            if not wave:
+                raise ValueError(
+                    f"dependency cycle between modules: {', '.join(sorted(remaining))}")
+            waves.append(wave)
+            remaining -= set(wave)
+        return waves
+
+    def modules_for(self, variables: Iterable[str]) -> Optional[Set[str]]:
+        """Modules reading any of the variables
+
+        None when a variable is also read outside the modules or by
+        nothing the root module knows about, since no module target
+        covers it.
+        """
+        modules: Set[str] = set()
+        for variable in variables:
+            readers = {m for m, used in self.uses.items() if variable in used}
+            if not readers or variable in self.root_vars:
+                return None
+            modules |= readers
+        return modules
+
+    def with_dependents(self, modules: Iterable[str]) -> Set[str]:
+        """Add every module that reads outputs of the given ones, transitively"""
+        result = set(modules)
+        pending = list(result)
+        while pending:
+            module = pending.pop()
+            for other, referenced in self.references.items():
+                if module in referenced and other not in result:
+                    result.add(other)
+                    pending.append(other)
+        return result
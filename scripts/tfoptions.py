@@ -0,0 +1,107 @@
+"""
+Per-run Terraform tuning: parallelism, refresh and state lock timeout
+"""
+
+import re
+from typing import Any, Callable, List, Optional, Union
+
+# YAML keys, read by the scripts and never passed to terraform
+PARALLELISM_KEY = 'terraform_parallelism'
+REFRESH_KEY = 'terraform_refresh'
+LOCK_TIMEOUT_KEY = 'terraform_lock_timeout'
+OPTION_KEYS = {PARALLELISM_KEY, REFRESH_KEY, LOCK_TIMEOUT_KEY}
+
+# Auto parallelism: one concurrent operation per this many resources in
+# state, kept within bounds. 80 resources gives terraform's default of 10.
+RESOURCES_PER_OPERATION = 8
+MIN_AUTO_PARALLELISM = 4
+MAX_AUTO_PARALLELISM = 32
+
+_DURATION = re.compile(r'^\d+(ms|s|m|h)$')
+
+Parallelism = Union[int, str, None]
+
+
+def parse_parallelism(value: Any) -> Parallelism:
+    """Accept a positive integer or 'auto', raising ValueError otherwise"""
+    if value is None or value == 'auto':
+        return value
+    if isinstance(value, int) and not isinstance(value, bool) and value >= 1:
+        return value
+    if isinstance(value, str) and value.isdigit() and int(value) >= 1:
+        return int(value)
+    raise ValueError(
+        f"parallelism must be a positive integer or 'auto', got {value!r}")
+
+
+def parse_lock_timeout(value: Any) -> Optional[str]:
+    """Accept a terraform duration such as 30s or 5m"""
+    if value is None:
+        return None
+    if not isinstance(value, str) or not _DURATION.match(value):
+        raise ValueError(f"lock timeout must be a duration like 30s or 5m, got {value!r}")
+    return value
+
+
+def config_errors(config: dict) -> List[str]:
+    """Problems with the tuning keys of a config"""
+    errors = []
+    try:
+        parse_parallelism(config.get(PARALLELISM_KEY))
+    except ValueError as e:
+        errors.append(f"{PARALLELISM_KEY}: {e}")
+    if not isinstance(config.get(REFRESH_KEY, True), bool):
+        errors.append(f"{REFRESH_KEY}: expected bool")
+    try:
+        parse_lock_timeout(config.get(LOCK_TIMEOUT_KEY))
+    except ValueError as e:
+        errors.append(f"{LOCK_TIMEOUT_KEY}: {e}")
+    return errors
+
+
+def auto_parallelism(resource_count: int) -> Optional[int]:
+    """Parallelism for a state of this size, None for an empty state"""
+    if resource_count == 0:
+        # Nothing to go by on a first deploy, keep terraform's default
+        return None
+    return max(MIN_AUTO_PARALLELISM,
+               min(MAX_AUTO_PARALLELISM, resource_count // RESOURCES_PER_OPERATION))
+
+
+class RunOptions:
+    """Tuning flags for plan and apply, from the config and the command line"""
+
+    def __init__(self, parallelism: Parallelism = None, refresh: bool = True,
+                 lock_timeout: Optional[str] = None):
+        self.parallelism = parse_parallelism(parallelism)
+        self.refresh = refresh
+        self.lock_timeout = parse_lock_timeout(lock_timeout)
+
+    @classmethod
+    def from_config(cls, config: dict, parallelism: Parallelism = None,
+                    refresh: Optional[bool] = None,
+                    lock_timeout: Optional[str] = None) -> 'RunOptions':
+        """Command line values win over the config keys"""
+        return cls(
+            parallelism=parallelism if parallelism is not None
+            else config.get(PARALLELISM_KEY),
+            refresh=refresh if refresh is not None
+            else config.get(REFRESH_KEY, True),
+            lock_timeout=lock_timeout or config.get(LOCK_TIMEOUT_KEY)
+        )
+
+    def resolve(self, resource_count: Callable[[], int]) -> None:
+        """Replace 'auto' parallelism using the state resource count"""
+        if self.parallelism == 'auto':
+            self.parallelism = auto_parallelism(resource_count())
+
+    def args_for(self, command: str) -> List[str]:
+        """Flags for a 'plan', 'apply' or 'refresh' (refresh-only plan)"""
+        args = []
+        if isinstance(self.parallelism, int):
+            args.append(f"-parallelism={self.parallelism}")
+        if self.lock_timeout:
+            args.append(f"-lock-timeout={self.lock_timeout}")
+        if command == 'plan' and not self.refresh:
+            args.append("-refresh=false")
+        return args
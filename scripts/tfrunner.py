@@ -0,0 +1,189 @@
+"""
+Runs Terraform commands on asyncio with streamed output, timeouts and
+graceful interruption
+"""
+
+import asyncio
+import codecs
+import os
+import signal
+import threading
+from pathlib import Path
+from typing import Callable, Dict, List, Optional, Set, Tuple
+
+LineHandler = Callable[[str], None]
+
+# Longest line handed to a handler in one piece, longer lines are split.
+# terraform show -json prints its whole document on one line.
+MAX_LINE_CHARS = 1024 * 1024
+READ_CHUNK_BYTES = 64 * 1024
+
+# Seconds terraform gets to release its state lock after SIGINT
+INTERRUPT_GRACE_SECONDS = 30
+
+# Per-step limits for commands that never legitimately run for long.
+# plan and apply are only limited when the caller asks for it.
+DEFAULT_TIMEOUTS: Dict[str, float] = {
+    'init': 15 * 60,
+    'workspace': 2 * 60,
+    'validate': 5 * 60,
+    'fmt': 5 * 60,
+    'output': 5 * 60,
+    'state': 10 * 60,
+    'show': 10 * 60,
+}
+
+_active_pids: Set[int] = set()
+_active_lock = threading.Lock()
+_shutting_down = threading.Event()
+
+
+class CommandStopped(Exception):
+    """Raised when a command is stopped or never started"""
+
+
+class CommandTimeout(CommandStopped):
+    """Raised when a command is stopped for exceeding its timeout"""
+
+    def __init__(self, args: List[str], timeout: float):
+        super().__init__(f"{' '.join(args)} timed out after {timeout:g}s")
+        self.timeout = timeout
+
+
+def default_timeout(command: List[str]) -> Optional[float]:
+    """Default timeout for a terraform subcommand, None for no limit"""
+    return DEFAULT_TIMEOUTS.get(command[0]) if command else None
+
+
+class ShuttingDown(CommandStopped):
+    """Raised instead of starting a command once shutdown() was called"""
+
+    def __init__(self, args: List[str]):
+        super().__init__(f"{' '.join(args)} not started, shutting down")
+
+
+def interrupt_all() -> None:
+    """Forward SIGINT to every running child, from any thread
+
+    Children run in their own session so a terminal Ctrl+C only reaches
+    this process; terraform then gets exactly one SIGINT from us and can
+    stop cleanly and release the state lock.
+    """
+    with _active_lock:
+        pids = list(_active_pids)
+    for pid in pids:
+        try:
+            os.kill(pid, signal.SIGINT)
+        except ProcessLookupError:
+            pass
+
+
+def shutdown() -> None:
+    """Interrupt every running child and refuse to start new ones
+
+    Worker threads then fail their current step instead of moving on to
+    the next terraform command, e.g. from plan to apply.
+    """
+    _shutting_down.set()
+    interrupt_all()
+
+
+async def _pump(stream: asyncio.StreamReader, handler: LineHandler) -> None:
+    """Hand each line of stream to handler as soon as it is complete"""
+    decoder = codecs.getincrementaldecoder('utf-8')(errors='replace')
+    pending = ''
+    while True:
+        chunk = await stream.read(READ_CHUNK_BYTES)
+        if not chunk:
+            break
+        pending += decoder.decode(chunk)
+        *lines, pending = pending.split('\n')
+        for line in lines:
+            handler(line.rstrip('\r'))
+        while len(pending) > MAX_LINE_CHARS:
+            handler(pending[:MAX_LINE_CHARS])
+            pending = pending[MAX_LINE_CHARS:]
+    pending += decoder.decode(b'', final=True)
+    if pending:
+        handler(pending.rstrip('\r'))
+
+
+async def _stop(process: asyncio.subprocess.Process) -> None:
+    """Interrupt a child gracefully, killing it if it does not exit"""
+    if process.returncode is not None:
+        return
+    try:
+        process.send_signal(signal.SIGINT)
+        await asyncio.wait_for(process.wait(), INTERRUPT_GRACE_SECONDS)
+    except ProcessLookupError:
+        pass
+    except asyncio.TimeoutError:
+        process.kill()
+        await process.wait()
+
+
+async def run_command(args: List[str], cwd: Path, on_stdout: LineHandler,
+                      on_stderr: LineHandler,
+                      env: Optional[Dict[str, str]] = None,
+                      timeout: Optional[float] = None) -> int:
+    """Run a command, streaming stdout and stderr to separate handlers
+
+    Lines are handed over as they arrive and never accumulated, so memory
+    stays flat no matter how much output a long plan produces. On timeout
+    or cancellation the child is sent SIGINT and given time to clean up.
+    Returns the exit code.
+    """
+    if _shutting_down.is_set():
+        raise ShuttingDown(args)
+    process = await asyncio.create_subprocess_exec(
+        *args,
+        cwd=cwd,
+        env=env,
+        stdin=asyncio.subprocess.DEVNULL,
+        stdout=asyncio.subprocess.PIPE,
+        stderr=asyncio.subprocess.PIPE,
+        start_new_session=True
+    )
+    with _active_lock:
+        _active_pids.add(process.pid)
+
+    async def communicate() -> int:
+        await asyncio.gather(
+            _pump(process.stdout, on_stdout),
+            _pump(process.stderr, on_stderr),
+        )
+        return await process.wait()
+
+    try:
+        return await asyncio.wait_for(communicate(), timeout)
+    except asyncio.TimeoutError:
+        await _stop(process)
+        raise CommandTimeout(args, timeout)
+    except asyncio.CancelledError:
+        await asyncio.shield(_stop(process))
+        raise
+    finally:
+        if process.returncode is None:
+            process.kill()
+        with _active_lock:
+            _active_pids.discard(process.pid)
+
+
+def stream_command(args: List[str], cwd: Path, on_stdout: LineHandler,
+                   on_stderr: LineHandler,
+                   env: Optional[Dict[str, str]] = None,
+                   timeout: Optional[float] = None) -> int:
+    """Blocking wrapper around run_command for synchronous callers"""
+    return asyncio.run(
+        run_command(args, cwd, on_stdout, on_stderr, env, timeout))
+
+
+def capture_command(args: List[str], cwd: Path,
+                    env: Optional[Dict[str, str]] = None,
+                    timeout: Optional[float] = None) -> Tuple[int, str, str]:
+    """Run a command with small output and return (code, stdout, stderr)"""
+    stdout: List[str] = []
+    stderr: List[str] = []
+    returncode = stream_command(
+        args, cwd, stdout.append, stderr.append, env, timeout)
+    return returncode, '\n'.join(stdout), '\n'.join(stderr)
@@ -0,0 +1,97 @@
+"""
+Reads Terraform state snapshots through terraform state pull
+"""
+
+import json
+from pathlib import Path
+from typing import Dict, List, Optional, Set
+
+import tfrunner
+
+
+def instance_address(resource: dict, instance: dict) -> str:
+    """Build the address terraform state list prints for an instance"""
+    address = f"{resource['type']}.{resource['name']}"
+    if resource.get('mode') == 'data':
+        address = f"data.{address}"
+    if resource.get('module'):
+        address = f"{resource['module']}.{address}"
+
+    index_key = instance.get('index_key')
+    if isinstance(index_key, str):
+        address += f'["{index_key}"]'
+    elif index_key is not None:
+        address += f"[{index_key}]"
+    return address
+
+
+def matches_target(address: str, target: str) -> bool:
+    """Whether -target=target would include the resource at address"""
+    return address == target or address.startswith((f"{target}.", f"{target}["))
+
+
+class StateSnapshot:
+    """A parsed copy of the remote state taken with one state pull
+
+    Resource instances are indexed by address, module and type so callers
+    can answer every question about the state without another round trip.
+    """
+
+    def __init__(self, state: Optional[dict] = None):
+        state = state or {}
+        self.serial = state.get('serial', 0)
+        self.lineage = state.get('lineage', "")
+        self.resources: List[dict] = state.get('resources', [])
+
+        self.by_address: Dict[str, dict] = {}
+        self.by_module: Dict[str, List[str]] = {}
+        self.by_type: Dict[str, List[str]] = {}
+        for resource in self.resources:
+            module = resource.get('module', 'root')
+            for instance in resource.get('instances', []):
+                address = instance_address(resource, instance)
+                self.by_address[address] = instance
+                self.by_module.setdefault(module, []).append(address)
+                self.by_type.setdefault(resource['type'], []).append(address)
+
+    def __len__(self) -> int:
+        return len(self.by_address)
+
+    @property
+    def addresses(self) -> List[str]:
+        """Instance addresses in state list order"""
+        return sorted(self.by_address)
+
+    @property
+    def root_modules(self) -> Set[str]:
+        """Names of the module calls in main.tf that still own resources"""
+        return {module.split('.')[1].split('[')[0]
+                for module in self.by_module if module != 'root'}
+
+    def matching(self, targets: List[str]) -> List[str]:
+        """Addresses a destroy with these -target options would remove"""
+        if not targets:
+            return self.addresses
+        return [address for address in self.addresses
+                if any(matches_target(address, t) for t in targets)]
+
+    @classmethod
+    def pull(cls, work_dir: Path, env: Optional[Dict[str, str]] = None) -> 'StateSnapshot':
+        """Download the current workspace state, raising on failure"""
+        returncode, stdout, stderr = tfrunner.capture_command(
+            ['terraform', 'state', 'pull'],
+            cwd=work_dir,
+            env=env,
+            timeout=tfrunner.default_timeout(['state'])
+        )
+        if returncode != 0:
+            raise RuntimeError(stderr or f"state pull exited with {returncode}")
+
+        # A workspace without state yet prints nothing
+        output = stdout.strip()
+        return cls(json.loads(output) if output else None)
+
+    @property
+    def key(self) -> str:
+        """Identifies this exact version of the state"""
+        return f"{self.lineage}:{self.serial}"
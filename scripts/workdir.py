@@ -0,0 +1,239 @@
+"""
+Per-project working directories and the Terraform steps deploy and destroy share
+"""
+
+import json
+import logging
+import shutil
+from pathlib import Path
+from typing import Dict, Optional
+
+import tfcache
+import tfrunner
+from config_schema import SCRIPT_KEYS
+from tfstate import StateSnapshot
+
+logger = logging.getLogger(__name__)
+
+# Loaded by terraform automatically. JSON leaves no HCL quoting to get wrong
+TFVARS_FILE = "terraform.auto.tfvars.json"
+
+LOCK_FILE = ".terraform.lock.hcl"
+
+# Hash of the root lock file when it was last copied into a work dir
+LOCK_SOURCE_FILE = ".terraform.lock.hcl.source"
+
+DEFAULT_STATE_BUCKET = "konecta-autogcp-terraform-state-bucket"
+
+
+def render_tfvars(values: Dict) -> str:
+    """Render variables as .tfvars.json, one top-level variable per line
+
+    Each value is encoded compactly by the C JSON encoder, so configs with
+    thousands of subnets, buckets or IAM members render quickly while the
+    file still diffs per variable. YAML dates and timestamps become strings.
+    """
+    lines = [f"  {json.dumps(str(key))}: "
+             f"{json.dumps(value, ensure_ascii=False, default=str)}"
+             for key, value in values.items()]
+    return "{\n" + ",\n".join(lines) + "\n}\n"
+
+
+def project_work_dir(root_dir: Path, project_id: str) -> Path:
+    """Working directory of a project deployed in isolation"""
+    return root_dir / ".autogcp" / "work" / project_id
+
+
+def link_work_dir(root_dir: Path, work_dir: Path) -> None:
+    """Create or refresh a working directory that shares the root sources
+
+    Root .tf files and the modules tree are symlinked so every project
+    shares the same sources, while the tfvars file, .terraform/ and the
+    plan file stay private to the project.
+    """
+    work_dir.mkdir(parents=True, exist_ok=True)
+
+    sources = sorted(root_dir.glob("*.tf"))
+    sources.append(root_dir / "modules")
+    for source in sources:
+        link = work_dir / source.name
+        if link.is_symlink() and link.resolve() == source.resolve():
+            continue
+        if link.is_symlink() or link.is_file():
+            link.unlink()
+        link.symlink_to(source)
+
+    # Stale links to root files that no longer exist
+    for link in work_dir.glob("*.tf"):
+        if link.is_symlink() and not link.exists():
+            link.unlink()
+
+    copy_lock_file(root_dir, work_dir)
+
+
+def copy_lock_file(root_dir: Path, work_dir: Path) -> None:
+    """Give the work dir its own copy of the root lock file
+
+    init writes to the lock file, so each project gets a copy. The copy
+    is refreshed whenever the root lock file changes, e.g. after a
+    provider upgrade, and left alone otherwise so the hashes init added
+    are kept. The changed copy makes the next init run.
+    """
+    lock_file = root_dir / LOCK_FILE
+    if not lock_file.exists():
+        return
+
+    root_hash = tfcache.hash_file(lock_file)
+    source_file = work_dir / LOCK_SOURCE_FILE
+    try:
+        copied_hash = source_file.read_text().strip()
+    except OSError:
+        copied_hash = None
+
+    if copied_hash == root_hash and (work_dir / LOCK_FILE).exists():
+        return
+    shutil.copy2(lock_file, work_dir / LOCK_FILE)
+    source_file.write_text(root_hash + "\n")
+
+
+def check_distinct_projects(configs: Dict[str, Dict],
+                            log: logging.Logger) -> bool:
+    """Log configs that share a project_id, True if every project is unique
+
+    Runs of one project would share a work dir and its state, so fleet
+    commands reject them before anything starts.
+    """
+    owners: Dict[str, str] = {}
+    distinct = True
+    for config_file, config in configs.items():
+        project_id = config['project_id']
+        if project_id in owners:
+            log.error(f"{config_file} and {owners[project_id]} both "
+                      f"deploy project {project_id}")
+            distinct = False
+        else:
+            owners[project_id] = config_file
+    return distinct
+
+
+def tfvars_values(config: Dict) -> Dict:
+    """The config as terraform sees it, without script-only keys"""
+    return {key: value for key, value in config.items()
+            if key not in SCRIPT_KEYS}
+
+
+def write_tfvars(work_dir: Path, config: Dict) -> bool:
+    """Write the config as terraform variables, False if unchanged"""
+    changed = tfcache.write_if_changed(
+        work_dir / TFVARS_FILE, render_tfvars(tfvars_values(config)))
+    # A leftover HCL file from older runs would be loaded as well
+    (work_dir / "terraform.tfvars").unlink(missing_ok=True)
+    return changed
+
+
+class TerraformWorkDir:
+    """Steps shared by deploy and destroy in a project's working directory
+
+    Subclasses set config, root_dir, work_dir, backends_dir, reinit,
+    timeout, options, state and plugin_cache, and provide
+    run_terraform_command.
+    """
+
+    def generate_backend_config(self) -> Path:
+        """Generate unique backend config with smart defaults"""
+        logger.debug("Generating backend configuration")
+
+        self.backends_dir.mkdir(exist_ok=True)
+
+        # Defaults if not specified in YAML
+        default_bucket = DEFAULT_STATE_BUCKET
+        default_prefix = f"projects/{self.config['project_id']}"
+
+        # Use config values or fall back to defaults
+        state_bucket = self.config.get(
+            'terraform_state_bucket', default_bucket)
+        state_prefix = self.config.get(
+            'terraform_state_prefix', default_prefix)
+
+        backend_file = self.backends_dir / \
+            f"{self.config['project_id']}.backend.conf"
+
+        backend_config = f'bucket = "{state_bucket}"\nprefix = "{state_prefix}"'
+
+        with open(backend_file, 'w') as f:
+            f.write(backend_config)
+
+        logger.debug(f"Backend config created: {backend_file}")
+        logger.debug(f"Bucket: {state_bucket}")
+        logger.debug(f"Prefix: {state_prefix}")
+
+        # Warn if using defaults
+        if 'terraform_state_bucket' not in self.config:
+            logger.warning(f"Using default bucket: {state_bucket}")
+
+        if 'terraform_state_prefix' not in self.config:
+            logger.debug(f"Using default prefix: {state_prefix}")
+
+        logger.info(
+            f"State location: gs://{state_bucket}/{state_prefix}/default.tfstate")
+
+        return backend_file
+
+    def step_timeout(self, command: list) -> Optional[float]:
+        """Timeout for a terraform step: --timeout, else the step default"""
+        return self.timeout or tfrunner.default_timeout(command)
+
+    def initialize(self, backend_config_file: Path) -> bool:
+        """Run terraform init only when backend, providers or modules changed"""
+        previous = None if self.reinit else \
+            tfcache.load_init_fingerprint(self.work_dir)
+        fingerprint = tfcache.init_fingerprint(
+            self.root_dir, self.work_dir, backend_config_file)
+
+        if previous == fingerprint:
+            logger.info("Backend, providers and modules unchanged, skipping init")
+            return True
+
+        command = ['init', f'-backend-config={backend_config_file}']
+        if not previous or previous.get('backend') != fingerprint['backend']:
+            command.insert(1, '-reconfigure')
+        else:
+            logger.debug("Backend unchanged, initializing without -reconfigure")
+
+        tfcache.clear_init_fingerprint(self.work_dir)
+        lock_file = self.work_dir / LOCK_FILE
+        with self.plugin_cache.locked(lock_file):
+            if not self.run_terraform_command(command):
+                return False
+
+        for version_dir in self.plugin_cache.record_use(lock_file):
+            logger.debug(f"Evicted cached provider: {version_dir}")
+
+        # init may have updated the lock file, so fingerprint it afterwards
+        tfcache.save_init_fingerprint(self.work_dir, tfcache.init_fingerprint(
+            self.root_dir, self.work_dir, backend_config_file))
+        return True
+
+    def tune(self) -> bool:
+        """Resolve auto parallelism once the workspace is selected"""
+        if self.options.parallelism == 'auto':
+            try:
+                self.options.resolve(lambda: len(self.load_state()))
+            except Exception as e:
+                logger.warning(f"Could not size parallelism from state: {e}")
+                self.options.parallelism = None
+            logger.info(
+                f"Auto parallelism: {self.options.parallelism or 'terraform default'}")
+        return True
+
+    def load_state(self) -> StateSnapshot:
+        """Return the state snapshot, pulling it once until invalidated"""
+        if self.state is None:
+            logger.debug("Pulling state snapshot")
+            self.state = StateSnapshot.pull(
+                self.work_dir, self.plugin_cache.env())
+        return self.state
+
+    def invalidate_state(self) -> None:
+        """Forget the snapshot after a step that changed the state"""
+        self.state = None
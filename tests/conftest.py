@@ -0,0 +1,9 @@
+"""
+Makes the scripts importable the way they import each other
+"""
+
+import sys
+from pathlib import Path
+
+REPO_DIR = Path(__file__).parent.parent
+sys.path.insert(0, str(REPO_DIR / "scripts"))
@@ -0,0 +1,79 @@
+from pathlib import Path
+
+import pytest
+
+from changes import affected_configs, config_at_ref, git
+
+
+def write(path, text):
+    path.parent.mkdir(parents=True, exist_ok=True)
+    path.write_text(text)
+
+
+@pytest.fixture
+def repo(tmp_path):
+    write(tmp_path / ".gitignore", ".autogcp/\n")
+    write(tmp_path / "main.tf", 'module "vpc" {}\n')
+    write(tmp_path / "modules" / "vpc" / "main.tf", 'resource "a" "b" {}\n')
+    write(tmp_path / "modules" / "gcs" / "main.tf", 'resource "c" "d" {}\n')
+    write(tmp_path / "configs" / "base.yaml", "default_region: europe-west1\n")
+    write(tmp_path / "configs" / "shop.yaml",
+          "extends: base.yaml\nproject_id: shop\nenable_vpc: true\n")
+    write(tmp_path / "configs" / "blog.yaml", "project_id: blog\nenable_gcs: true\n")
+    git(tmp_path, 'init', '-q')
+    git(tmp_path, 'add', '.')
+    git(tmp_path, '-c', 'user.name=test', '-c', 'user.email=test@example.com',
+        'commit', '-q', '-m', 'base')
+    return tmp_path
+
+
+def affected(repo):
+    configs = [str(repo / "configs" / name) for name in ("shop.yaml", "blog.yaml")]
+    return {Path(config).name: reasons
+            for config, reasons in affected_configs(repo, configs, 'HEAD').items()}
+
+
+def test_nothing_changed(repo):
+    assert affected(repo) == {}
+
+
+def test_root_tf_change_affects_every_config(repo):
+    write(repo / "main.tf", 'module "vpc" {}\nmodule "gcs" {}\n')
+
+    assert affected(repo) == {'shop.yaml': ["main.tf changed"],
+                              'blog.yaml': ["main.tf changed"]}
+
+
+@pytest.mark.parametrize('module, config', [('vpc', 'shop.yaml'), ('gcs', 'blog.yaml')])
+def test_module_change_affects_configs_that_enable_it(repo, module, config):
+    write(repo / "modules" / module / "variables.tf", 'variable "x" {}\n')
+
+    assert affected(repo) == {config: [f"module {module} changed"]}
+
+
+def test_base_change_affects_configs_that_extend_it(repo):
+    write(repo / "configs" / "base.yaml", "default_region: us-east1\n")
+
+    assert affected(repo) == {'shop.yaml': ["base configs/base.yaml changed"]}
+
+
+def test_formatting_only_edits_affect_nothing(repo):
+    write(repo / "configs" / "blog.yaml",
+          "# The blog\nenable_gcs: true\nproject_id: 'blog'\n")
+
+    assert affected(repo) == {}
+
+
+def test_new_config_is_affected(repo):
+    write(repo / "configs" / "docs.yaml", "project_id: docs\n")
+    config = str(repo / "configs" / "docs.yaml")
+
+    assert affected_configs(repo, [config], 'HEAD') == {config: ["new config"]}
+
+
+def test_config_at_ref_reads_the_committed_chain(repo):
+    write(repo / "configs" / "base.yaml", "default_region: us-east1\n")
+    shop = repo / "configs" / "shop.yaml"
+
+    assert config_at_ref(repo, 'HEAD', shop)['default_region'] == "europe-west1"
+    assert config_at_ref(repo, 'HEAD', repo / "configs" / "docs.yaml") is None
@@ -0,0 +1,64 @@
+import pytest
+
+from config_loader import ConfigResolver, deep_merge
+
+
+def test_deep_merge_merges_mappings_and_replaces_other_values():
+    base = {'labels': {'team': 'infra', 'env': 'dev'}, 'apis': ['a', 'b'], 'size': 1}
+    override = {'labels': {'env': 'prod'}, 'apis': ['c']}
+
+    merged = deep_merge(base, override)
+
+    assert merged == {'labels': {'team': 'infra', 'env': 'prod'},
+                      'apis': ['c'], 'size': 1}
+    assert base['labels'] == {'team': 'infra', 'env': 'dev'}
+
+
+def test_deep_merge_replaces_mapping_with_scalar():
+    assert deep_merge({'vpc': {'name': 'a'}}, {'vpc': None}) == {'vpc': None}
+
+
+def write(path, text):
+    path.parent.mkdir(parents=True, exist_ok=True)
+    path.write_text(text)
+    return path
+
+
+def test_extends_chain_with_workspace_overlay(tmp_path):
+    write(tmp_path / "bases" / "org.yaml", "region: us-central1\nlabels:\n  org: acme\n")
+    write(tmp_path / "bases" / "team.yaml",
+          "extends: org.yaml\nlabels:\n  team: web\nmachine: e2-small\n")
+    config = write(tmp_path / "shop.yaml", (
+        "extends: bases/team.yaml\n"
+        "project_id: shop\n"
+        "environments:\n"
+        "  prod:\n"
+        "    machine: e2-standard-4\n"
+        "    labels:\n"
+        "      env: prod\n"))
+
+    dev = ConfigResolver(tmp_path, "dev").resolve(config)
+    prod = ConfigResolver(tmp_path, "prod").resolve(config)
+
+    assert dev == {'region': 'us-central1', 'labels': {'org': 'acme', 'team': 'web'},
+                   'machine': 'e2-small', 'project_id': 'shop'}
+    assert prod['machine'] == 'e2-standard-4'
+    assert prod['labels'] == {'org': 'acme', 'team': 'web', 'env': 'prod'}
+
+
+def test_edited_base_invalidates_cached_configs(tmp_path):
+    base = write(tmp_path / "base.yaml", "region: us-central1\n")
+    config = write(tmp_path / "app.yaml", "extends: base.yaml\nproject_id: app\n")
+    assert ConfigResolver(tmp_path).resolve(config)['region'] == 'us-central1'
+
+    base.write_text("region: europe-west1\n")
+
+    assert ConfigResolver(tmp_path).resolve(config)['region'] == 'europe-west1'
+
+
+def test_extends_cycle_is_an_error(tmp_path):
+    write(tmp_path / "a.yaml", "extends: b.yaml\n")
+    config = write(tmp_path / "b.yaml", "extends: a.yaml\n")
+
+    with pytest.raises(ValueError, match="extends cycle"):
+        ConfigResolver(tmp_path).resolve(config)
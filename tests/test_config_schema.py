@@ -0,0 +1,165 @@
+import shutil
+
+import pytest
+import yaml
+
+from conftest import REPO_DIR
+from config_schema import (ConfigSchema, check_type, compile_condition,
+                           convert, parse_type, parse_variables)
+from hcl import tokenize
+
+VARIABLES_TF = '''
+variable "name" {
+  type = string
+}
+
+variable "tier" {
+  type    = string
+  default = "STANDARD"
+
+  validation {
+    condition     = contains(["STANDARD", "NEARLINE"], var.tier)
+    error_message = "Tier must be STANDARD or NEARLINE."
+  }
+}
+
+variable "replicas" {
+  type    = number
+  default = 1
+
+  validation {
+    condition     = contains([1, 3, 5], var.replicas)
+    error_message = "Replicas must be 1, 3 or 5."
+  }
+}
+
+variable "servers" {
+  type = map(object({
+    size    = number
+    public  = optional(bool, false)
+    tags    = optional(list(string), ["web", "db"])
+  }))
+  default = {}
+}
+
+variable "window" {
+  type    = tuple([string, number])
+  default = ["sunday", 2]
+}
+'''
+
+
+def type_of(source):
+    return parse_type(tokenize(source))[0]
+
+
+def errors_for(value, var_type):
+    errors = []
+    check_type(value, var_type, "x", errors)
+    return errors
+
+
+@pytest.mark.parametrize('source, expected', [
+    ('string', 'string'),
+    ('list(map(number))', ['list', ['map', 'number']]),
+    ('tuple([string, number, bool])', ['tuple', ['string', 'number', 'bool']]),
+    ('object({ a = string, b = optional(number) })',
+     ['object', {'a': 'string', 'b': 'number'}, ['b']]),
+    ('object({ a = optional(list(string), ["x", "y"]), b = optional(map(string), {}) })',
+     ['object', {'a': ['list', 'string'], 'b': ['map', 'string']}, ['a', 'b']]),
+])
+def test_type_constraints_compile(source, expected):
+    assert type_of(source) == expected
+
+
+@pytest.mark.parametrize('source', ['list(string', 'strin(g)', 'object({ a string })'])
+def test_malformed_type_constraints_are_rejected(source):
+    with pytest.raises((ValueError, IndexError)):
+        type_of(source)
+
+
+@pytest.mark.parametrize('value, var_type', [
+    ("3", 'number'), ("1.5e3", 'number'), (3, 'string'), (True, 'string'),
+    ("true", 'bool'), (None, 'number'), ({'a': [1]}, 'any'),
+    (["a", 2], ['tuple', ['string', 'number']]),
+])
+def test_values_terraform_converts_pass(value, var_type):
+    assert errors_for(value, var_type) == []
+
+
+@pytest.mark.parametrize('value, var_type, error', [
+    ("three", 'number', "x: expected number, got 'three'"),
+    (True, 'number', "x: expected number, got bool"),
+    ("yes", 'bool', "x: expected bool, got string"),
+    ([1], 'string', "x: expected string, got list"),
+    (["a"], ['tuple', ['string', 'number']], "x: expected tuple of 2, got list"),
+    (["a", "b"], ['tuple', ['string', 'number']], "x[1]: expected number, got 'b'"),
+    ({'a': 'x'}, ['map', 'number'], "x.a: expected number, got 'x'"),
+])
+def test_values_terraform_rejects_fail(value, var_type, error):
+    assert errors_for(value, var_type) == [error]
+
+
+@pytest.mark.parametrize('value, var_type, expected', [
+    ("3", 'number', 3), ("false", 'bool', False), (True, 'string', 'true'),
+    (3, 'string', '3'), (3.0, 'string', '3'), (2.5, 'string', '2.5'),
+    (["3"], ['list', 'number'], ["3"]),
+])
+def test_validations_see_the_converted_value(value, var_type, expected):
+    assert convert(value, var_type) == expected
+
+
+def test_optional_object_attributes_may_be_left_out():
+    var_type = type_of('object({ a = string, b = optional(number, 3) })')
+
+    assert errors_for({'a': 'x'}, var_type) == []
+    assert errors_for({'b': 1}, var_type) == ["x: missing required attribute 'a'"]
+
+
+@pytest.mark.parametrize('source, expected', [
+    ('can(regex("^[a-z]+$", var.x))', {'regex': '^[a-z]+$'}),
+    ('contains(["a", "b"], var.x)', {'one_of': ['a', 'b']}),
+    ('contains([1, 2.5], var.x)', {'one_of': [1.0, 2.5]}),
+    ('contains([local.a, "b"], var.x)', None),
+    ('contains(["a"], var.y)', None),
+    ('length(var.x) > 2', None),
+])
+def test_only_conditions_with_a_python_equivalent_compile(source, expected):
+    assert compile_condition('x', tokenize(source)) == expected
+
+
+def test_configs_are_checked_against_declarations():
+    schema = ConfigSchema(parse_variables(VARIABLES_TF))
+
+    assert schema.check({'name': 'a', 'replicas': "3", 'window': ['mon', 1],
+                         'servers': {'web': {'size': 2}}}) == ([], [])
+
+    errors, warnings = schema.check({
+        'tier': 'COLDLINE', 'replicas': 2, 'extra': 1,
+        'servers': {'web': {'size': 'big', 'tags': 'web'}},
+    })
+    assert errors == [
+        "name: required variable is missing",
+        "tier: Tier must be STANDARD or NEARLINE.",
+        "replicas: Replicas must be 1, 3 or 5.",
+        "servers.web.size: expected number, got 'big'",
+        "servers.web.tags: expected list, got string",
+    ]
+    assert warnings == ["extra: not declared in variables.tf, terraform will ignore it"]
+
+
+def test_repo_variables_accept_the_example_configs(tmp_path):
+    shutil.copy(REPO_DIR / "variables.tf", tmp_path)
+    schema = ConfigSchema.load(tmp_path)
+
+    assert schema.variables['buckets']['type'][1][0] == 'object'
+    for config_file in sorted((REPO_DIR / "configs").glob("*.yaml")):
+        config = yaml.safe_load(config_file.read_text())
+        assert schema.check(config)[0] == [], config_file.name
+
+    errors, _ = schema.check({'project_id': 'Bad_ID', 'billing_account': 'x'})
+    assert any(error.startswith("project_id: Project ID must be") for error in errors)
+    assert any(error.startswith("billing_account: Billing account") for error in errors)
+
+    # The compiled schema is reused while variables.tf is unchanged
+    assert ConfigSchema.load(tmp_path).variables == schema.variables
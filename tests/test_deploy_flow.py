@@ -0,0 +1,102 @@
+"""
+Plan, then apply, against the benchmark's fake terraform
+"""
+
+import os
+import shutil
+import subprocess
+import sys
+from collections import Counter
+
+import pytest
+
+from conftest import REPO_DIR
+
+CONFIG = REPO_DIR / "configs" / "example-vpc-gcs.yaml"
+
+
+@pytest.fixture
+def run(tmp_path):
+    """Run deploy.py in a copy of the repository, returning its terraform calls"""
+    root = tmp_path / "repo"
+    root.mkdir()
+    for tf_file in REPO_DIR.glob("*.tf"):
+        shutil.copy2(tf_file, root)
+    shutil.copytree(REPO_DIR / "modules", root / "modules")
+    shutil.copytree(REPO_DIR / "scripts", root / "scripts",
+                    ignore=shutil.ignore_patterns('__pycache__', 'logs'))
+    shutil.copy2(CONFIG, root / "config.yaml")
+
+    bin_dir = tmp_path / "bin"
+    bin_dir.mkdir()
+    shim = bin_dir / "terraform"
+    shim.write_text(f'#!/bin/sh\nexec "{sys.executable}" '
+                    f'"{REPO_DIR / "benchmarks" / "fake_terraform.py"}" "$@"\n')
+    shim.chmod(0o755)
+    calls_file = tmp_path / "calls"
+
+    def deploy(*args, **fake_env):
+        calls_file.write_text('')
+        env = dict(
+            os.environ,
+            PATH=f"{bin_dir}{os.pathsep}{os.environ.get('PATH', '')}",
+            AUTOGCP_PLUGIN_CACHE_DIR=str(tmp_path / "plugins"),
+            AUTOGCP_LOG_DIR=str(tmp_path / "logs"),
+            FAKE_TF_CALLS=str(calls_file),
+            **fake_env)
+        result = subprocess.run(
+            [sys.executable, "scripts/deploy.py", "config.yaml", *args],
+            cwd=root, env=env, stdin=subprocess.DEVNULL,
+            capture_output=True, text=True)
+        return result, Counter(calls_file.read_text().split())
+
+    deploy.root = root
+    return deploy
+
+
+def test_apply_reuses_the_plan_stored_by_a_dry_run(run):
+    result, calls = run("--dry-run")
+    assert result.returncode == 0, result.stderr
+    assert calls['plan'] == 1
+
+    result, calls = run("--auto-approve")
+    assert result.returncode == 0, result.stderr
+    assert "Reusing the plan stored" in result.stderr
+    assert calls['plan'] == 0
+    assert calls['apply'] == 1
+
+    # Applied plans are dropped, the next run plans again
+    result, calls = run("--auto-approve")
+    assert calls['plan'] == 1
+
+
+def test_changed_config_is_planned_again(run):
+    run("--dry-run")
+    config = run.root / "config.yaml"
+    config.write_text(config.read_text().replace("owner: intern", "owner: platform"))
+
+    result, calls = run("--auto-approve")
+    assert result.returncode == 0, result.stderr
+    assert calls['plan'] == 1
+    assert "Reusing the plan stored" not in result.stderr
+
+
+def test_no_change_dry_run_lets_apply_skip_everything(run):
+    result, calls = run("--dry-run", FAKE_TF_NO_CHANGES='1')
+    assert result.returncode == 0, result.stderr
+    assert calls['plan'] == 1
+
+    result, calls = run("--auto-approve", FAKE_TF_NO_CHANGES='1')
+    assert result.returncode == 0, result.stderr
+    assert "Deployment Up To Date" in result.stderr
+    assert calls['plan'] == 0
+    assert calls['show'] == 0
+    assert calls['apply'] == 0
+
+
+def test_no_plan_cache_always_plans(run):
+    run("--dry-run")
+
+    result, calls = run("--auto-approve", "--no-plan-cache")
+    assert result.returncode == 0, result.stderr
+    assert calls['plan'] == 1
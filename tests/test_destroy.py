@@ -0,0 +1,56 @@
+import destroy
+from destroy import TerraformDestroyer
+from tfstate import StateSnapshot
+
+
+def resource(module, name):
+    return {'module': f'module.{module}[0]', 'mode': 'managed',
+            'type': 'google_thing', 'name': name, 'instances': [{}]}
+
+
+def test_each_wave_pulls_a_fresh_state(monkeypatch):
+    remote = {'serial': 1, 'resources': [
+        resource('project', 'a'), resource('vpc', 'b'), resource('gke', 'c')]}
+    pulls = []
+    commands = []
+
+    def pull(cls, work_dir, env=None):
+        pulls.append(len(remote['resources']))
+        return StateSnapshot(remote)
+
+    def run_terraform_command(command, check=True):
+        commands.append(command)
+        if command[0] == 'apply':
+            # The wave removes what its plan targeted, everything if untargeted
+            targets = [arg[len('-target='):] for arg in commands[-2]
+                       if arg.startswith('-target=')]
+            remote['serial'] += 1
+            remote['resources'] = [
+                r for r in remote['resources']
+                if targets and not any(r['module'].startswith(t) for t in targets)]
+        return True
+
+    monkeypatch.setattr(destroy.StateSnapshot, 'pull', classmethod(pull))
+    destroyer = TerraformDestroyer(config_file="shop.yaml", auto_approve=True,
+                                   waves=True)
+    monkeypatch.setattr(destroyer, 'run_terraform_command', run_terraform_command)
+
+    assert destroyer.destroy_in_waves()
+
+    plans = [[arg for arg in command if arg.startswith('-target=')]
+             for command in commands if command[0] == 'plan']
+    assert plans == [['-target=module.gke'], ['-target=module.vpc'],
+                     ['-target=module.project'], []]
+    # Ordered from one pull, then the snapshot is dropped after every apply
+    assert pulls == [3, 0]
+    assert destroyer.state is None or len(destroyer.state) == 0
+
+
+def test_applying_a_wave_forgets_the_snapshot(monkeypatch):
+    destroyer = TerraformDestroyer(config_file="shop.yaml", auto_approve=True)
+    destroyer.state = StateSnapshot({'resources': [resource('vpc', 'b')]})
+    monkeypatch.setattr(destroyer, 'run_terraform_command',
+                        lambda command, check=True: command[0] == 'plan')
+
+    assert not destroyer.destroy_wave('wave_1', ['module.vpc'])
+    assert destroyer.state is None
@@ -0,0 +1,16 @@
+import drift
+from config_loader import ConfigResolver
+
+
+def test_configs_sharing_a_project_are_not_checked(tmp_path, monkeypatch):
+    monkeypatch.setattr(drift, 'ConfigResolver',
+                        lambda root_dir, workspace: ConfigResolver(tmp_path, workspace))
+    monkeypatch.setattr(drift, 'DriftDetector', None)
+    config_files = []
+    for name in ('shop', 'shop-copy'):
+        (tmp_path / f"{name}.yaml").write_text("project_id: shop\n")
+        config_files.append(str(tmp_path / f"{name}.yaml"))
+
+    results = drift.detect_drift(config_files)
+
+    assert [result['status'] for result in results.values()] == ['error', 'error']
@@ -0,0 +1,52 @@
+import threading
+import time
+
+import pytest
+
+from fmt_check import FormatChecker
+
+
+@pytest.fixture
+def root(tmp_path):
+    (tmp_path / "main.tf").write_text('module "vpc" {}\n')
+    (tmp_path / "modules" / "vpc").mkdir(parents=True)
+    (tmp_path / "modules" / "vpc" / "main.tf").write_text('resource "x" "y" {}\n')
+    return tmp_path
+
+
+def fake_fmt(monkeypatch, unformatted=(), delay=0.0):
+    """Replace terraform fmt -check, returning the list of its calls"""
+    calls = []
+
+    def run_fmt_check(self, files):
+        calls.append(files)
+        time.sleep(delay)
+        return set(unformatted)
+
+    monkeypatch.setattr(FormatChecker, 'run_fmt_check', run_fmt_check)
+    return calls
+
+
+def test_only_changed_files_are_checked_again(root, monkeypatch):
+    calls = fake_fmt(monkeypatch, unformatted={'main.tf'})
+
+    assert FormatChecker(root).check() == ['main.tf']
+    assert FormatChecker(root).check() == ['main.tf']
+    (root / "modules" / "vpc" / "main.tf").write_text('resource "x" "z" {}\n')
+    FormatChecker(root).check()
+
+    assert calls == [['main.tf', 'modules/vpc/main.tf'], ['modules/vpc/main.tf']]
+
+
+def test_concurrent_checks_run_fmt_once(root, monkeypatch):
+    calls = fake_fmt(monkeypatch, delay=0.2)
+    results = []
+    threads = [threading.Thread(target=lambda: results.append(
+        FormatChecker(root).check())) for _ in range(4)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    assert len(calls) == 1
+    assert results == [[]] * 4
@@ -0,0 +1,37 @@
+import logging
+
+import logsetup
+
+
+def record(project, message):
+    record = logging.LogRecord('test', logging.INFO, __file__, 1, message, None, None)
+    record.project = project
+    return record
+
+
+def test_idle_project_logs_are_closed_and_reopened(tmp_path, monkeypatch):
+    monkeypatch.setattr(logsetup, 'MAX_OPEN_PROJECT_LOGS', 2)
+    handler = logsetup.ProjectFileHandler(
+        tmp_path, "run.log", logging.Formatter('%(message)s'))
+    handler.enabled = True
+
+    for project, message in [('a', 'a1'), ('b', 'b1'), ('a', 'a2'),
+                             ('c', 'c1'), ('b', 'b2')]:
+        handler.handle(record(project, message))
+
+    assert list(handler.handlers) == ['c', 'b']
+    handler.close()
+    assert (tmp_path / "a" / "run.log").read_text() == "a1\na2\n"
+    assert (tmp_path / "b" / "run.log").read_text() == "b1\nb2\n"
+    assert (tmp_path / "c" / "run.log").read_text() == "c1\n"
+
+
+def test_records_without_a_project_only_reach_the_main_log(tmp_path):
+    handler = logsetup.ProjectFileHandler(
+        tmp_path, "run.log", logging.Formatter('%(message)s'))
+    handler.handle(record('a', 'before split'))
+    handler.enabled = True
+    handler.handle(record(None, 'main only'))
+
+    assert handler.handlers == {}
+    assert not any(tmp_path.iterdir())
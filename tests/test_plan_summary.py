@@ -0,0 +1,59 @@
+import json
+
+import pytest
+
+from plan_summary import ResourceChangeStream
+
+PLAN = {
+    'format_version': '1.2',
+    'prior_state': {'values': {'root_module': {'resources': [
+        {'address': 'old', 'values': {'resource_changes': [{'address': 'nested'}]}},
+    ]}}},
+    'resource_changes': [
+        {'address': 'module.vpc[0].google_compute_network.main',
+         'change': {'actions': ['create'], 'after': {'name': 'a "quoted" {brace}'}}},
+        {'address': 'google_storage_bucket.b["x]y"]',
+         'change': {'actions': ['delete', 'create'], 'after': {'tags': [1, [2, {}]]}}},
+        {'address': 'time_static.created', 'change': {'actions': ['no-op']}},
+    ],
+    'resource_drift': [{'address': 'drifted', 'change': {'actions': ['update']}}],
+    'configuration': {'root_module': {}},
+}
+
+
+def scan(text, chunk_size, key='resource_changes'):
+    changes = []
+    stream = ResourceChangeStream(changes.append, key)
+    for start in range(0, len(text), chunk_size):
+        stream.feed(text[start:start + chunk_size])
+    return changes, stream
+
+
+@pytest.mark.parametrize('chunk_size', [1, 2, 7, 64, 100000])
+def test_yields_each_resource_change_whatever_the_chunking(chunk_size):
+    text = json.dumps(PLAN)
+
+    changes, _ = scan(text, chunk_size)
+
+    assert changes == PLAN['resource_changes']
+
+
+def test_other_top_level_arrays_can_be_selected():
+    changes, _ = scan(json.dumps(PLAN), 5, key='resource_drift')
+
+    assert [c['address'] for c in changes] == ['drifted']
+
+
+def test_only_the_current_element_is_buffered():
+    filler = {'address': 'x', 'values': {'blob': 'y' * 10000}}
+    plan = {'prior_state': [filler] * 50, 'resource_changes': [filler] * 50}
+    text = json.dumps(plan)
+    largest = 0
+    changes = []
+    stream = ResourceChangeStream(changes.append)
+    for start in range(0, len(text), 4096):
+        stream.feed(text[start:start + 4096])
+        largest = max(largest, len(stream.buffer))
+
+    assert len(changes) == 50
+    assert largest < 2 * len(json.dumps(filler)) + 4096
@@ -0,0 +1,114 @@
+import os
+import threading
+
+import pytest
+
+from plugin_cache import PluginCache
+
+GOOGLE = "registry.terraform.io/hashicorp/google"
+MB = 1024 * 1024
+
+
+@pytest.fixture
+def cache(tmp_path):
+    """A 2 MB cache holding three 1 MB google versions, 4.0.0 the oldest"""
+    cache = PluginCache(cache_dir=str(tmp_path / "plugins"), max_size_mb=2,
+                        offline=False)
+    for age, version in enumerate(["6.0.0", "5.0.0", "4.0.0"]):
+        version_dir = cache.cache_dir / GOOGLE / version
+        (version_dir / "linux_amd64").mkdir(parents=True)
+        (version_dir / "linux_amd64" / "provider").write_bytes(b"\0" * MB)
+        stamp = 1_000_000 - age * 1000
+        os.utime(version_dir, (stamp, stamp))
+    return cache
+
+
+def lock_file(path, *versions):
+    path.write_text("".join(
+        f'provider "{GOOGLE}" {{\n  version = "{version}"\n}}\n\n'
+        for version in versions))
+    return path
+
+
+def cached(cache):
+    return sorted(p.name for p in cache.version_dirs())
+
+
+def test_eviction_removes_the_least_recently_used_versions(cache):
+    evicted = cache.evict()
+
+    assert [p.name for p in evicted] == ["4.0.0"]
+    assert cached(cache) == ["5.0.0", "6.0.0"]
+
+
+def test_eviction_keeps_versions_in_use(cache):
+    cache.evict(keep={(GOOGLE, "4.0.0")})
+
+    assert cached(cache) == ["4.0.0", "6.0.0"]
+
+
+def test_recorded_use_protects_a_version_from_eviction(cache, tmp_path):
+    evicted = cache.record_use(lock_file(tmp_path / "lock.hcl", "4.0.0"))
+
+    assert [p.name for p in evicted] == ["5.0.0"]
+    # 4.0.0 is now the most recently used
+    assert cache.evict() == []
+    cache.max_size_mb = 1
+    assert [p.name for p in cache.evict()] == ["6.0.0"]
+
+
+def test_cache_under_its_limit_is_left_alone(cache):
+    cache.max_size_mb = 3
+
+    assert cache.evict() == []
+    assert cached(cache) == ["4.0.0", "5.0.0", "6.0.0"]
+
+
+def hold(cache, lock_file, entered, release):
+    with cache.locked(lock_file):
+        entered.set()
+        release.wait(5)
+
+
+def start_holding(cache, lock_file):
+    entered, release = threading.Event(), threading.Event()
+    thread = threading.Thread(target=hold, args=(cache, lock_file, entered, release))
+    thread.start()
+    return thread, entered, release
+
+
+@pytest.fixture
+def holder(cache, tmp_path):
+    """Hold the cache lock for a warm init, returns a lock attempt helper
+
+    The helper tells whether locked(lock_file) is granted within a short
+    wait. Attempts still blocked finish once the holder lets go.
+    """
+    thread, entered, release = start_holding(
+        cache, lock_file(tmp_path / "warm.hcl", "6.0.0"))
+    assert entered.wait(5)
+    attempts = []
+
+    def acquires(lock_file):
+        attempt = start_holding(cache, lock_file)
+        attempts.append(attempt)
+        granted = attempt[1].wait(0.5)
+        attempt[2].set()
+        return granted
+
+    yield acquires
+    release.set()
+    thread.join()
+    for attempt_thread, _, _ in attempts:
+        attempt_thread.join()
+
+
+def test_warm_inits_share_the_lock(cache, tmp_path, holder):
+    assert cache.is_warm(lock_file(tmp_path / "other.hcl", "5.0.0", "6.0.0"))
+    assert holder(tmp_path / "other.hcl")
+
+
+@pytest.mark.parametrize('versions', [["7.0.0"], ["6.0.0", "7.0.0"], None])
+def test_installs_and_eviction_wait_for_the_lock(cache, tmp_path, holder, versions):
+    cold = lock_file(tmp_path / "cold.hcl", *versions) if versions else None
+    assert not holder(cold)
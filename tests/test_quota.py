@@ -0,0 +1,97 @@
+import threading
+
+import pytest
+
+from quota import ApiScheduler, parse_budgets
+
+COMPUTE = 'compute.googleapis.com'
+STORAGE = 'storage.googleapis.com'
+
+
+def scheduler(workers=4, budgets=None, **deployments):
+    scheduler = ApiScheduler(workers, budgets)
+    for key, apis in deployments.items():
+        scheduler.add(key, apis)
+    return scheduler
+
+
+def test_saturated_api_does_not_idle_other_deployments():
+    s = scheduler(budgets={COMPUTE: 1},
+                  a={COMPUTE}, b={COMPUTE, STORAGE}, c={STORAGE})
+
+    assert s.next() == 'a'
+    assert s.next() == 'c'
+    s.release('a')
+    assert s.next() == 'b'
+
+
+def test_rate_limit_halves_the_named_api_once_per_deployment():
+    s = scheduler(a={COMPUTE, STORAGE})
+    s.next()
+    watch = s.watcher('a')
+
+    watch(f"Error 429: Too Many Requests for {COMPUTE}")
+    watch(f"Error 429: Too Many Requests for {COMPUTE}")
+
+    assert s.budget(COMPUTE) == 2
+    assert s.budget(STORAGE) == 4
+
+
+def test_rate_limit_without_an_api_name_throttles_all_of_the_deployment():
+    s = scheduler(a={COMPUTE, STORAGE})
+    s.next()
+
+    s.watcher('a')("googleapi: Error 403: rateLimitExceeded")
+
+    assert s.budget(COMPUTE) == 2 and s.budget(STORAGE) == 2
+
+
+@pytest.mark.parametrize('line', [
+    "Error 403: Quota 'CPUS' exceeded. Limit: 24.0 in region us-central1.",
+    "Error 409: Already exists",
+])
+def test_other_errors_do_not_throttle(line):
+    s = scheduler(a={COMPUTE})
+    s.next()
+
+    s.watcher('a')(line)
+
+    assert s.budget(COMPUTE) == 4
+
+
+def test_budget_recovers_one_step_per_clean_deployment():
+    s = scheduler(**{key: {COMPUTE} for key in 'abcd'})
+    s.next()
+    s.watcher('a')(f"Error 429 from {COMPUTE}")
+    s.watcher('a')(f"Error 429 from {COMPUTE}")
+    s.release('a')
+    assert s.budget(COMPUTE) == 2
+
+    budgets = []
+    for _ in range(3):
+        key = s.next()
+        s.release(key)
+        budgets.append(s.budget(COMPUTE))
+
+    assert budgets == [3, 4, 4]
+
+
+def test_cancel_releases_waiting_workers():
+    s = scheduler(budgets={COMPUTE: 1}, a={COMPUTE}, b={COMPUTE})
+    s.next()
+    results = []
+    waiter = threading.Thread(target=lambda: results.append(s.next()))
+    waiter.start()
+
+    s.cancel()
+    waiter.join(timeout=5)
+
+    assert not waiter.is_alive()
+    assert results == [None]
+
+
+def test_budgets_are_parsed_from_the_command_line():
+    assert parse_budgets([f"{COMPUTE}=2", f"{STORAGE}=8"]) == {COMPUTE: 2, STORAGE: 8}
+    for value in (COMPUTE, f"{COMPUTE}=0", f"{COMPUTE}=x", "=3"):
+        with pytest.raises(ValueError):
+            parse_budgets([value])
@@ -0,0 +1,92 @@
+import pytest
+
+import serve
+from serve import Job, JobQueue
+
+
+def test_higher_priority_runs_first_then_submission_order():
+    queue = JobQueue()
+    low = Job('plan', 'a.yaml', priority=0, key='a')
+    warm = Job('warm', 'b.yaml', priority=serve.WARM_PRIORITY, key='b')
+    high = Job('apply', 'c.yaml', priority=10, key='c')
+    later = Job('plan', 'd.yaml', priority=0, key='d')
+    for job in (low, warm, high, later):
+        queue.submit(job)
+
+    assert [queue.next() for _ in range(4)] == [high, low, later, warm]
+
+
+def test_busy_project_waits_without_blocking_others():
+    queue = JobQueue()
+    apply = Job('apply', 'shop.yaml', key='shop')
+    destroy = Job('destroy', 'shop.yaml', key='shop')
+    other = Job('plan', 'blog.yaml', key='blog')
+    for job in (apply, destroy, other):
+        queue.submit(job)
+
+    assert queue.next() is apply
+    assert queue.next() is other
+    assert destroy.status == 'queued'
+
+    apply.finish('succeeded')
+    queue.done(apply)
+    assert queue.next() is destroy
+
+
+def test_cancel_and_close_only_touch_queued_jobs():
+    queue = JobQueue()
+    running = Job('plan', 'a.yaml', key='a')
+    queued = Job('plan', 'b.yaml', key='b')
+    queue.submit(running)
+    queue.next()
+    queue.submit(queued)
+
+    assert not queue.cancel(running.id)
+    queue.close()
+
+    assert running.status == 'running'
+    assert queued.status == 'cancelled'
+    assert queue.next() is None
+
+
+def test_job_log_keeps_the_latest_lines(monkeypatch):
+    monkeypatch.setattr(serve, 'MAX_JOB_LOG_LINES', 3)
+    job = Job('plan', 'a.yaml')
+    for number in range(5):
+        job.append(str(number))
+
+    assert job.lines_since(3) == (['3', '4'], 5)
+    lines, sent = job.lines_since(0)
+    assert lines[1:] == ['2', '3', '4'] and sent == 5
+    assert "2 earlier lines" in lines[0]
+
+
+@pytest.mark.parametrize('host, allowed', [
+    ('127.0.0.1', True), ('::1', True), ('localhost', True),
+    ('0.0.0.0', False), ('10.0.0.5', False), ('example.com', False),
+])
+def test_only_loopback_hosts_are_served(host, allowed):
+    assert serve.is_loopback(host) is allowed
+
+
+@pytest.mark.parametrize('body', [[], "plan", 3, None])
+def test_bodies_that_are_not_objects_are_rejected(body, tmp_path):
+    with pytest.raises(ValueError, match="JSON object"):
+        serve.job_from_request(body, tmp_path)
+
+
+def test_only_the_latest_finished_jobs_keep_their_log(monkeypatch):
+    monkeypatch.setattr(serve, 'MAX_LOGGED_JOBS', 1)
+    queue = JobQueue()
+    jobs = [Job('plan', f'{name}.yaml', key=name) for name in 'ab']
+    for job in jobs:
+        queue.submit(job)
+        queue.next()
+        job.append("line")
+        job.finish('succeeded')
+        queue.done(job)
+
+    assert not jobs[0].lines and jobs[0].line_count == 1
+    assert jobs[0].lines_since(0)[0] == [
+        "... 1 earlier lines are only in the project log"]
+    assert list(jobs[1].lines) == ["line"]
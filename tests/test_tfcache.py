@@ -0,0 +1,91 @@
+import gzip
+
+import pytest
+
+import tfcache
+
+
+@pytest.fixture
+def root(tmp_path):
+    (tmp_path / "main.tf").write_text('module "vpc" {}\n')
+    (tmp_path / "modules" / "vpc").mkdir(parents=True)
+    (tmp_path / "modules" / "vpc" / "main.tf").write_text('resource "x" "y" {}\n')
+    (tmp_path / "vars.json").write_text('{"project_id": "a"}\n')
+    (tmp_path / "backend.conf").write_text('bucket = "b"\n')
+    return tmp_path
+
+
+def key(root, workspace=None, state_key="lineage:1"):
+    return tfcache.plan_cache_key(
+        root, root / "vars.json", root / "backend.conf", workspace, state_key)
+
+
+def test_plan_cache_key_is_stable(root):
+    assert key(root) == key(root)
+
+
+@pytest.mark.parametrize('change', [
+    lambda root: (root / "vars.json").write_text('{"project_id": "b"}\n'),
+    lambda root: (root / "backend.conf").write_text('bucket = "c"\n'),
+    lambda root: (root / "main.tf").write_text('module "gcs" {}\n'),
+    lambda root: (root / "modules" / "vpc" / "extra.tf").write_text('\n'),
+])
+def test_plan_cache_key_follows_inputs_and_sources(root, change):
+    before = key(root)
+    change(root)
+    assert key(root) != before
+
+
+def test_plan_cache_key_follows_workspace_and_state(root):
+    assert key(root, workspace="prod") != key(root)
+    assert key(root, workspace="default") == key(root)
+    assert key(root, state_key="lineage:2") != key(root)
+
+
+def test_plan_results_are_stored_under_their_key(root):
+    assert tfcache.load_plan_result(root, key(root)) is None
+
+    tfcache.save_plan_result(root, key(root), {'no_changes': True})
+
+    assert tfcache.load_plan_result(root, key(root)) == {'no_changes': True}
+    assert tfcache.load_plan_result(root, key(root, workspace="prod")) is None
+
+
+def test_stored_plan_round_trip(root, tmp_path):
+    plan_file = tmp_path / "tfplan"
+    plan_file.write_bytes(b"PK plan bytes")
+    tfcache.save_plan_artifact(root, "k1", plan_file, {'no_changes': False}, "a/default")
+
+    result = tfcache.load_plan_result(root, "k1")
+    restored = tmp_path / "restored"
+    assert result['artifact'] is True
+    assert tfcache.load_plan_artifact(root, "k1", result, restored)
+    assert restored.read_bytes() == b"PK plan bytes"
+
+    tfcache.drop_plan_artifact(root, "k1")
+    assert tfcache.load_plan_result(root, "k1") is None
+    assert not tfcache.plan_artifact_file(root, "k1").exists()
+
+
+def test_damaged_stored_plan_is_refused(root, tmp_path):
+    plan_file = tmp_path / "tfplan"
+    plan_file.write_bytes(b"PK plan bytes")
+    tfcache.save_plan_artifact(root, "k1", plan_file, {}, "a/default")
+    tfcache.plan_artifact_file(root, "k1").write_bytes(gzip.compress(b"other"))
+
+    result = tfcache.load_plan_result(root, "k1")
+    assert not tfcache.load_plan_artifact(root, "k1", result, tmp_path / "restored")
+    assert not (tmp_path / "restored").exists()
+
+
+def test_newer_plan_replaces_the_owners_previous_one(root, tmp_path):
+    plan_file = tmp_path / "tfplan"
+    plan_file.write_bytes(b"first")
+    tfcache.save_plan_artifact(root, "k1", plan_file, {}, "a/default")
+    tfcache.save_plan_artifact(root, "other", plan_file, {}, "b/default")
+    plan_file.write_bytes(b"second")
+    tfcache.save_plan_artifact(root, "k2", plan_file, {}, "a/default")
+
+    assert tfcache.load_plan_result(root, "k1") is None
+    assert tfcache.load_plan_result(root, "k2") is not None
+    assert tfcache.load_plan_result(root, "other") is not None
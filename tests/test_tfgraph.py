@@ -0,0 +1,119 @@
+import pytest
+
+from tfgraph import ModuleGraph
+
+MAIN_TF = '''
+locals {
+  region = var.default_region
+  name   = "${var.prefix}-app"
+}
+
+module "network" {
+  source = "./modules/vpc"
+  name   = local.name
+}
+
+module "database" {
+  source  = "./modules/cloudsql"
+  network = module.network.id
+  tier    = var.db_tier
+}
+
+module "app" {
+  source     = "./modules/cloudrun"
+  database   = module.database.connection_name
+  image      = var.image
+  depends_on = [module.network]
+}
+
+module "topics" {
+  source = "./modules/pubsub"
+  topics = var.topics
+}
+
+resource "time_static" "created" {}
+'''
+
+PROVIDER_TF = '''
+provider "google" {
+  project = var.project_id
+  region  = local.region
+}
+'''
+
+VARIABLES_TF = '''
+variable "image" {
+  type = string
+  validation {
+    condition     = length(var.image) > 0
+    error_message = "image must be set"
+  }
+}
+'''
+
+OUTPUTS_TF = '''
+output "topic_count" {
+  value = length(var.topics)
+}
+'''
+
+
+@pytest.fixture
+def graph(tmp_path):
+    (tmp_path / "main.tf").write_text(MAIN_TF)
+    (tmp_path / "provider.tf").write_text(PROVIDER_TF)
+    (tmp_path / "variables.tf").write_text(VARIABLES_TF)
+    (tmp_path / "outputs.tf").write_text(OUTPUTS_TF)
+    return ModuleGraph.load(tmp_path)
+
+
+def test_variables_are_traced_through_locals(graph):
+    assert graph.uses['network'] == {'prefix'}
+    assert graph.uses['database'] == {'db_tier'}
+
+
+def test_dependencies_combine_data_references_and_depends_on(graph):
+    assert graph.dependencies('app') == {'database', 'network'}
+    assert graph.all_dependencies('app') == {'database', 'network'}
+    assert graph.dependencies('topics') == set()
+
+
+def test_destroy_waves_remove_dependents_first(graph):
+    assert graph.destroy_waves(graph.modules) == [
+        ['app', 'topics'], ['database'], ['network']]
+
+
+def test_destroy_waves_skip_modules_already_gone(graph):
+    assert graph.destroy_waves(['network', 'database']) == [['database'], ['network']]
+
+
+def test_destroy_waves_reject_cycles():
+    graph = ModuleGraph({'blocks': [
+        {'type': 'module', 'labels': ['a'],
+         'body': {'attributes': {'x': [('ident', 'module'), ('punct', '.'),
+                                       ('ident', 'b')]}, 'blocks': []}},
+        {'type': 'module', 'labels': ['b'],
+         'body': {'attributes': {'x': [('ident', 'module'), ('punct', '.'),
+                                       ('ident', 'a')]}, 'blocks': []}},
+    ]})
+
+    with pytest.raises(ValueError, match="cycle"):
+        graph.destroy_waves(['a', 'b'])
+
+
+def test_modules_for_adds_no_targets_for_module_only_keys(graph):
+    assert graph.modules_for(['db_tier']) == {'database'}
+    assert graph.with_dependents({'database'}) == {'database', 'app'}
+    # Only read by its own validation block, which is not a reader
+    assert graph.modules_for(['image']) == {'app'}
+
+
+@pytest.mark.parametrize('variable', [
+    'default_region',   # provider, through a local
+    'project_id',       # provider
+    'topics',           # an output as well as a module
+    'unknown',          # read by nothing
+])
+def test_variables_read_outside_modules_need_a_full_plan(graph, variable):
+    assert variable in graph.root_vars or variable == 'unknown'
+    assert graph.modules_for([variable]) is None
@@ -0,0 +1,86 @@
+import sys
+import time
+
+import pytest
+
+import tfrunner
+
+SLEEPER = "import time; print('ready', flush=True); time.sleep(30)"
+
+INTERRUPTIBLE = """
+import signal, sys, time
+def stop(signum, frame):
+    print('interrupted', flush=True)
+    sys.exit(3)
+signal.signal(signal.SIGINT, stop)
+print('ready', flush=True)
+time.sleep(30)
+"""
+
+STUBBORN = """
+import signal, time
+signal.signal(signal.SIGINT, signal.SIG_IGN)
+print('ready', flush=True)
+time.sleep(30)
+"""
+
+
+def run(code, tmp_path, on_stdout=lambda line: None, timeout=None):
+    return tfrunner.stream_command(
+        [sys.executable, '-c', code], tmp_path, on_stdout, lambda line: None,
+        timeout=timeout)
+
+
+def test_output_is_streamed_line_by_line(tmp_path):
+    lines = []
+    code = "print('one'); print('two\\r'); print('three', end='')"
+
+    assert run(code, tmp_path, lines.append) == 0
+    assert lines == ['one', 'two', 'three']
+
+
+def test_timeout_stops_the_command(tmp_path):
+    started = time.monotonic()
+
+    with pytest.raises(tfrunner.CommandTimeout, match="timed out after 0.5s"):
+        run(SLEEPER, tmp_path, timeout=0.5)
+
+    assert time.monotonic() - started < 10
+    assert not tfrunner._active_pids
+
+
+def test_interrupt_all_forwards_sigint(tmp_path):
+    lines = []
+
+    def on_stdout(line):
+        lines.append(line)
+        if line == 'ready':
+            tfrunner.interrupt_all()
+
+    assert run(INTERRUPTIBLE, tmp_path, on_stdout) == 3
+    assert lines == ['ready', 'interrupted']
+
+
+def test_command_ignoring_sigint_is_killed_after_the_grace(tmp_path, monkeypatch):
+    monkeypatch.setattr(tfrunner, 'INTERRUPT_GRACE_SECONDS', 0.5)
+    started = time.monotonic()
+
+    with pytest.raises(tfrunner.CommandTimeout):
+        run(STUBBORN, tmp_path, timeout=1)
+
+    # The timeout, then the whole grace before the kill
+    assert 1.5 <= time.monotonic() - started < 10
+
+
+def test_no_command_starts_after_shutdown(tmp_path):
+    tfrunner.shutdown()
+    try:
+        with pytest.raises(tfrunner.ShuttingDown):
+            run("print('never')", tmp_path)
+    finally:
+        tfrunner._shutting_down.clear()
+
+
+def test_stopped_commands_share_one_base_class():
+    assert issubclass(tfrunner.CommandTimeout, tfrunner.CommandStopped)
+    assert issubclass(tfrunner.ShuttingDown, tfrunner.CommandStopped)
@@ -0,0 +1,100 @@
+import json
+import os
+
+import pytest
+
+from tfstate import StateSnapshot, instance_address
+
+STATE = {
+    'serial': 7,
+    'lineage': 'abc',
+    'resources': [
+        {'mode': 'managed', 'type': 'google_project', 'name': 'this',
+         'instances': [{'attributes': {}}]},
+        {'mode': 'data', 'type': 'google_client_config', 'name': 'current',
+         'instances': [{}]},
+        {'module': 'module.vpc[0]', 'mode': 'managed',
+         'type': 'google_compute_network', 'name': 'main', 'instances': [{}]},
+        {'module': 'module.vpc[0]', 'mode': 'managed',
+         'type': 'google_compute_subnetwork', 'name': 'subnet',
+         'instances': [{'index_key': 'web'}, {'index_key': 'db'}]},
+        {'module': 'module.gke[0].module.nodes', 'mode': 'managed',
+         'type': 'google_container_node_pool', 'name': 'pool',
+         'instances': [{'index_key': 0}, {'index_key': 1}]},
+    ],
+}
+
+
+@pytest.fixture
+def state():
+    return StateSnapshot(STATE)
+
+
+def test_addresses_match_terraform_state_list(state):
+    assert state.addresses == [
+        'data.google_client_config.current',
+        'google_project.this',
+        'module.gke[0].module.nodes.google_container_node_pool.pool[0]',
+        'module.gke[0].module.nodes.google_container_node_pool.pool[1]',
+        'module.vpc[0].google_compute_network.main',
+        'module.vpc[0].google_compute_subnetwork.subnet["db"]',
+        'module.vpc[0].google_compute_subnetwork.subnet["web"]',
+    ]
+    assert len(state) == 7
+    assert state.key == "abc:7"
+
+
+def test_instances_are_indexed_by_module_and_type(state):
+    assert state.root_modules == {'vpc', 'gke'}
+    assert len(state.by_module['module.gke[0].module.nodes']) == 2
+    assert state.by_type['google_compute_subnetwork'] == [
+        'module.vpc[0].google_compute_subnetwork.subnet["web"]',
+        'module.vpc[0].google_compute_subnetwork.subnet["db"]',
+    ]
+
+
+@pytest.mark.parametrize('targets, count', [
+    ([], 7),
+    (['module.vpc'], 3),
+    (['module.vpc[0]'], 3),
+    (['module.vpc[0].google_compute_subnetwork.subnet'], 2),
+    (['module.vpc[0].google_compute_subnetwork.subnet["db"]'], 1),
+    (['module.gke[0].module.nodes'], 2),
+    (['module.gke[0].module.nodes.google_container_node_pool.pool[1]'], 1),
+    (['module.vp', 'google_project.th'], 0),
+    (['module.gke', 'google_project.this'], 3),
+])
+def test_matching_follows_target_semantics(state, targets, count):
+    assert len(state.matching(targets)) == count
+
+
+def test_index_keys_are_formatted_by_type():
+    resource = {'type': 't', 'name': 'n', 'module': 'module.a.module.b'}
+
+    assert instance_address(resource, {'index_key': 3}) == 'module.a.module.b.t.n[3]'
+    assert instance_address(resource, {'index_key': '3'}) == 'module.a.module.b.t.n["3"]'
+
+
+@pytest.fixture
+def terraform(tmp_path):
+    """A terraform on PATH that prints state.json for state pull"""
+    bin_dir = tmp_path / "bin"
+    bin_dir.mkdir()
+    script = bin_dir / "terraform"
+    script.write_text(f'#!/bin/sh\ncat "{tmp_path}/state.json" || exit 1\n')
+    script.chmod(0o755)
+    return tmp_path, dict(os.environ, PATH=f"{bin_dir}:{os.environ['PATH']}")
+
+
+def test_pull_parses_the_remote_state(terraform):
+    work_dir, env = terraform
+    (work_dir / "state.json").write_text(json.dumps(STATE))
+
+    assert StateSnapshot.pull(work_dir, env).key == "abc:7"
+
+    (work_dir / "state.json").write_text("")
+    assert len(StateSnapshot.pull(work_dir, env)) == 0
+
+    (work_dir / "state.json").unlink()
+    with pytest.raises(RuntimeError):
+        StateSnapshot.pull(work_dir, env)
@@ -0,0 +1,98 @@
+import datetime
+import json
+
+import pytest
+
+import workdir
+
+
+@pytest.fixture
+def root(tmp_path):
+    root = tmp_path / "root"
+    (root / "modules").mkdir(parents=True)
+    (root / "main.tf").write_text('module "vpc" {}\n')
+    (root / workdir.LOCK_FILE).write_text('provider "google" { version = "5.0.0" }\n')
+    return root
+
+
+def test_work_dir_links_sources_and_copies_the_lock_file(root):
+    work_dir = workdir.project_work_dir(root, "shop")
+    workdir.link_work_dir(root, work_dir)
+
+    assert (work_dir / "main.tf").resolve() == (root / "main.tf").resolve()
+    assert (work_dir / "modules").is_symlink()
+    assert not (work_dir / workdir.LOCK_FILE).is_symlink()
+    assert (work_dir / workdir.LOCK_FILE).read_text() == \
+        (root / workdir.LOCK_FILE).read_text()
+
+
+def test_lock_file_written_by_init_is_kept_until_the_root_changes(root):
+    work_dir = workdir.project_work_dir(root, "shop")
+    workdir.link_work_dir(root, work_dir)
+    (work_dir / workdir.LOCK_FILE).write_text("hashes added by init\n")
+
+    workdir.link_work_dir(root, work_dir)
+    assert (work_dir / workdir.LOCK_FILE).read_text() == "hashes added by init\n"
+
+    (root / workdir.LOCK_FILE).write_text('provider "google" { version = "6.0.0" }\n')
+    workdir.link_work_dir(root, work_dir)
+    assert "6.0.0" in (work_dir / workdir.LOCK_FILE).read_text()
+
+
+def test_removed_root_files_lose_their_links(root):
+    work_dir = workdir.project_work_dir(root, "shop")
+    (root / "extra.tf").write_text("\n")
+    workdir.link_work_dir(root, work_dir)
+    (root / "extra.tf").unlink()
+
+    workdir.link_work_dir(root, work_dir)
+
+    assert not (work_dir / "extra.tf").is_symlink()
+
+
+def test_tfvars_are_only_rewritten_when_they_change(tmp_path):
+    config = {'project_id': 'shop', 'terraform_state_bucket': 'b'}
+
+    assert workdir.write_tfvars(tmp_path, config)
+    assert not workdir.write_tfvars(tmp_path, config)
+    assert json.loads((tmp_path / workdir.TFVARS_FILE).read_text()) == \
+        {'project_id': 'shop'}
+
+
+def test_configs_sharing_a_project_are_reported(caplog):
+    configs = {'a.yaml': {'project_id': 'shop'},
+               'b.yaml': {'project_id': 'blog'},
+               'c.yaml': {'project_id': 'shop'}}
+
+    assert workdir.check_distinct_projects(
+        {name: configs[name] for name in ('a.yaml', 'b.yaml')}, workdir.logger)
+    assert not workdir.check_distinct_projects(configs, workdir.logger)
+    assert "c.yaml and a.yaml both deploy project shop" in caplog.text
+
+
+def test_tfvars_render_every_value_and_drop_script_keys():
+    config = {
+        'project_id': 'shop',
+        'labels': {'team': 'café', 'owner': 'zoë'},
+        'subnets': {'web': {'ip_cidr_range': '10.0.0.0/24', 'flags': [True, None]}},
+        'enable_vpc': False,
+        'replicas': 3,
+        'launched': datetime.date(2024, 5, 1),
+        'terraform_state_bucket': 'state',
+        'terraform_state_prefix': 'projects/shop',
+        'terraform_parallelism': 'auto',
+    }
+
+    rendered = workdir.render_tfvars(workdir.tfvars_values(config))
+
+    assert json.loads(rendered) == {
+        'project_id': 'shop',
+        'labels': {'team': 'café', 'owner': 'zoë'},
+        'subnets': {'web': {'ip_cidr_range': '10.0.0.0/24', 'flags': [True, None]}},
+        'enable_vpc': False,
+        'replicas': 3,
+        'launched': '2024-05-01',
+    }
+    # One line per variable, non-ASCII kept as is
+    assert len(rendered.splitlines()) == 8
+    assert '"team": "café"' in rendered